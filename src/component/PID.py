@@ -11,6 +11,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from instruments.sr830 import SR830
 from instruments.wf1947 import WF1947
+from instruments.busscheduler import set_thread_priority, CONTROL
 
 class DigitalPID:
     """
@@ -242,6 +243,7 @@ class FrequencyTrackingThread(QThread):
         self.is_tracking = False
         self.sample_interval = 0.1  # 采样间隔（秒）
         self.max_duration = None  # 最大追踪时间
+        self.use_stream = False  # 是否使用SR830 FAST数据流读取相位
         
         # 数据存储
         self.tracking_data = []
@@ -252,10 +254,20 @@ class FrequencyTrackingThread(QThread):
         self.pid.set_pid_params(kp, ki, kd)
         self.pid.set_setpoint(setpoint)
         
-    def set_tracking_params(self, sample_interval: float, max_duration: Optional[float] = None):
-        """设置追踪参数"""
+    def set_tracking_params(self, sample_interval: float, max_duration: Optional[float] = None,
+                            use_stream: bool = False):
+        """
+        设置追踪参数
+        
+        Args:
+            sample_interval: 采样间隔（秒）
+            max_duration: 最大追踪时间（秒），None表示不限制
+            use_stream: 为True时SR830工作在FAST数据流模式，控制循环直接读取环形缓存中的最新相位，
+                        不再每个周期通过GPIB查询
+        """
         self.sample_interval = sample_interval
         self.max_duration = max_duration
+        self.use_stream = use_stream
         self.pid.set_sample_time(sample_interval)
         
     def start_tracking(self):
@@ -279,11 +291,35 @@ class FrequencyTrackingThread(QThread):
         # 重置WF1947
         self.wf1947.reset()
             
+    def _read_phase(self) -> float:
+        """读取当前相位：数据流模式下取环形缓存中的最新样本，否则查询SR830"""
+        if self.use_stream:
+            stream = self.sr830.stream
+            if stream is None or not stream.is_alive():
+                raise Exception(f"SR830数据流已停止: {stream.error if stream else None}")
+            phase = stream.latest_phase()
+            # 数据流刚启动时缓存可能仍为空，等待第一个样本
+            while phase is None and stream.is_alive():
+                time.sleep(0.01)
+                phase = stream.latest_phase()
+            if phase is None:
+                raise Exception("SR830数据流没有数据")
+            return phase
+        phase_data = self.sr830.getOut(4)  # 获取相位
+        return phase_data[0] if isinstance(phase_data, (list, tuple)) else phase_data
+            
     def run(self):
         """线程主循环"""
+        # 控制循环的getOut→set_frequency使用最高的总线优先级，
+        # 显示刷新和数据记录同时访问GPIB总线时也能保持有界延迟
+        set_thread_priority(CONTROL)
         try:
             self.status_updated.emit("正在初始化频率追踪...")
             
+            if self.use_stream:
+                self.sr830.startStream(mode="RTh")
+                print("SR830 FAST数据流已启动")
+            
             # 使用传入的初始频率，如果没有则从WF1947读取
             if self.initial_frequency is not None:
                 current_frequency = self.initial_frequency
@@ -305,8 +341,7 @@ class FrequencyTrackingThread(QThread):
                     
                 try:
                     # 读取当前相位
-                    phase_data = self.sr830.getOut(4)  # 获取相位
-                    current_phase = phase_data[0] if isinstance(phase_data, (list, tuple)) else phase_data
+                    current_phase = self._read_phase()
                     
                     # PID计算
                     frequency_correction = self.pid.compute(current_phase, current_time)
@@ -351,6 +386,11 @@ class FrequencyTrackingThread(QThread):
         except Exception as e:
             self.error_occurred.emit(f"频率追踪线程错误: {e}")
         finally:
+            if self.use_stream:
+                try:
+                    self.sr830.stopStream()
+                except Exception as e:
+                    print(f"停止SR830数据流失败: {e}")
             self.tracking_finished.emit()
             
     def get_tracking_data(self) -> list:
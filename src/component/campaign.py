@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def parse_setpoints(text: str) -> List[float]:
+    """
+    解析设定点列表
+
+    以逗号、分号或空白分隔；"起始:结束:步长" 表示包含两端的等间隔序列（步长可为负），
+    例如 "2, 5, 10:300:10" 或 "300:10:-10"。
+    """
+    setpoints = []
+    for token in re.split(r"[,;\s]+", text.strip()):
+        if not token:
+            continue
+        if ":" in token:
+            parts = [float(part) for part in token.split(":")]
+            if len(parts) != 3 or parts[2] == 0 or (parts[1] - parts[0]) * parts[2] < 0:
+                raise ValueError(f"无效的设定点范围: {token}")
+            start, stop, step = parts
+            count = int(np.floor((stop - start) / step + 1e-9)) + 1
+            setpoints.extend(np.round(start + step * np.arange(count), 9).tolist())
+        else:
+            setpoints.append(float(token))
+    if not setpoints:
+        raise ValueError("设定点列表为空")
+    return setpoints
+
+
+class CampaignDataset:
+    """
+    扫描序列数据集：每个设定点的扫描结果保存为一个数据块，并记录完成进度用于断点续扫
+
+    目录结构：
+        campaign.json       序列信息和已完成的设定点（每完成一个设定点原子地重写一次）
+        sweep_0000.npy      第0个设定点的扫描结果（结构化数组，含setpoint和setpoint_index列）
+
+    用同一目录、同样的物理量和设定点再次打开时沿用已完成的数据块，只需扫描 pending() 中的设定点。
+    """
+
+    INDEX_FILE = "campaign.json"
+    FORMAT = "sweep-campaign"
+    VERSION = 1
+
+    def __init__(self, directory: str, quantity: str, setpoints: List[float], sweep_params: Optional[Dict] = None):
+        """
+        打开或新建数据集
+
+        Args:
+            directory: 数据集目录，不存在时创建
+            quantity: 'temperature' 或 'field'
+            setpoints: 设定点列表（K 或 Oe）
+            sweep_params: 扫描参数，随序列信息一起保存
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+            if self.index.get("format") != self.FORMAT:
+                raise ValueError(f"{directory} 不是扫描序列数据集")
+            if self.index["quantity"] != quantity or not np.allclose(self.index["setpoints"], setpoints):
+                raise ValueError(f"{directory} 中已有设定量或设定点不同的扫描序列，请选择新的目录")
+        else:
+            self.index = {
+                "format": self.FORMAT,
+                "version": self.VERSION,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "quantity": quantity,
+                "setpoints": [float(value) for value in setpoints],
+                "sweep_params": sweep_params or {},
+                "chunks": {},
+            }
+            self._save_index()
+
+    @property
+    def setpoints(self) -> List[float]:
+        return self.index["setpoints"]
+
+    def completed(self) -> List[int]:
+        """已完成的设定点序号"""
+        return sorted(int(index) for index in self.index["chunks"])
+
+    def pending(self) -> List[int]:
+        """尚未完成的设定点序号"""
+        done = set(self.completed())
+        return [index for index in range(len(self.setpoints)) if index not in done]
+
+    def is_complete(self) -> bool:
+        return not self.pending()
+
+    def _save_index(self):
+        # 先写临时文件再替换，中断时不会留下半个索引文件
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def _to_array(rows: List[Dict], setpoint: float, index: int) -> np.ndarray:
+        """数据点字典的列表转换为结构化数组，只保留数值列"""
+        names = [name for name, value in rows[0].items()
+                 if isinstance(value, (int, float, np.number)) and not isinstance(value, bool)]
+        dtype = np.dtype([("setpoint_index", np.int32), ("setpoint", np.float64)] +
+                         [(name, np.float64) for name in names])
+        array = np.zeros(len(rows), dtype=dtype)
+        array["setpoint_index"] = index
+        array["setpoint"] = setpoint
+        for name in names:
+            array[name] = [row.get(name, np.nan) for row in rows]
+        return array
+
+    def append(self, index: int, rows: List[Dict], conditions: Optional[Dict] = None):
+        """
+        写入一个设定点的扫描结果并记录为已完成
+
+        Args:
+            index: 设定点序号
+            rows: 扫描数据点字典的列表（FrequencySweepThread.get_sweep_data()）
+            conditions: 扫描前后的PPMS状态等附加信息
+        """
+        setpoint = self.setpoints[index]
+        filename = f"sweep_{index:04d}.npy"
+        path = os.path.join(self.directory, filename)
+        if rows:
+            array = self._to_array(rows, setpoint, index)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        self.index["chunks"][str(index)] = {
+            "file": filename if rows else None,
+            "setpoint": setpoint,
+            "points": len(rows),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "conditions": conditions or {},
+        }
+        self._save_index()
+
+    def read(self, index: int) -> Optional[np.ndarray]:
+        """读取一个设定点的扫描结果"""
+        chunk = self.index["chunks"].get(str(index))
+        if not chunk or not chunk["file"]:
+            return None
+        return np.load(os.path.join(self.directory, chunk["file"]))
+
+    def read_all(self) -> Optional[np.ndarray]:
+        """按设定点顺序读取全部已完成的扫描结果，合并为一个结构化数组"""
+        arrays = [array for array in (self.read(index) for index in self.completed()) if array is not None]
+        if not arrays:
+            return None
+        return np.concatenate(arrays)
@@ -2,12 +2,19 @@ import MultiPyVu as mpv
 import numpy as np
 import time
 import os
+import sys
 import json
 import threading
 from datetime import datetime
 
 from PySide6.QtCore import QThread, Signal
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from instruments.actor import call_async
+from instruments.busscheduler import set_thread_priority, ACQUISITION
+from component.sampleclock import SampleClock
+from component.recordwriter import RecordWriter, iter_points, scan_chunks
 
 class DataRecordThread(QThread):
     """数据记录线程类，负责实时采集SR830和PPMS数据"""
@@ -18,74 +25,106 @@ class DataRecordThread(QThread):
     error_occurred = Signal(str)  # 错误信号
     time_updated = Signal(float)  # 时间更新信号
     
-    def __init__(self, instruments_control, time_step=1.0, max_duration=None):
+    # 保存最终数据时每写入这么多行报告一次进度、检查一次取消
+    SAVE_PROGRESS_ROWS = 5000
+    
+    def __init__(self, instruments_control, time_step=1.0, max_duration=None, sr830_sample_rate=None,
+                 overrun_policy='catchup'):
         super().__init__()
         self.instruments_control = instruments_control
         self.time_step = time_step  # 时间步长（秒）
         self.max_duration = max_duration  # 最大记录时间（秒），None表示无限制
+        self.sr830_sample_rate = sr830_sample_rate  # SR830内部缓存采样率（Hz），None表示每个时间步长用SNAP读取一次
+        self.overrun_policy = overrun_policy  # 采集超过一个时间步长后的处理方式，见 SampleClock
+        self.clock = None  # 采样时钟，每次记录开始时新建
+        
+        # SR830缓存采集状态
+        self._buffer_start = None  # 缓存开始存储的时间戳
+        self._buffer_rate = None  # 实际使用的缓存采样率（Hz）
+        self._buffer_count = 0  # 已输出的缓存采样点数
+        self._buffer_pending = {}  # 尚未对齐输出的缓存数据 {仪器地址: (X数组, Y数组)}
+        self._buffer_freq = {}  # 最近一次读取的参考频率 {仪器地址: 频率}
         
         self.is_recording = False
         self.start_time = None
-        self.data_points = []
-        self.temp_save_interval = 300  # 5分钟保存一次临时文件
-        self.last_temp_save = 0
+        self.fsync_interval = 5.0  # 临时文件fsync间隔（秒），崩溃时最多丢失这段时间的数据
         
-        # 数据文件管理
+        # 数据文件管理：采集到的数据点由RecordWriter在后台线程追加写入temp_dir中的二进制分块
         self.temp_dir = None
         self.temp_files = []
+        self.writer = None
+        self._save_cancelled = threading.Event()
         
-    def set_recording_params(self, time_step: float, max_duration: Optional[float] = None):
+    def set_recording_params(self, time_step: float, max_duration: Optional[float] = None,
+                             sr830_sample_rate: Optional[float] = None, overrun_policy: str = 'catchup'):
         """设置记录参数"""
         self.time_step = time_step
         self.max_duration = max_duration
+        self.sr830_sample_rate = sr830_sample_rate
+        self.overrun_policy = overrun_policy
         
     def start_recording(self):
         """开始记录"""
         self.is_recording = True
         self.start_time = time.time()
-        self.data_points = []
-        self.last_temp_save = 0
         self.temp_files = []
         
-        # 创建临时文件夹
+        # 创建临时文件夹和写入器
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.temp_dir = os.path.join("temp_data", f"recording_{timestamp}")
-        os.makedirs(self.temp_dir, exist_ok=True)
+        self.writer = RecordWriter(self.temp_dir, self.fsync_interval)
         
         self.start()
         
     def stop_recording(self):
         """停止记录"""
         self.is_recording = False
+        if self.clock:
+            self.clock.cancel()
         
     def run(self):
-        """线程主循环"""
+        """线程主循环
+        
+        由 SampleClock 按绝对计划时刻（起始时刻 + n × 时间步长）触发采集，采集耗时不会累积成漂移；
+        采集超过一个时间步长时按 overrun_policy 补采或跳过，结束时的统计见 self.clock.summary()。
+        """
         consecutive_errors = 0
         max_consecutive_errors = 10  # 允许最大连续错误次数
+        set_thread_priority(ACQUISITION)
         
         try:
-            while self.is_recording:
-                current_time = time.time()
-                elapsed_time = current_time - self.start_time
+            self.clock = SampleClock(self.time_step, self.overrun_policy, self.max_duration)
+            self.start_time = self.clock.start_wall
+            if not self.is_recording:
+                # 线程启动前已经停止
+                self.clock.cancel()
+            
+            # 缓存模式下先启动SR830内部数据缓存
+            if self.sr830_sample_rate:
+                self._start_sr830_buffers()
                 
-                # 检查是否超过最大记录时间
-                if self.max_duration and elapsed_time >= self.max_duration:
+            while self.is_recording:
+                # 等待下一个采样点的计划时刻（停止记录或超过最大记录时间时返回None）
+                tick = self.clock.wait()
+                if tick is None:
                     self.is_recording = False
                     break
+                elapsed_time = tick['actual']
                 
                 try:
-                    # 采集数据
-                    data_point = self._collect_data(elapsed_time)
-                    if data_point:
-                        self.data_points.append(data_point)
-                        self.data_acquired.emit(data_point)
+                    # 采集数据（缓存模式下一次取出上个时间步长内的全部采样点）
+                    if self.sr830_sample_rate:
+                        new_points = self._collect_buffered_data()
+                    else:
+                        data_point = self._collect_data(tick)
+                        new_points = [data_point] if data_point else None
+                        
+                    if new_points is not None:
+                        for data_point in new_points:
+                            self.writer.write(data_point)
+                            self.data_acquired.emit(data_point)
                         self.time_updated.emit(elapsed_time)
                         consecutive_errors = 0  # 重置错误计数
-                        
-                        # 检查是否需要保存临时文件
-                        if elapsed_time - self.last_temp_save >= self.temp_save_interval:
-                            self._save_temp_file()
-                            self.last_temp_save = elapsed_time
                     else:
                         consecutive_errors += 1
                         
@@ -99,74 +138,76 @@ class DataRecordThread(QThread):
                         self.is_recording = False
                         break
                 
-                # 等待下一个时间步长
-                time.sleep(self.time_step)
-                
         except Exception as e:
             self.error_occurred.emit(f"记录线程发生严重错误: {e}")
         finally:
-            # 保存最后的临时文件
-            if self.data_points:
-                try:
-                    self._save_temp_file()
-                except Exception as save_error:
-                    self.error_occurred.emit(f"保存最终临时文件失败: {save_error}")
+            # 停止SR830内部数据缓存
+            if self.sr830_sample_rate:
+                self._stop_sr830_buffers()
+                
+            # 写完队列中的数据并关闭临时文件
+            try:
+                self.writer.close()
+            except Exception as save_error:
+                self.error_occurred.emit(f"写入临时文件失败: {save_error}")
+            self.temp_files = list(self.writer.files)
             self.recording_finished.emit()
             
-    def _collect_data(self, elapsed_time: float) -> Dict:
-        """采集所有仪器数据"""
+    def _collect_data(self, tick: Dict) -> Dict:
+        """采集所有仪器数据
+        
+        Args:
+            tick: SampleClock.wait() 返回的采样时刻；数据点记录实际时间（time、timestamp）、
+                  计划时间（scheduled_time、scheduled_timestamp）和两者之差 jitter（秒）
+        """
         data_point = {
-            'time': elapsed_time,
-            'timestamp': time.time()
+            'time': tick['actual'],
+            'timestamp': tick['timestamp'],
+            'scheduled_time': tick['scheduled'],
+            'scheduled_timestamp': tick['scheduled_timestamp'],
+            'jitter': tick['jitter']
         }
         
         try:
             # 采集SR830数据
             sr830_data = {}
-            for address, instrument in self.instruments_control.instruments_instance.items():
-                if hasattr(instrument, 'type') and instrument.type == "SR830":
-                    try:
-                        # 使用SNAP命令同时获取X, Y, R, θ, frequency
-                        snap_data = instrument.getSnap(1, 2, 3, 4, 9)  # X, Y, R, θ, frequency
-                        sr830_data[f"{address}_X"] = snap_data[0]
-                        sr830_data[f"{address}_Y"] = snap_data[1] 
-                        sr830_data[f"{address}_R"] = snap_data[2]
-                        sr830_data[f"{address}_theta"] = snap_data[3]
-                        sr830_data[f"{address}_frequency"] = snap_data[4]
-                    except Exception as e:
-                        self.error_occurred.emit(f"SR830 {address} 数据读取错误: {e}")
+            # 先向所有SR830提交SNAP读取，各仪器在自己的I/O线程中并行读取
+            snap_requests = {}
+            for address, instrument in self._sr830_instruments():
+                try:
+                    # FAST数据流模式下总线被占用，使用环形缓存中的最新样本（无频率信息）
+                    if instrument.isStreaming():
+                        xyrt_data = instrument.stream.latest_xyrt()
+                        if xyrt_data is not None:
+                            sr830_data[f"{address}_X"] = xyrt_data[0]
+                            sr830_data[f"{address}_Y"] = xyrt_data[1]
+                            sr830_data[f"{address}_R"] = xyrt_data[2]
+                            sr830_data[f"{address}_theta"] = xyrt_data[3]
+                            sr830_data[f"{address}_frequency"] = None
+                        continue
+                    # 使用SNAP命令同时获取X, Y, R, θ, frequency
+                    snap_requests[address] = call_async(instrument, "getSnap", 1, 2, 3, 4, 9)
+                except Exception as e:
+                    self.error_occurred.emit(f"SR830 {address} 数据读取错误: {e}")
+                    
+            # PPMS读取与SR830读取同时进行
+            ppms_requests = self._request_ppms_data()
+                    
+            for address, request in snap_requests.items():
+                try:
+                    snap_data = request.result()  # X, Y, R, θ, frequency
+                    sr830_data[f"{address}_X"] = snap_data[0]
+                    sr830_data[f"{address}_Y"] = snap_data[1] 
+                    sr830_data[f"{address}_R"] = snap_data[2]
+                    sr830_data[f"{address}_theta"] = snap_data[3]
+                    sr830_data[f"{address}_frequency"] = snap_data[4]
+                except Exception as e:
+                    self.error_occurred.emit(f"SR830 {address} 数据读取错误: {e}")
             
             data_point['SR830'] = sr830_data
             
             # 采集PPMS数据（直接读取，无缓存）
-            ppms_data = {}
-            
-            for address, instrument in self.instruments_control.instruments_instance.items():
-                if hasattr(instrument, 'type') and instrument.type == "PPMS":
-                    try:
-                        T, sT, F, sF = instrument.get_temperature_field()
-                        
-                        ppms_data[f"{address}_temperature"] = T
-                        ppms_data[f"{address}_field"] = F
-                        ppms_data[f"{address}_temp_status"] = sT
-                        ppms_data[f"{address}_field_status"] = sF
-                        
-                    except Exception as e:
-                        # 简化的错误处理
-                        error_msg = str(e)
-                        
-                        # 检查是否是socket相关错误
-                        if any(keyword in error_msg.lower() for keyword in ['socket', 'recv', 'connection', 'timeout']):
-                            self.error_occurred.emit(f"PPMS {address} Socket连接错误: {error_msg[:100]}...")
-                        elif "Incorrect Message ID" in error_msg:
-                            self.error_occurred.emit(f"PPMS {address} 通信协议错误: Message ID不匹配")
-                        else:
-                            self.error_occurred.emit(f"PPMS {address} 数据读取错误: {error_msg[:100]}")
-                        
-                        # 跳过此次采集
-                        continue
-            
-            data_point['PPMS'] = ppms_data
+            data_point['PPMS'] = self._collect_ppms_data(ppms_requests)
             
             return data_point
             
@@ -174,26 +215,200 @@ class DataRecordThread(QThread):
             self.error_occurred.emit(f"数据采集错误: {e}")
             return None
             
-    def _save_temp_file(self):
-        """保存临时数据文件"""
-        if not self.data_points:
-            return
-            
-        try:
-            temp_filename = f"temp_{len(self.temp_files):03d}.json"
-            temp_filepath = os.path.join(self.temp_dir, temp_filename)
+    def _request_ppms_data(self) -> Dict:
+        """向所有PPMS提交温度/磁场读取，返回 {地址: Future}"""
+        return {address: call_async(instrument, "get_temperature_field")
+                for address, instrument in self.instruments_control.instruments_instance.items()
+                if hasattr(instrument, 'type') and instrument.type == "PPMS"}
+        
+    def _collect_ppms_data(self, requests: Optional[Dict] = None) -> Dict:
+        """采集所有PPMS数据
+        
+        Args:
+            requests: _request_ppms_data()提前提交的读取，为None时在此提交
+        """
+        ppms_data = {}
+        if requests is None:
+            requests = self._request_ppms_data()
+        
+        for address, request in requests.items():
+            try:
+                T, sT, F, sF = request.result()
+                
+                ppms_data[f"{address}_temperature"] = T
+                ppms_data[f"{address}_field"] = F
+                ppms_data[f"{address}_temp_status"] = sT
+                ppms_data[f"{address}_field_status"] = sF
+                
+            except Exception as e:
+                # 简化的错误处理
+                error_msg = str(e)
+                
+                # 检查是否是socket相关错误
+                if any(keyword in error_msg.lower() for keyword in ['socket', 'recv', 'connection', 'timeout']):
+                    self.error_occurred.emit(f"PPMS {address} Socket连接错误: {error_msg[:100]}...")
+                elif "Incorrect Message ID" in error_msg:
+                    self.error_occurred.emit(f"PPMS {address} 通信协议错误: Message ID不匹配")
+                else:
+                    self.error_occurred.emit(f"PPMS {address} 数据读取错误: {error_msg[:100]}")
+                
+                # 跳过此次采集
+                continue
+                
+        return ppms_data
+        
+    def _sr830_instruments(self) -> List[Tuple[str, object]]:
+        """获取所有SR830仪器 [(地址, 实例)]"""
+        return [(address, instrument)
+                for address, instrument in self.instruments_control.instruments_instance.items()
+                if hasattr(instrument, 'type') and instrument.type == "SR830"]
+        
+    def _start_sr830_buffers(self):
+        """配置并启动所有SR830的内部数据缓存"""
+        self._buffer_pending = {}
+        self._buffer_freq = {}
+        self._buffer_count = 0
+        self._buffer_rate = None
+        
+        for address, instrument in self._sr830_instruments():
+            if instrument.isStreaming():
+                self.error_occurred.emit(f"SR830 {address} 正在FAST数据流模式，无法使用内部缓存记录")
+                continue
+            try:
+                # 选择最接近的SR830采样率
+                rate_index = int(np.argmin(np.abs(np.array(instrument.rate) - self.sr830_sample_rate)))
+                instrument.setupBuffer(i=rate_index)
+                self._buffer_rate = instrument.rate[rate_index]
+                self._buffer_pending[address] = (np.empty(0), np.empty(0))
+            except Exception as e:
+                self.error_occurred.emit(f"SR830 {address} 缓存配置错误: {e}")
+                
+        # 尽量同时启动所有缓存，使各仪器的采样点对齐
+        starts = []
+        for address, instrument in self._sr830_instruments():
+            if address in self._buffer_pending:
+                instrument.startBuffer()
+                starts.append(instrument.bufferStart)
+        self._buffer_start = float(np.mean(starts)) if starts else time.time()
+        
+    def _stop_sr830_buffers(self):
+        """暂停所有SR830的内部数据缓存"""
+        for address, instrument in self._sr830_instruments():
+            if address in self._buffer_pending:
+                try:
+                    instrument.pauseBuffer()
+                except Exception as e:
+                    self.error_occurred.emit(f"SR830 {address} 缓存停止错误: {e}")
+                    
+    def _collect_buffered_data(self) -> Optional[List[Dict]]:
+        """从SR830内部缓存取出新的采样点，按采样序号对齐后生成数据点列表
+        
+        Returns:
+            List[Dict]: 新数据点列表（可能为空），所有SR830读取都失败时返回None
+        """
+        if not self._buffer_pending or not self._buffer_rate:
+            return None
             
-            with open(temp_filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.data_points, f, indent=2)
+        # 缓存在下一次读取前可能存满时，所有SR830一起重新启动缓存（各自重启会使采样序号错位）
+        capacity = min(instrument.bufferSize for address, instrument in self._sr830_instruments()
+                       if address in self._buffer_pending) - 64
+        expected = (time.time() - self._buffer_start + 1.5 * self.time_step) * self._buffer_rate
+        rearm = expected >= capacity
+            
+        # 所有SR830同时读取缓存，PPMS读取也同时提交
+        requests = {}
+        for address, instrument in self._sr830_instruments():
+            if address in self._buffer_pending:
+                # 两次TRCB传输取出上个时间步长内的全部X/Y采样
+                requests[address] = (call_async(instrument, "readBuffer", rearm),
+                                     call_async(instrument, "getFreq"))
+        ppms_requests = self._request_ppms_data()
+                
+        read_ok = False
+        for address, (buffer_request, freq_request) in requests.items():
+            try:
+                x, y = buffer_request.result()
+                self._buffer_freq[address] = freq_request.result()
+                pending_x, pending_y = self._buffer_pending[address]
+                self._buffer_pending[address] = (np.concatenate((pending_x, x)),
+                                                 np.concatenate((pending_y, y)))
+                read_ok = True
+            except Exception as e:
+                self.error_occurred.emit(f"SR830 {address} 缓存读取错误: {e}")
                 
-            self.temp_files.append(temp_filepath)
-            self.data_points = []  # 清空已保存的数据点
+        if not read_ok:
+            return None
             
-        except Exception as e:
-            self.error_occurred.emit(f"保存临时文件失败: {e}")
+        # 只输出所有SR830都已采到的采样点
+        count = min(len(x) for x, _ in self._buffer_pending.values())
+        if count == 0:
+            self._restart_buffer_segment(rearm)
+            return []
             
-    def save_final_data(self, filename: str = None) -> Tuple[bool, str]:
-        """保存最终数据文件"""
+        # PPMS变化缓慢，每个时间步长读取一次
+        ppms_data = self._collect_ppms_data(ppms_requests)
+        
+        columns = {}
+        for address, (x, y) in self._buffer_pending.items():
+            x_now, y_now = x[:count], y[:count]
+            columns[address] = (x_now.tolist(), y_now.tolist(),
+                                np.hypot(x_now, y_now).tolist(),
+                                np.degrees(np.arctan2(y_now, x_now)).tolist())
+            self._buffer_pending[address] = (x[count:], y[count:])
+            
+        # 采样时间由采样序号和采样率重建
+        offset = self._buffer_start - self.start_time
+        sample_times = (offset + (self._buffer_count + np.arange(count)) / self._buffer_rate).tolist()
+        self._buffer_count += count
+        self._restart_buffer_segment(rearm)
+        
+        # 缓存采样点由SR830内部时钟定时，计划时间即采样时间
+        data_points = []
+        for k, sample_time in enumerate(sample_times):
+            sr830_data = {}
+            for address, (x, y, r, theta) in columns.items():
+                sr830_data[f"{address}_X"] = x[k]
+                sr830_data[f"{address}_Y"] = y[k]
+                sr830_data[f"{address}_R"] = r[k]
+                sr830_data[f"{address}_theta"] = theta[k]
+                sr830_data[f"{address}_frequency"] = self._buffer_freq.get(address)
+            data_points.append({
+                'time': sample_time,
+                'timestamp': self.start_time + sample_time,
+                'scheduled_time': sample_time,
+                'scheduled_timestamp': self.start_time + sample_time,
+                'jitter': 0.0,
+                'SR830': sr830_data,
+                'PPMS': dict(ppms_data)
+            })
+            
+        return data_points
+            
+    def _restart_buffer_segment(self, rearm: bool):
+        """缓存重新启动后，丢弃重启前未能对齐的采样点，采样序号从新缓存的实测启动时间重新计数"""
+        if not rearm:
+            return
+        starts = [instrument.bufferStart for address, instrument in self._sr830_instruments()
+                  if address in self._buffer_pending and instrument.bufferRearmed]
+        for address in self._buffer_pending:
+            self._buffer_pending[address] = (np.empty(0), np.empty(0))
+        if starts:
+            self._buffer_start = float(np.mean(starts))
+            self._buffer_count = 0
+            
+    def cancel_save(self):
+        """取消正在进行的 save_final_data()（可从其他线程调用），临时文件保留，可以再次保存"""
+        self._save_cancelled.set()
+        
+    def save_final_data(self, filename: str = None,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Tuple[bool, str]:
+        """保存最终数据文件
+        
+        逐个分块读取临时文件并逐行写入，内存占用与记录时长无关；写入过程中调用
+        progress(已写入行数, 总行数)（可在ExportService等其他线程中执行），
+        cancel_save() 后删除未写完的文件并返回 (False, "")。
+        """
+        self._save_cancelled.clear()
         try:
             # 确保history_data文件夹存在
             history_dir = "history_data"
@@ -205,24 +420,14 @@ class DataRecordThread(QThread):
             
             filepath = os.path.join(history_dir, filename)
             
-            # 合并所有临时文件和当前数据
-            all_data = []
-            
-            # 读取所有临时文件
-            for temp_file in self.temp_files:
-                try:
-                    with open(temp_file, 'r', encoding='utf-8') as f:
-                        temp_data = json.load(f)
-                        all_data.extend(temp_data)
-                except Exception as e:
-                    self.error_occurred.emit(f"读取临时文件失败 {temp_file}: {e}")
-            
-            # 添加当前数据点
-            all_data.extend(self.data_points)
+            # 只读各分块的文件头，得到全部列和总行数
+            columns, total = scan_chunks(self.temp_files)
             
             # 使用MultiPyVu.DataFile保存
-            if all_data:
-                self._save_with_multipyvu(filepath, all_data)
+            if total:
+                if not self._save_with_multipyvu(filepath, columns, total, progress):
+                    self.error_occurred.emit("已取消保存，临时数据已保留")
+                    return False, ""
                 
                 # 清理临时文件
                 self._cleanup_temp_files()
@@ -236,27 +441,30 @@ class DataRecordThread(QThread):
             self.error_occurred.emit(f"保存最终数据失败: {e}")
             return False, ""
             
-    def _save_with_multipyvu(self, filepath: str, data: List[Dict]):
-        """使用MultiPyVu.DataFile保存数据"""
+    def _save_with_multipyvu(self, filepath: str, chunk_columns: List[Tuple[str, ...]], total: int,
+                             progress: Optional[Callable[[int, int], None]] = None) -> bool:
+        """使用MultiPyVu.DataFile保存数据，逐个读取临时分块中的数据点并逐行写入
+        
+        Args:
+            chunk_columns: scan_chunks() 返回的全部分块的列
+            total: 总行数，用于报告进度
+            progress: 进度回调 (已写入行数, 总行数)
+            
+        Returns:
+            bool: 写完返回True，被取消返回False（已删除未写完的文件）
+        """
         try:
             # 创建DataFile实例
             data_file = mpv.DataFile()
             
-            # 准备列名和数据
-            if not data:
-                return
-                
-            # 从第一个数据点推断列结构
-            sample_data = data[0]
-            columns = ['Time (s)']
+            # 由全部分块的列确定列结构（记录中途出现的仪器也有对应的列）
+            columns = ['Time (s)', 'Scheduled Time (s)', 'Jitter (s)']
             
             # 添加SR830列
-            for key in sample_data.get('SR830', {}):
-                columns.append(f"SR830_{key}")
+            columns.extend(f"SR830_{key[1]}" for key in chunk_columns if key[0] == 'SR830')
                 
             # 添加PPMS列  
-            for key in sample_data.get('PPMS', {}):
-                columns.append(f"PPMS_{key}")
+            columns.extend(f"PPMS_{key[1]}" for key in chunk_columns if key[0] == 'PPMS')
             
             # 添加列到DataFile
             data_file.add_multiple_columns(columns)
@@ -264,28 +472,50 @@ class DataRecordThread(QThread):
             # 创建文件和写入头部
             data_file.create_file_and_write_header(filepath, 'Instrument Data Recording')
             
-            # 写入所有数据点
-            for point in data:
-                # 设置时间值
-                data_file.set_value('Time (s)', point['time'])
+            # 逐行写入所有数据点
+            for row, point in enumerate(iter_points(self.temp_files), 1):
+                # 设置时间值（缺失的值为None，不设置，该列留空）
+                values = {
+                    'Time (s)': point['time'],
+                    'Scheduled Time (s)': point.get('scheduled_time', point['time']),
+                    'Jitter (s)': point.get('jitter', 0.0),
+                }
                 
                 # 设置SR830数据
                 sr830_data = point.get('SR830', {})
-                for key, value in sr830_data.items():
-                    data_file.set_value(f"SR830_{key}", value)
+                values.update((f"SR830_{key}", value) for key, value in sr830_data.items())
                 
                 # 设置PPMS数据
                 ppms_data = point.get('PPMS', {})
-                for key, value in ppms_data.items():
-                    data_file.set_value(f"PPMS_{key}", value)
+                values.update((f"PPMS_{key}", value) for key, value in ppms_data.items())
+                
+                for column, value in values.items():
+                    if value is not None:
+                        data_file.set_value(column, value)
                 
                 # 写入这一行数据
                 data_file.write_data()
+                
+                if row % self.SAVE_PROGRESS_ROWS == 0:
+                    if progress:
+                        progress(row, total)
+                    if self._save_cancelled.is_set():
+                        data_file = None
+                        os.remove(filepath)
+                        return False
+                        
+            if progress:
+                progress(total, total)
+            return True
             
         except Exception as e:
-            # 如果MultiPyVu保存失败，使用JSON作为备选
+            # 如果MultiPyVu保存失败，使用JSON作为备选（同样逐个数据点写入）
             with open(filepath + '.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+                f.write('[')
+                for row, point in enumerate(iter_points(self.temp_files)):
+                    f.write(',\n' if row else '\n')
+                    json.dump(point, f)
+                f.write('\n]')
             raise e
             
     def _cleanup_temp_files(self):
@@ -303,11 +533,27 @@ class DataRecordThread(QThread):
 
 
 class DataSort:
-    """数据排序和管理类"""
+    """数据排序和管理类
+    
+    记录中的数据按列保存在预先分配的二维NumPy数组中（每行一个数据点，每个通道一列），
+    data_columns 为列名列表，column_index 为列名到列号的索引。列名与绘图选项一致：
+    顶层数值（time、timestamp、jitter等）直接作列名，嵌套字典展开为 "SR830_<地址>_X"、
+    "PPMS_<地址>_temperature" 等。缺失或非数值的值记为NaN。
+    
+    追加一个数据点只写一行（容量不足时成倍扩容，均摊O(1)），每点占用 8字节×列数；
+    get_data_for_plotting() 返回的是数组切片视图，不复制数据。
+    """
+    
+    INITIAL_CAPACITY = 1024
     
     def __init__(self):
-        self.current_data = []
         self.data_columns = []
+        self.column_index = {}
+        self.count = 0
+        self._data = np.empty((0, 0))
+        
+    def __len__(self) -> int:
+        return self.count
         
     @staticmethod
     def save_data_to_file(data: List[Dict], filepath: str, data_source: str = "Instrument Data") -> Tuple[bool, str]:
@@ -433,66 +679,88 @@ class DataSort:
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
 
+    @staticmethod
+    def _flatten(data_point: Dict) -> Dict[str, float]:
+        """数据点展开为 {列名: 数值}，嵌套字典的列名为 "<键>_<子键>"，非数值记为NaN"""
+        values = {}
+        for key, value in data_point.items():
+            if isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    values[f"{key}_{sub_key}"] = sub_value
+            else:
+                values[key] = value
+        for name, value in values.items():
+            try:
+                values[name] = float(value)
+            except (TypeError, ValueError):
+                values[name] = np.nan
+        return values
+        
+    def _add_column(self, name: str):
+        """新增一列，已有的数据点在该列记为NaN"""
+        self.column_index[name] = len(self.data_columns)
+        self.data_columns.append(name)
+        capacity = max(len(self._data), self.INITIAL_CAPACITY)
+        grown = np.full((capacity, len(self.data_columns)), np.nan)
+        grown[:len(self._data), :self._data.shape[1]] = self._data
+        self._data = grown
+        
     def update_data(self, new_data_point: Dict):
-        """更新当前数据"""
-        self.current_data.append(new_data_point)
-        
-    def get_data_for_plotting(self, x_column: str, y_column: str) -> Tuple[List, List]:
-        """获取用于绘图的数据"""
-        if not self.current_data:
-            return [], []
-            
-        x_data = []
-        y_data = []
-        
-        for point in self.current_data:
-            # 获取X轴数据
-            x_val = self._extract_value(point, x_column)
-            # 获取Y轴数据  
-            y_val = self._extract_value(point, y_column)
-            
-            if x_val is not None and y_val is not None:
-                x_data.append(x_val)
-                y_data.append(y_val)
-                
-        return x_data, y_data
+        """追加一个数据点"""
+        values = self._flatten(new_data_point)
+        for name in values:
+            if name not in self.column_index:
+                self._add_column(name)
+        if self.count == len(self._data):
+            grown = np.full((2 * len(self._data), len(self.data_columns)), np.nan)
+            grown[:self.count] = self._data
+            self._data = grown
+        row = self._data[self.count]
+        for name, value in values.items():
+            row[self.column_index[name]] = value
+        self.count += 1
         
-    def _extract_value(self, data_point: Dict, column: str):
-        """从数据点中提取指定列的值"""
-        if column == 'time':
-            return data_point.get('time', 0)
+    def column(self, name: str, last: Optional[int] = None) -> np.ndarray:
+        """
+        获取一列数据（数组视图，不复制；之后追加数据时扩容会使视图与存储脱离，不要长期持有）
         
-        # SR830数据
-        if column.startswith('SR830_'):
-            sr830_key = column[6:]  # 去掉'SR830_'前缀
-            return data_point.get('SR830', {}).get(sr830_key)
-            
-        # PPMS数据
-        if column.startswith('PPMS_'):
-            ppms_key = column[5:]  # 去掉'PPMS_'前缀
-            return data_point.get('PPMS', {}).get(ppms_key)
+        Args:
+            name: 列名
+            last: 只取最近的 last 个数据点，None表示全部
             
-        return None
+        Returns:
+            np.ndarray: 该列的数据，列不存在时为空数组
+        """
+        index = self.column_index.get(name)
+        if index is None:
+            return np.empty(0)
+        start = 0 if last is None else max(self.count - last, 0)
+        return self._data[start:self.count, index]
+        
+    def get_data_for_plotting(self, x_column: str, y_column: str,
+                              last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        获取用于绘图的数据（两列的数组视图，缺失值为NaN，matplotlib绘制时自动断开）
+        
+        Args:
+            x_column, y_column: 列名
+            last: 只取最近的 last 个数据点，指定时每次刷新的开销与记录时长无关
+        """
+        x_data = self.column(x_column, last)
+        y_data = self.column(y_column, last)
+        if len(x_data) == 0 or len(y_data) == 0:
+            return np.empty(0), np.empty(0)
+        return x_data, y_data
         
     def get_available_columns(self) -> List[str]:
         """获取可用的列名"""
-        if not self.current_data:
+        if not self.data_columns:
             return ['time']
-            
-        columns = ['time']
-        sample_data = self.current_data[-1]  # 使用最新数据点
-        
-        # 添加SR830列
-        for key in sample_data.get('SR830', {}):
-            columns.append(f"SR830_{key}")
-            
-        # 添加PPMS列
-        for key in sample_data.get('PPMS', {}):
-            columns.append(f"PPMS_{key}")
-            
-        return columns
+        return list(self.data_columns)
         
     def clear_data(self):
         """清空当前数据"""
-        self.current_data = []
-        self.data_columns = []
\ No newline at end of file
+        self.data_columns = []
+        self.column_index = {}
+        self.count = 0
+        self._data = np.empty((0, 0))
\ No newline at end of file
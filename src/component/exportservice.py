@@ -0,0 +1,179 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+
+class ExportService(QThread):
+    """
+    数据导出服务：在后台线程中依次执行保存任务，避免大文件保存时界面卡住
+
+    各面板通过 ExportService.instance() 共用同一个服务，submit() 提交的任务按提交顺序
+    排队执行。任务函数返回 (success, message)，与 DataSort.save_data_to_file() 和
+    DataRecordThread.save_final_data() 一致；抛出的异常作为失败结果报告。
+    进度和结果通过信号报告（在界面线程中接收），信号带 submit() 返回的任务编号；
+    面板通过 ExportJobs 提交任务，只接收自己提交的任务的信号。
+    """
+
+    # 信号定义
+    export_started = Signal(int, str)  # 任务开始（任务编号, 描述）
+    export_progress = Signal(int, int, int)  # 任务进度（任务编号, 已完成, 总数）
+    export_finished = Signal(int, bool, str)  # 任务结束（任务编号, 是否成功, 消息）
+    queue_changed = Signal(int)  # 排队和执行中的任务数
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "ExportService":
+        """获取共用的导出服务"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        super().__init__()
+        self._queue = queue.Queue()
+        self._jobs: Dict[int, tuple] = {}  # 排队中的任务 {任务编号: (函数, 参数, 关键字参数, 描述, 取消函数)}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._current_id = None
+        self._current_cancel = None
+
+    def submit(self, function: Callable, *args, description: str = "", progress: bool = False,
+               cancel: Optional[Callable[[], None]] = None, **kwargs) -> int:
+        """
+        提交一个导出任务
+
+        Args:
+            function: 任务函数，返回 (success, message)
+            description: 任务描述，用于日志
+            progress: 为True时以关键字参数 progress=回调(已完成, 总数) 调用任务函数，回调发射 export_progress
+            cancel: 取消正在执行的任务时调用的函数（如 DataRecordThread.cancel_save），None表示执行中不可取消
+            *args, **kwargs: 任务函数的参数；提交后数据可能被界面修改时应传入副本
+
+        Returns:
+            int: 任务编号
+        """
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            if progress:
+                kwargs['progress'] = lambda done, total: self.export_progress.emit(job_id, done, total)
+            self._jobs[job_id] = (function, args, kwargs, description, cancel)
+            pending = self._pending_count()
+        self._queue.put(job_id)
+        self.queue_changed.emit(pending)
+        if not self.isRunning():
+            self.start()
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """取消排队中的任务，或请求取消正在执行的任务；返回是否发出了取消"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                cancel = self._current_cancel if job_id == self._current_id else None
+            pending = self._pending_count()
+        if job is not None:
+            self.export_finished.emit(job_id, False, "已取消")
+            self.queue_changed.emit(pending)
+            return True
+        if cancel is not None:
+            cancel()
+            return True
+        return False
+
+    def cancel_all(self):
+        """取消全部排队中和正在执行的任务"""
+        with self._lock:
+            job_ids = list(self._jobs)
+            if self._current_id is not None:
+                job_ids.append(self._current_id)
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def pending(self) -> int:
+        """排队和执行中的任务数"""
+        with self._lock:
+            return self._pending_count()
+
+    def _pending_count(self) -> int:
+        return len(self._jobs) + (self._current_id is not None)
+
+    def shutdown(self):
+        """执行完已提交的任务后停止服务线程（程序退出前调用）"""
+        if self.isRunning():
+            self._queue.put(None)
+            self.wait()
+
+    def run(self):
+        """依次执行排队的任务"""
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+            with self._lock:
+                job = self._jobs.pop(job_id, None)
+                if job is None:
+                    # 已被取消
+                    continue
+                function, args, kwargs, description, cancel = job
+                self._current_id = job_id
+                self._current_cancel = cancel
+
+            self.export_started.emit(job_id, description)
+            try:
+                success, message = function(*args, **kwargs)
+            except Exception as e:
+                success, message = False, f"{description}失败: {e}"
+
+            with self._lock:
+                self._current_id = None
+                self._current_cancel = None
+                pending = self._pending_count()
+            self.export_finished.emit(job_id, bool(success), str(message))
+            self.queue_changed.emit(pending)
+
+
+class ExportJobs(QObject):
+    """
+    一个面板提交到共用导出服务的任务
+
+    submit() 提交任务时附带一个标记（如是否为自动保存），只转发本面板任务的进度和结果，
+    信号带提交时的标记而不是任务编号。在界面线程中创建，信号在界面线程中发射。
+    """
+
+    # 信号定义
+    job_progress = Signal(object, int, int)  # 任务进度（标记, 已完成, 总数）
+    job_finished = Signal(object, bool, str)  # 任务结束（标记, 是否成功, 消息）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.service = ExportService.instance()
+        self._jobs: Dict[int, Any] = {}  # 未结束的任务 {任务编号: 标记}
+        self.service.export_progress.connect(self._on_progress)
+        self.service.export_finished.connect(self._on_finished)
+
+    def submit(self, function: Callable, *args, tag: Any = None, **kwargs) -> int:
+        """提交一个导出任务，参数同 ExportService.submit()，tag 随该任务的信号发出；返回任务编号"""
+        job_id = self.service.submit(function, *args, **kwargs)
+        self._jobs[job_id] = tag
+        return job_id
+
+    def cancel_all(self):
+        """取消本面板排队中和正在执行的任务"""
+        for job_id in list(self._jobs):
+            self.service.cancel(job_id)
+
+    def pending(self) -> int:
+        """本面板未结束的任务数"""
+        return len(self._jobs)
+
+    def _on_progress(self, job_id, done, total):
+        if job_id in self._jobs:
+            self.job_progress.emit(self._jobs[job_id], done, total)
+
+    def _on_finished(self, job_id, success, message):
+        if job_id in self._jobs:
+            self.job_finished.emit(self._jobs.pop(job_id), success, message)
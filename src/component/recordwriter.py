@@ -0,0 +1,257 @@
+import os
+import json
+import queue
+import struct
+import threading
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+MAGIC = b"DREC1\n"
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+def _flatten(data_point: Dict) -> Dict[Tuple[str, ...], object]:
+    """数据点展开为 {键路径: 值}，如 {('time',): 1.0, ('SR830', 'GPIB0::8::INSTR_X'): 1e-3}"""
+    values = {}
+    for key, value in data_point.items():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                values[(key, sub_key)] = sub_value
+        else:
+            values[(key,)] = value
+    return values
+
+
+class RecordWriter:
+    """
+    记录数据的追加式二进制写入器
+
+    数据点由 write() 放入有界队列，后台线程批量写入分块文件：
+
+        chunk_0000.bin      文件头 + 定长记录（每行 列数×float64，小端）
+        chunk_0000.labels   文本列的取值表（每行一个JSON字符串，记录中存其行号）
+
+    文件头为 MAGIC、4字节头长度和JSON（columns：各列的键路径，labels：文本列的序号），
+    填充到8字节对齐，记录区可直接用 np.memmap 读取，不需要解析。
+    出现新的列时结束当前分块、以新的列开始下一个分块；分块达到 chunk_rows 行时也换新分块。
+    缺失值和无法转换的值记为NaN。
+
+    每批写入后立即 flush 到操作系统，每隔 fsync_interval 秒 fsync 一次，崩溃时最多丢失
+    这段时间内的数据。队列满时 write() 阻塞（不丢点）；写入线程出错后 write() 抛出该错误。
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 5.0, max_queue: int = 10000,
+                 chunk_rows: int = 1 << 20):
+        """
+        Args:
+            directory: 分块文件目录，不存在时创建
+            fsync_interval: fsync 间隔（秒），0表示每批都 fsync
+            max_queue: 队列中最多等待写入的数据点数
+            chunk_rows: 每个分块的最大行数
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.chunk_rows = chunk_rows
+        self.files: List[str] = []  # 已创建的全部文件（分块和取值表）
+        self.rows = 0  # 已写入的数据点数
+        self.error: Optional[Exception] = None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._labels_file = None
+        self._columns: List[Tuple[str, ...]] = []
+        self._column_index: Dict[Tuple[str, ...], int] = {}
+        self._label_columns = set()
+        self._label_codes: Dict[str, int] = {}
+        self._chunk_rows = 0
+        self._last_fsync = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name="RecordWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, data_point: Dict):
+        """放入一个数据点等待写入"""
+        if self.error:
+            raise self.error
+        self._queue.put(data_point)
+
+    def close(self):
+        """写完队列中的数据，fsync 并关闭文件"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.error:
+            raise self.error
+
+    def _run(self):
+        closing = False
+        try:
+            while not closing:
+                batch = [self._queue.get()]
+                # 一次取出队列中已有的全部数据点，成批写入
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    closing = True
+                    batch.pop()
+                self._write_batch(batch)
+                self._sync(force=closing)
+        except Exception as e:
+            self.error = e
+            # 继续取出队列，避免 write() 永久阻塞
+            while not closing:
+                closing = self._queue.get() is None
+        finally:
+            try:
+                self._close_chunk()
+            except Exception as e:
+                self.error = self.error or e
+
+    def _write_batch(self, batch: List[Dict]):
+        rows = []
+        for data_point in batch:
+            values = _flatten(data_point)
+            if any(path not in self._column_index for path in values) or \
+                    self._file is None or self._chunk_rows + len(rows) >= self.chunk_rows:
+                self._write_rows(rows)
+                rows = []
+                self._open_chunk(values)
+            row = np.full(len(self._columns), np.nan)
+            for path, value in values.items():
+                row[self._column_index[path]] = self._encode(path, value)
+            rows.append(row)
+        self._write_rows(rows)
+
+    def _encode(self, path, value) -> float:
+        if path in self._label_columns:
+            if value is None:
+                return np.nan
+            text = str(value)
+            code = self._label_codes.get(text)
+            if code is None:
+                code = self._label_codes[text] = len(self._label_codes)
+                self._labels_file.write(json.dumps(text, ensure_ascii=False) + "\n")
+            return code
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def _write_rows(self, rows):
+        if rows:
+            self._file.write(np.asarray(rows, dtype="<f8").tobytes())
+            self._chunk_rows += len(rows)
+            self.rows += len(rows)
+
+    def _open_chunk(self, values: Dict):
+        """结束当前分块，以当前的列和 values 中的新列开始下一个分块"""
+        self._close_chunk()
+        for path, value in values.items():
+            if path not in self._column_index:
+                self._column_index[path] = len(self._columns)
+                self._columns.append(path)
+                if isinstance(value, str):
+                    self._label_columns.add(path)
+        name = f"chunk_{len(self.files) // 2:04d}"
+        path = os.path.join(self.directory, name + ".bin")
+        labels_path = os.path.join(self.directory, name + ".labels")
+        header = json.dumps({
+            "columns": [list(column) for column in self._columns],
+            "labels": sorted(self._column_index[column] for column in self._label_columns),
+            "dtype": "<f8",
+        }, ensure_ascii=False).encode("utf-8")
+        # 记录区按8字节对齐
+        padding = -(len(MAGIC) + _HEADER_LENGTH.size + len(header)) % 8
+        header += b" " * padding
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        self._labels_file = open(labels_path, "w", encoding="utf-8")
+        self._label_codes = {}
+        self._chunk_rows = 0
+        self.files.extend([path, labels_path])
+
+    def _sync(self, force: bool = False):
+        if self._file is None:
+            return
+        self._labels_file.flush()
+        self._file.flush()
+        if force or time.monotonic() - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._labels_file.fileno())
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def _close_chunk(self):
+        if self._file is None:
+            return
+        self._sync(force=True)
+        self._file.close()
+        self._labels_file.close()
+        self._file = None
+        self._labels_file = None
+
+
+def read_chunk(path: str) -> Tuple[List[Tuple[str, ...]], np.ndarray, Dict[int, List[str]]]:
+    """
+    读取一个分块
+
+    Returns:
+        (columns, data, labels)：各列的键路径；(行数, 列数) 的只读 np.memmap（写入中断时
+        不完整的最后一行被忽略）；{文本列序号: 取值表}
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 不是记录数据分块")
+        length, = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+        header = json.loads(f.read(length).decode("utf-8"))
+    offset = len(MAGIC) + _HEADER_LENGTH.size + length
+    columns = [tuple(column) for column in header["columns"]]
+    rows = (os.path.getsize(path) - offset) // (8 * len(columns))
+    if rows:
+        data = np.memmap(path, dtype=header["dtype"], mode="r", offset=offset, shape=(rows, len(columns)))
+    else:
+        data = np.empty((0, len(columns)))
+
+    labels = {}
+    if header["labels"]:
+        with open(os.path.splitext(path)[0] + ".labels", encoding="utf-8") as f:
+            table = [json.loads(line) for line in f if line.strip()]
+        labels = {index: table for index in header["labels"]}
+    return columns, data, labels
+
+
+def scan_chunks(paths: List[str]) -> Tuple[List[Tuple[str, ...]], int]:
+    """只读文件头，返回全部分块的列（按首次出现的顺序合并）和总行数"""
+    columns, rows = [], 0
+    for path in paths:
+        if not path.endswith(".bin"):
+            continue
+        chunk_columns, data, _ = read_chunk(path)
+        columns.extend(column for column in chunk_columns if column not in columns)
+        rows += len(data)
+    return columns, rows
+
+
+def iter_points(paths: List[str]) -> Iterator[Dict]:
+    """按顺序逐个读出分块中的数据点（恢复为嵌套字典，NaN恢复为None），只在内存中保留一个分块的映射"""
+    for path in paths:
+        if not path.endswith(".bin"):
+            continue
+        columns, data, labels = read_chunk(path)
+        for row in data:
+            data_point = {}
+            for index, (key, value) in enumerate(zip(columns, row.tolist())):
+                if value != value:
+                    value = None
+                elif index in labels:
+                    value = labels[index][int(value)]
+                if len(key) == 1:
+                    data_point[key[0]] = value
+                else:
+                    data_point.setdefault(key[0], {})[key[1]] = value
+            yield data_point
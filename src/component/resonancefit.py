@@ -0,0 +1,223 @@
+import numpy as np
+from typing import Optional
+
+
+MODELS = {
+    'oscillator': "阻尼振子",
+    'lorentzian': "复洛伦兹",
+}
+
+
+def half_power_width(frequencies, amplitudes) -> Optional[float]:
+    """由R曲线的半功率点（最大R/√2）线性插值估计线宽（Hz），峰两侧找不到半功率点时返回None"""
+    f = np.asarray(frequencies, dtype=float)
+    r = np.asarray(amplitudes, dtype=float)
+    if len(f) < 3:
+        return None
+    peak = int(np.argmax(r))
+    half = r[peak] / np.sqrt(2)
+    below_left = np.nonzero(r[:peak] < half)[0]
+    below_right = np.nonzero(r[peak + 1:] < half)[0]
+    if len(below_left) == 0 or len(below_right) == 0:
+        return None
+    i = below_left[-1]
+    k = peak + 1 + below_right[0]
+    f_left = np.interp(half, [r[i], r[i + 1]], [f[i], f[i + 1]])
+    f_right = np.interp(half, [r[k], r[k - 1]], [f[k], f[k - 1]])
+    return float(f_right - f_left)
+
+
+def response(model: str, frequencies, f0: float, linewidth: float) -> np.ndarray:
+    """
+    归一化的复响应 g(f)，共振处 g(f0)=1，|g|²的半高宽为 linewidth（Hz）
+
+    'oscillator':  g = j f γ / (f0² - f² + j f γ)        （阻尼谐振子，γ = f0/Q）
+    'lorentzian':  g = γ / (γ + 2j (f - f0))             （共振附近的复洛伦兹近似）
+    """
+    f = np.asarray(frequencies, dtype=float)
+    if model == 'oscillator':
+        return 1j * f * linewidth / (f0 ** 2 - f ** 2 + 1j * f * linewidth)
+    return linewidth / (linewidth + 2j * (f - f0))
+
+
+def _response_derivatives(model, f, f0, linewidth):
+    """返回 g, dg/df0, dg/dγ"""
+    if model == 'oscillator':
+        damping = 1j * f * linewidth
+        denominator = f0 ** 2 - f ** 2 + damping
+        g = damping / denominator
+        d_f0 = -damping * 2 * f0 / denominator ** 2
+        d_width = 1j * f * (f0 ** 2 - f ** 2) / denominator ** 2
+    else:
+        denominator = linewidth + 2j * (f - f0)
+        g = linewidth / denominator
+        d_f0 = 2j * linewidth / denominator ** 2
+        d_width = 2j * (f - f0) / denominator ** 2
+    return g, d_f0, d_width
+
+
+class ResonanceFitter:
+    """
+    共振曲线拟合器：用 Z = A·g(f) + B 拟合锁相放大器的 X + jY
+
+    A 为共振处的复振幅（幅度和相位），B 为复背景，g(f) 见 response()。
+    拟合为向量化的Levenberg-Marquardt迭代（6个实参数：f0, γ, Re/Im A, Re/Im B），
+    每次 update() 以上一次的解为初值，扫描过程中逐点更新时只需几次迭代；
+    初值无效或热启动不收敛时从数据重新估计初值。
+    """
+
+    def __init__(self, model: str = 'oscillator', max_iterations: int = 50, min_points: int = 7):
+        """
+        初始化拟合器
+
+        Args:
+            model: 'oscillator'（阻尼振子）或 'lorentzian'（复洛伦兹）
+            max_iterations: 每次拟合的最大迭代次数
+            min_points: 开始拟合所需的最少数据点数
+        """
+        if model not in MODELS:
+            raise ValueError(f"未知的拟合模型: {model}")
+        self.model = model
+        self.max_iterations = max_iterations
+        self.min_points = min_points
+        self.params = None      # [f0, γ, Re A, Im A, Re B, Im B]
+        self.result = None
+
+    def reset(self):
+        """清除上一次的解，下次拟合从数据重新估计初值"""
+        self.params = None
+        self.result = None
+
+    def _initial_guess(self, f, z):
+        """由数据估计初值：两端点的平均作背景，|Z-B|最大处作共振，半功率宽度作线宽"""
+        background = (z[0] + z[-1]) / 2
+        signal = z - background
+        peak = int(np.argmax(np.abs(signal)))
+        width = half_power_width(f, np.abs(signal))
+        if width is None or width <= 0:
+            width = (f[-1] - f[0]) / 10
+        amplitude = signal[peak]
+        return np.array([f[peak], width, amplitude.real, amplitude.imag,
+                         background.real, background.imag])
+
+    def _residual(self, params, f, z):
+        f0, width, ar, ai, br, bi = params
+        return (ar + 1j * ai) * response(self.model, f, f0, width) + (br + 1j * bi) - z
+
+    def _jacobian(self, params, f):
+        f0, width, ar, ai = params[:4]
+        amplitude = ar + 1j * ai
+        g, d_f0, d_width = _response_derivatives(self.model, f, f0, width)
+        ones = np.ones_like(g)
+        columns = np.stack([amplitude * d_f0, amplitude * d_width, g, 1j * g, ones, 1j * ones], axis=1)
+        return np.concatenate([columns.real, columns.imag])
+
+    def _valid(self, params, f):
+        f0, width = params[:2]
+        span = f[-1] - f[0]
+        return width > 0 and f[0] - span <= f0 <= f[-1] + span
+
+    def _levenberg_marquardt(self, params, f, z):
+        """返回 (参数, 残差平方和, 迭代次数)；参数变化足够小时停止"""
+        residual = self._residual(params, f, z)
+        cost = float(np.vdot(residual, residual).real)
+        damping = 1e-3
+        iterations = 0
+        for iterations in range(1, self.max_iterations + 1):
+            jacobian = self._jacobian(params, f)
+            r = np.concatenate([residual.real, residual.imag])
+            normal = jacobian.T @ jacobian
+            gradient = jacobian.T @ r
+            scale = np.diag(normal).copy()
+            scale[scale == 0] = 1.0
+            improved = False
+            while damping < 1e10:
+                try:
+                    step = np.linalg.solve(normal + damping * np.diag(scale), -gradient)
+                except np.linalg.LinAlgError:
+                    damping *= 10
+                    continue
+                candidate = params + step
+                if self._valid(candidate, f):
+                    candidate_residual = self._residual(candidate, f, z)
+                    candidate_cost = float(np.vdot(candidate_residual, candidate_residual).real)
+                    if candidate_cost < cost:
+                        improved = True
+                        break
+                damping *= 10
+            if not improved:
+                break
+            converged = np.all(np.abs(step) <= 1e-9 * (np.abs(params) + 1e-12)) or \
+                cost - candidate_cost <= 1e-12 * cost
+            params, residual, cost = candidate, candidate_residual, candidate_cost
+            damping = max(damping / 10, 1e-12)
+            if converged:
+                break
+        return params, cost, iterations
+
+    def update(self, frequencies, x, y) -> Optional[dict]:
+        """
+        用当前的全部数据更新拟合，以上一次的解为初值
+
+        Args:
+            frequencies: 频率数组（Hz），不要求有序
+            x, y: SR830的X、Y数组（V）
+
+        Returns:
+            dict: 拟合结果（见 fit_result()），数据点不足或拟合失败时返回None
+        """
+        f = np.asarray(frequencies, dtype=float)
+        z = np.asarray(x, dtype=float) + 1j * np.asarray(y, dtype=float)
+        if len(f) < self.min_points:
+            return None
+        order = np.argsort(f)
+        f, z = f[order], z[order]
+        if f[-1] <= f[0]:
+            return None
+
+        candidates = []
+        if self.params is not None and self._valid(self.params, f):
+            candidates.append(self.params)
+        candidates.append(self._initial_guess(f, z))
+
+        best = None
+        for start in candidates:
+            params, cost, iterations = self._levenberg_marquardt(start, f, z)
+            if best is None or cost < best[1]:
+                best = (params, cost, iterations)
+            # 热启动的结果与数据吻合（残差小于信号的1%）时不再冷启动
+            signal = np.abs(params[2] + 1j * params[3])
+            if cost <= (0.01 * signal) ** 2 * len(f):
+                break
+        params, cost, iterations = best
+        if not self._valid(params, f):
+            return None
+        self.params = params
+        self.result = self.fit_result(len(f), cost, iterations)
+        return self.result
+
+    def fit_result(self, points: int = 0, cost: float = 0.0, iterations: int = 0) -> Optional[dict]:
+        """以字典返回当前的解：f0, Q, linewidth（Hz）, amplitude（V）, phase（°）, background（复数，V）等"""
+        if self.params is None:
+            return None
+        f0, width, ar, ai, br, bi = self.params
+        amplitude = complex(ar, ai)
+        return {
+            'model': self.model,
+            'f0': float(f0),
+            'Q': float(f0 / width),
+            'linewidth': float(width),
+            'amplitude': abs(amplitude),
+            'phase': float(np.degrees(np.angle(amplitude))),
+            'background': complex(br, bi),
+            'rms_residual': float(np.sqrt(cost / points)) if points else 0.0,
+            'points': points,
+            'iterations': iterations,
+        }
+
+    def evaluate(self, frequencies) -> Optional[np.ndarray]:
+        """在给定频率上计算拟合曲线 X + jY"""
+        if self.params is None:
+            return None
+        f0, width, ar, ai, br, bi = self.params
+        return complex(ar, ai) * response(self.model, frequencies, f0, width) + complex(br, bi)
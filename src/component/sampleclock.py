@@ -0,0 +1,106 @@
+import math
+import time
+import threading
+from typing import Dict, Optional
+
+
+class SampleClock:
+    """
+    按绝对截止时间调度的采样时钟
+
+    第 n 个采样点的计划时刻固定为 起始时刻 + n × period（time.perf_counter()，单调时钟），
+    每次等待的是下一个计划时刻而不是一个固定的时长，采集本身的耗时不会累积成漂移：
+    period = 1 s 时一天正好 86400 个采样点。
+
+    采集耗时超过一个周期（到等待时已过了下一个计划时刻）记为一次超时，之后的处理方式：
+        'catchup'  不丢点，立即采集已到期的采样点直到追上计划（这些点的抖动较大）
+        'skip'     丢弃已到期的采样点，等待下一个未来的计划时刻，计入 skipped
+    """
+
+    POLICIES = {
+        'catchup': "补采",
+        'skip': "跳过",
+    }
+
+    def __init__(self, period: float, policy: str = 'catchup', duration: Optional[float] = None):
+        """
+        Args:
+            period: 采样周期（秒）
+            policy: 超时后的处理方式，'catchup' 或 'skip'
+            duration: 总时长（秒），计划时刻到达该时长后 wait() 返回None；None表示无限制
+        """
+        if period <= 0:
+            raise ValueError(f"采样周期必须大于0: {period}")
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的超时处理方式: {policy}")
+        self.period = period
+        self.policy = policy
+        self.duration = duration
+        self._cancelled = threading.Event()
+        self.start()
+
+    def start(self):
+        """以当前时刻为第0个采样点的计划时刻，清零计数"""
+        self.start_perf = time.perf_counter()
+        self.start_wall = time.time()
+        self.index = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.max_jitter = 0.0
+        self._cancelled.clear()
+
+    def cancel(self):
+        """中断正在进行的等待（用于停止记录），之后的 wait() 立即返回None"""
+        self._cancelled.set()
+
+    def elapsed(self) -> float:
+        """从起始时刻起经过的时间（秒）"""
+        return time.perf_counter() - self.start_perf
+
+    def wait(self) -> Optional[Dict]:
+        """
+        等待到下一个采样点的计划时刻
+
+        Returns:
+            dict: index（采样序号）、scheduled/actual（相对起始时刻的计划/实际时间，秒）、
+                  scheduled_timestamp/timestamp（对应的绝对时间戳）、jitter（实际-计划，秒）；
+                  被 cancel() 中断或到达总时长时返回None
+        """
+        now = time.perf_counter()
+        if self.index > 0 and now > self._deadline(self.index):
+            # 上一次采集越过了这一个采样点的计划时刻
+            self.overruns += 1
+            if self.policy == 'skip':
+                upcoming = math.ceil((now - self.start_perf) / self.period)
+                self.skipped += upcoming - self.index
+                self.index = upcoming
+        if self.duration is not None and self.index * self.period >= self.duration:
+            return None
+        deadline = self._deadline(self.index)
+        if self._cancelled.wait(max(0.0, deadline - now)):
+            return None
+
+        actual = time.perf_counter() - self.start_perf
+        scheduled = self.index * self.period
+        jitter = actual - scheduled
+        self.max_jitter = max(self.max_jitter, jitter)
+        tick = {
+            'index': self.index,
+            'scheduled': scheduled,
+            'actual': actual,
+            'scheduled_timestamp': self.start_wall + scheduled,
+            'timestamp': self.start_wall + actual,
+            'jitter': jitter,
+        }
+        self.index += 1
+        return tick
+
+    def _deadline(self, index: int) -> float:
+        return self.start_perf + index * self.period
+
+    def summary(self) -> str:
+        """采样统计的简短说明"""
+        text = f"共 {self.index - self.skipped} 个采样点，超时 {self.overruns} 次"
+        if self.skipped:
+            text += f"，跳过 {self.skipped} 个"
+        return text + f"，最大抖动 {self.max_jitter * 1e3:.1f} ms"
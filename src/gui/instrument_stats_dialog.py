@@ -0,0 +1,119 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QPushButton, QCheckBox, QLabel, QFileDialog, QMessageBox, QHeaderView
+)
+from PySide6.QtCore import QTimer, Qt
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from instruments import instrumentation
+
+
+class InstrumentStatsDialog(QDialog):
+    """仪器通信统计窗口：显示每条命令的调用次数和延迟分位数（p50/p95/p99），可导出报告"""
+
+    COLUMNS = [("instrument", "仪器"), ("command", "命令"), ("calls", "次数"),
+               ("calls_per_second", "次/秒"), ("mean", "平均(ms)"), ("p50", "p50(ms)"),
+               ("p95", "p95(ms)"), ("p99", "p99(ms)"), ("max", "最大(ms)"), ("total", "总计(s)")]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("仪器通信统计")
+        self.resize(900, 420)
+        self.init_ui()
+
+        # 窗口显示期间每秒刷新一次
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        control_layout = QHBoxLayout()
+        self.enable_checkbox = QCheckBox("记录通信延迟")
+        self.enable_checkbox.setChecked(instrumentation.is_enabled())
+        self.enable_checkbox.toggled.connect(self.on_enable_toggled)
+        control_layout.addWidget(self.enable_checkbox)
+
+        self.rate_label = QLabel()
+        control_layout.addWidget(self.rate_label, 1)
+
+        reset_button = QPushButton("清空")
+        reset_button.clicked.connect(self.reset_stats)
+        control_layout.addWidget(reset_button)
+
+        export_button = QPushButton("导出报告...")
+        export_button.clicked.connect(self.export_report)
+        control_layout.addWidget(export_button)
+        layout.addLayout(control_layout)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for _, title in self.COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+
+    def on_enable_toggled(self, checked):
+        """开启/关闭延迟记录"""
+        if checked:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+
+    def reset_stats(self):
+        """清空已记录的统计"""
+        instrumentation.reset()
+        self.refresh()
+
+    def refresh(self):
+        """刷新统计表格"""
+        rates = instrumentation.calls_per_second()
+        self.rate_label.setText("    ".join(f"{instrument}: {rate:.1f} 次/秒"
+                                           for instrument, rate in rates.items()))
+
+        rows = instrumentation.summary()
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column_index, (key, _) in enumerate(self.COLUMNS):
+                value = row[key]
+                if key in ("mean", "p50", "p95", "p99", "max"):
+                    text = f"{value * 1e3:.3f}"
+                elif key == "calls_per_second":
+                    text = f"{value:.2f}"
+                elif key == "total":
+                    text = f"{value:.3f}"
+                else:
+                    text = str(value)
+                item = QTableWidgetItem(text)
+                if key not in ("instrument", "command"):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row_index, column_index, item)
+
+    def export_report(self):
+        """导出CSV或JSON格式的统计报告"""
+        filepath, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出通信统计", "instrument_latency.csv",
+            "CSV文件 (*.csv);;JSON文件 (*.json)")
+        if not filepath:
+            return
+        try:
+            if filepath.lower().endswith(".json") or (selected_filter.startswith("JSON")
+                                                      and not filepath.lower().endswith(".csv")):
+                instrumentation.export_json(filepath)
+            else:
+                instrumentation.export_csv(filepath)
+            QMessageBox.information(self, "导出成功", f"统计报告已保存到:\n{filepath}")
+        except Exception as e:
+            QMessageBox.critical(self, "导出失败", f"保存统计报告失败: {e}")
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
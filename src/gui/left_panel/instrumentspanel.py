@@ -3,8 +3,9 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QGroupBox,
                              QHBoxLayout, QLabel, QMessageBox, QDialog,
                              QComboBox, QLineEdit, QPushButton as QPushBtn)
 from PySide6.QtCore import Signal, Qt
+from PySide6.QtGui import QColor
 
-import pyvisa
+from instruments.resourcemanager import list_resources
 
 
 class AddInstrumentDialog(QDialog):
@@ -61,7 +62,7 @@ class AddInstrumentDialog(QDialog):
         self.refresh_btn = QPushBtn("🔄")
         self.refresh_btn.setFixedSize(30, 30)
         self.refresh_btn.setToolTip("刷新设备列表")
-        self.refresh_btn.clicked.connect(self.refresh_visa_resources)
+        self.refresh_btn.clicked.connect(lambda: self.refresh_visa_resources(refresh=True))
         refresh_layout.addWidget(self.refresh_btn)
         refresh_layout.addStretch()
         
@@ -143,12 +144,15 @@ class AddInstrumentDialog(QDialog):
             }
         """)
     
-    def refresh_visa_resources(self):
-        """刷新VISA资源列表"""
+    def refresh_visa_resources(self, refresh=False):
+        """刷新VISA资源列表
+        
+        Args:
+            refresh: 为True时重新扫描VISA总线，否则使用上次扫描的缓存结果
+        """
         self.devices_list.clear()
         try:
-            rm = pyvisa.ResourceManager()
-            resources = rm.list_resources()
+            resources = list_resources(refresh=refresh)
             
             if resources:
                 for resource in resources:
@@ -181,13 +185,21 @@ class PyInstrumentsPanel(QWidget):
     # 定义信号
     instrument_added = Signal(str)  # 当添加仪器时发出信号
     instrument_removed = Signal(str)  # 当移除仪器时发出信号
+    # 仪器连接状态信号 (事件, 仪器类型, 仪器地址, 信息)，由后台连接线程发出，在主线程处理
+    connection_event = Signal(str, str, str, str)
     
     def __init__(self, instruments_control=None):
         super().__init__()
         self.instruments_control = instruments_control
+        self._dialog_adds = set()  # 通过添加对话框发起、尚未完成连接的仪器地址
         self.init_set()
         # 初始化时加载已有仪器
         self.load_existing_instruments()
+        
+        # 后台连接线程的状态通知通过信号转发到主线程
+        self.connection_event.connect(self.on_connection_event)
+        if self.instruments_control:
+            self.instruments_control.add_listener(self.connection_event.emit)
             
 
     def init_set(self):
@@ -269,16 +281,13 @@ class PyInstrumentsPanel(QWidget):
             instrument_type = selection['type']
             instrument_address = selection['address']
             
-            if instrument_address.strip():
-                # 使用InstrumentsControl添加仪器
-                success, error_msg = self.instruments_control.add_instrument(instrument_type, instrument_address.strip())
-                
-                if success:
-                    self.add_instrument_to_list(instrument_type, instrument_address.strip())
-                    self.instrument_added.emit(f"{instrument_type}:{instrument_address.strip()}")
-                    QMessageBox.information(self, "成功", f"仪器 {instrument_type} ({instrument_address.strip()}) 添加成功")
-                else:
-                    QMessageBox.critical(self, "错误", f"添加仪器失败:\n{error_msg}")
+            if instrument_address.strip() in self.instruments_control.instruments_instance:
+                QMessageBox.information(self, "提示", f"仪器 {instrument_address.strip()} 已连接")
+            elif instrument_address.strip():
+                # 在后台连接仪器，不阻塞界面；结果由连接状态通知(on_connection_event)提示
+                self._dialog_adds.add(instrument_address.strip())
+                self.instruments_control.connect_instrument_async(instrument_type, instrument_address.strip(),
+                                                                  reconnect=False)
     
     def add_instrument_to_list(self, instrument_type, instrument_address):
         """添加仪器到列表"""
@@ -295,6 +304,46 @@ class PyInstrumentsPanel(QWidget):
         print(f"Debug: 存储的数据: {stored_data}, 类型: {type(stored_data)}")
         print(f"Debug: 列表中现在有 {self.instruments_list.count()} 个仪器")
     
+    def find_instrument_item(self, instrument_address):
+        """根据地址查找列表中的仪器项"""
+        for i in range(self.instruments_list.count()):
+            item = self.instruments_list.item(i)
+            data = item.data(Qt.UserRole)
+            if isinstance(data, dict) and data.get('address') == instrument_address:
+                return item
+        return None
+    
+    def on_connection_event(self, event, instrument_type, instrument_address, message):
+        """处理后台连接状态：仪器连接成功后出现在列表中，连接中/重连中的仪器显示为灰色/红色"""
+        item = self.find_instrument_item(instrument_address)
+        if event == "removed":
+            self._dialog_adds.discard(instrument_address)
+            if item is not None:
+                self.instruments_list.takeItem(self.instruments_list.row(item))
+            return
+            
+        if item is None:
+            self.add_instrument_to_list(instrument_type, instrument_address)
+            item = self.find_instrument_item(instrument_address)
+            
+        if event == "connected":
+            item.setForeground(QColor("black"))
+            item.setToolTip("已连接")
+            self.instrument_added.emit(f"{instrument_type}:{instrument_address}")
+            if instrument_address in self._dialog_adds:
+                self._dialog_adds.discard(instrument_address)
+                QMessageBox.information(self, "成功", f"仪器 {instrument_type} ({instrument_address}) 添加成功")
+        elif event == "connecting":
+            item.setForeground(QColor("gray"))
+            item.setToolTip("正在连接...")
+        else:
+            # failed / reconnecting
+            item.setForeground(QColor("#c0392b"))
+            item.setToolTip(f"未连接: {message}" if message else "未连接")
+            if event == "failed" and instrument_address in self._dialog_adds:
+                self._dialog_adds.discard(instrument_address)
+                QMessageBox.critical(self, "错误", f"添加仪器失败:\n{message}")
+    
     def remove_instrument(self, item):
         """移除仪器"""
         if not item or not self.instruments_control:
@@ -338,6 +387,14 @@ class PyInstrumentsPanel(QWidget):
             else:
                 QMessageBox.critical(self, "错误", f"移除仪器失败")
     
+    def reconnect_instrument(self, item):
+        """在后台重新连接仪器"""
+        data = item.data(Qt.UserRole)
+        if not isinstance(data, dict) or not self.instruments_control:
+            return
+        if not self.instruments_control.reconnect(data['address']):
+            QMessageBox.critical(self, "错误", f"无法重新连接仪器 {data['address']}")
+    
     def show_context_menu(self, position):
         """显示右键菜单"""
         item = self.instruments_list.itemAt(position)
@@ -345,6 +402,9 @@ class PyInstrumentsPanel(QWidget):
             from PySide6.QtWidgets import QMenu
             menu = QMenu(self)
             
+            reconnect_action = menu.addAction("重新连接")
+            reconnect_action.triggered.connect(lambda: self.reconnect_instrument(item))
+            
             remove_action = menu.addAction("删除仪器")
             remove_action.triggered.connect(lambda: self.remove_instrument(item))
             
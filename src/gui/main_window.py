@@ -1,22 +1,25 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, 
     QSplitter, QMenuBar, QMenu, QStatusBar, QMessageBox,
-    QFileDialog, QProgressBar
+    QFileDialog, QProgressBar, QInputDialog, QProgressDialog
 )
 from PySide6.QtGui import QAction, QIcon, QDragEnterEvent, QDropEvent, QCloseEvent
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QEventLoop, QCoreApplication
 
 from .left_column import PyLeftColumn
 from .right_column import PyRightColumn
 from .left_panel.left_panel import PyLeftPanel
 from .right_panel.right_panel import PyRightPanel
 from .plot_widget.plot_widget import PyFigureWindow
+from .instrument_stats_dialog import InstrumentStatsDialog
 
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from instruments.instrumentscontrol import InstrumentsControl
+from instruments import traffic
+from component.exportservice import ExportService
 
 
 class MainWindow(QMainWindow):
@@ -25,12 +28,16 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.current_file_path = None
+        self.stats_dialog = None
         
-        self.instruments_control = InstrumentsControl()
+        # 仪器在窗口显示后于后台并行连接，连接成功后通过信号出现在界面中
+        self.instruments_control = InstrumentsControl(autoconnect=False)
 
         self.init_ui()
         self.connect_data_signals()
         
+        self.instruments_control.init_instruments_async()
+        
     def init_ui(self):
         """初始化用户界面"""
         self.setGeometry(100, 100, 1400, 900)
@@ -51,6 +58,31 @@ class MainWindow(QMainWindow):
         """连接数据信号"""
         # 当右侧面板切换时，同时处理图表更新
         self.right_column.panel_changed.connect(self.on_panel_changed)
+        
+        # 仪器连接状态显示在状态栏
+        self.left_panel.instruments_panel.connection_event.connect(self.on_instrument_connection_event)
+        
+        # 仪器连接或移除后刷新各面板的仪器列表（重连后的仪器是新实例，面板不能继续使用已关闭的实例）
+        self.left_panel.instruments_panel.connection_event.connect(self.on_instruments_changed)
+        
+    def on_instrument_connection_event(self, event, instrument_type, instrument_address, message):
+        """在状态栏显示后台仪器连接的进展"""
+        messages = {
+            "connecting": f"正在连接 {instrument_type} ({instrument_address})...",
+            "connected": f"{instrument_type} ({instrument_address}) 已连接",
+            "failed": f"{instrument_type} ({instrument_address}) 连接失败",
+            "reconnecting": f"{instrument_type} ({instrument_address}) 未连接，{message}",
+            "removed": f"{instrument_type} ({instrument_address}) 已移除",
+        }
+        if event in messages:
+            self.status_bar.showMessage(messages[event], 5000)
+            
+    def on_instruments_changed(self, event, instrument_type, instrument_address, message):
+        """仪器连接成功或被移除后刷新扫频和频率追踪面板的仪器列表（PID控制器随频率追踪面板更新）"""
+        if event not in ("connected", "removed"):
+            return
+        self.right_panel.fre_sweeper.refresh_instruments()
+        self.right_panel.fre_track.refresh_instruments()
 
     def create_menu_bar(self):
         """创建菜单栏"""
@@ -71,12 +103,76 @@ class MainWindow(QMainWindow):
         setting_action = QAction("设置(&A)", self)
         edit_menu.addAction(setting_action)
 
+        # 工具菜单
+        tools_menu = menubar.addMenu("工具(&T)")
+        stats_action = QAction("通信统计(&S)", self)
+        stats_action.setStatusTip("查看各仪器命令的调用次数和延迟分布")
+        stats_action.triggered.connect(self.show_instrument_stats)
+        tools_menu.addAction(stats_action)
+
+        tools_menu.addSeparator()
+        self.traffic_record_action = QAction("录制仪器通信(&R)...", self)
+        self.traffic_record_action.setCheckable(True)
+        self.traffic_record_action.setStatusTip("将所有仪器的命令、响应和耗时录制到文件，供离线回放")
+        self.traffic_record_action.toggled.connect(self.toggle_traffic_recording)
+        tools_menu.addAction(self.traffic_record_action)
+
+        replay_action = QAction("加载回放文件(&L)...", self)
+        replay_action.setStatusTip("加载通信录制文件，之后可添加REPLAY::<地址>仪器离线运行")
+        replay_action.triggered.connect(self.load_traffic_replay)
+        tools_menu.addAction(replay_action)
+
         # 帮助菜单
         help_menu = menubar.addMenu("帮助(&H)")
         
         about_action = QAction("关于(&A)", self)
         help_menu.addAction(about_action)
 
+    def show_instrument_stats(self):
+        """显示仪器通信统计窗口"""
+        if self.stats_dialog is None:
+            self.stats_dialog = InstrumentStatsDialog(self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+        self.stats_dialog.activateWindow()
+
+    def toggle_traffic_recording(self, checked):
+        """开始/停止录制仪器通信"""
+        if not checked:
+            traffic.stop_recording()
+            self.status_bar.showMessage("仪器通信录制已停止", 5000)
+            return
+        filepath, _ = QFileDialog.getSaveFileName(
+            self, "录制仪器通信", "instrument_traffic.jsonl", "通信录制文件 (*.jsonl)")
+        if not filepath:
+            self.traffic_record_action.setChecked(False)
+            return
+        try:
+            traffic.start_recording(filepath)
+            self.status_bar.showMessage(f"正在录制仪器通信到 {filepath}")
+        except Exception as e:
+            self.traffic_record_action.setChecked(False)
+            QMessageBox.critical(self, "录制失败", f"无法创建录制文件: {e}")
+
+    def load_traffic_replay(self):
+        """加载通信录制文件作为回放仪器的数据源"""
+        filepath, _ = QFileDialog.getOpenFileName(
+            self, "加载回放文件", "", "通信录制文件 (*.jsonl)")
+        if not filepath:
+            return
+        speed, ok = QInputDialog.getDouble(
+            self, "回放速度", "回放速度倍数（1为原始速度，0为不等待）:", 1.0, 0.0, 1000.0, 1)
+        if not ok:
+            return
+        try:
+            session = traffic.load_replay(filepath, speed)
+        except Exception as e:
+            QMessageBox.critical(self, "加载失败", f"无法加载回放文件: {e}")
+            return
+        addresses = "\n".join(f"{traffic.REPLAY_PREFIX}{address}" for address in session.instruments())
+        QMessageBox.information(self, "回放文件已加载",
+                                f"可以添加以下地址的仪器进行离线回放:\n{addresses}")
+
     def create_central_widget(self):
         """创建中央部件"""
         # 创建水平分割器
@@ -189,6 +285,49 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(False)
         self.status_bar.addPermanentWidget(self.progress_bar)
 
+    def wait_for_recording(self, record_thread):
+        """等待已停止的数据记录线程结束（界面保持响应），并处理它最后发出的记录完成信号，
+        使自动保存在等待导出前提交到导出服务"""
+        if record_thread is None:
+            return
+            
+        loop = QEventLoop()
+        record_thread.finished.connect(loop.quit)
+        if record_thread.isRunning():
+            loop.exec()
+        record_thread.finished.disconnect(loop.quit)
+        # 记录线程的 recording_finished 是排队信号，在这里送达面板（提交自动保存）
+        QCoreApplication.processEvents()
+        
+    def wait_for_exports(self):
+        """显示进度对话框等待后台数据导出完成（界面保持响应），可在对话框中取消全部导出"""
+        export_service = ExportService.instance()
+        if not export_service.pending():
+            return
+            
+        dialog = QProgressDialog(f"正在等待 {export_service.pending()} 个数据导出任务完成...",
+                                 "取消导出", 0, 0, self)
+        dialog.setWindowTitle("退出")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+        
+        loop = QEventLoop()
+        
+        def on_queue_changed(pending):
+            if pending:
+                dialog.setLabelText(f"正在等待 {pending} 个数据导出任务完成...")
+            else:
+                loop.quit()
+                
+        export_service.queue_changed.connect(on_queue_changed)
+        dialog.canceled.connect(export_service.cancel_all)
+        dialog.show()
+        # 任务可能在连接信号前已完成
+        if export_service.pending():
+            loop.exec()
+        export_service.queue_changed.disconnect(on_queue_changed)
+        dialog.close()
+        
     def closeEvent(self, event: QCloseEvent):
         """关闭事件"""
         reply = QMessageBox.question(
@@ -207,16 +346,22 @@ class MainWindow(QMainWindow):
                     hasattr(current_panel_widget, 'is_recording') and 
                     current_panel_widget.is_recording):
                     current_panel_widget.stop_recording()
+                    self.wait_for_recording(current_panel_widget.data_record_thread)
                     
                 # 停止图表更新
                 self.plot_widget.stop_data_record_updates()
                 
             except Exception as e:
                 print(f"停止数据记录时出错: {e}")
+                
+            # 等待后台数据导出（包括停止记录后的自动保存）完成，避免退出时丢失未写完的数据
+            self.wait_for_exports()
+            ExportService.instance().shutdown()
             
             # 在关闭窗口前清理所有仪器连接
             try:
                 if hasattr(self, 'instruments_control'):
+                    traffic.stop_recording()
                     success = self.instruments_control.close_all_instruments()
                     if success:
                         self.status_bar.showMessage("所有仪器连接已关闭")
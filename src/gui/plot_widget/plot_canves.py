@@ -10,6 +10,7 @@ from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 from matplotlib.style import use
 import matplotlib.pyplot as plt
+import numpy as np
 
 mpl.use("QtAgg")
 plt.rcParams['font.family'] = ['SimHei']
@@ -81,7 +82,7 @@ class PyFigureCanvas(QWidget):
         """更新数据记录图表
         
         Args:
-            plot_data: 包含两个图表数据的字典
+            plot_data: 包含两个图表数据的字典（x、y为列表或NumPy数组）
                 {
                     'plot1': {'x': [...], 'y': [...]},
                     'plot2': {'x': [...], 'y': [...]},
@@ -93,7 +94,7 @@ class PyFigureCanvas(QWidget):
             
         try:
             # 更新图表1
-            if 'plot1' in plot_data and plot_data['plot1']['x'] and plot_data['plot1']['y']:
+            if 'plot1' in plot_data and len(plot_data['plot1']['x']) and len(plot_data['plot1']['y']):
                 x1_data = plot_data['plot1']['x']
                 y1_data = plot_data['plot1']['y']
                 
@@ -105,9 +106,9 @@ class PyFigureCanvas(QWidget):
                 self.line1.set_data(x1_data, y1_data)
                 
                 # 更新轴范围
-                if self.auto_scale and x1_data and y1_data:
-                    # 处理x轴范围
-                    x_min, x_max = min(x1_data), max(x1_data)
+                if self.auto_scale and np.isfinite(x1_data).any() and np.isfinite(y1_data).any():
+                    # 处理x轴范围（缺失值为NaN）
+                    x_min, x_max = np.nanmin(x1_data), np.nanmax(x1_data)
                     if x_min == x_max:
                         # 当只有一个点或所有点x值相同时，设置一个合理的范围
                         x_range = max(1.0, abs(x_min) * 0.1)  # 设置为绝对值的10%或最小1.0
@@ -116,7 +117,7 @@ class PyFigureCanvas(QWidget):
                         self.ax1.set_xlim(x_min, x_max)
                     
                     # 处理y轴范围
-                    y_min, y_max = min(y1_data), max(y1_data)
+                    y_min, y_max = np.nanmin(y1_data), np.nanmax(y1_data)
                     if y_min == y_max:
                         # 当所有y值相同时，设置一个合理的范围
                         y_range = max(0.1, abs(y_min) * 0.1)
@@ -126,7 +127,7 @@ class PyFigureCanvas(QWidget):
                         self.ax1.set_ylim(y_min - margin, y_max + margin)
             
             # 更新图表2
-            if 'plot2' in plot_data and plot_data['plot2']['x'] and plot_data['plot2']['y']:
+            if 'plot2' in plot_data and len(plot_data['plot2']['x']) and len(plot_data['plot2']['y']):
                 x2_data = plot_data['plot2']['x']
                 y2_data = plot_data['plot2']['y']
                 
@@ -138,9 +139,9 @@ class PyFigureCanvas(QWidget):
                 self.line2.set_data(x2_data, y2_data)
                 
                 # 更新轴范围
-                if self.auto_scale and x2_data and y2_data:
-                    # 处理x轴范围
-                    x_min, x_max = min(x2_data), max(x2_data)
+                if self.auto_scale and np.isfinite(x2_data).any() and np.isfinite(y2_data).any():
+                    # 处理x轴范围（缺失值为NaN）
+                    x_min, x_max = np.nanmin(x2_data), np.nanmax(x2_data)
                     if x_min == x_max:
                         # 当只有一个点或所有点x值相同时，设置一个合理的范围
                         x_range = max(1.0, abs(x_min) * 0.1)  # 设置为绝对值的10%或最小1.0
@@ -149,7 +150,7 @@ class PyFigureCanvas(QWidget):
                         self.ax2.set_xlim(x_min, x_max)
                     
                     # 处理y轴范围
-                    y_min, y_max = min(y2_data), max(y2_data)
+                    y_min, y_max = np.nanmin(y2_data), np.nanmax(y2_data)
                     if y_min == y_max:
                         # 当所有y值相同时，设置一个合理的范围
                         y_range = max(0.1, abs(y_min) * 0.1)
@@ -309,7 +310,10 @@ class PyFigureCanvas(QWidget):
                 {
                     'frequency': [...],
                     'amplitude': [...],
-                    'phase': [...]
+                    'phase': [...],
+                    'fit': {'frequency': [...], 'amplitude': [...], 'phase': [...]}  (可选，拟合曲线)
+                    'traces': [{'label', 'frequency', 'amplitude', 'amplitude_err',
+                                'phase', 'phase_err'}, ...]  (可选，多次扫描的均值曲线，带误差带)
                 }
         """
         if not plot_data or not plot_data.get('frequency'):
@@ -324,19 +328,47 @@ class PyFigureCanvas(QWidget):
             self.ax1.clear()
             self.ax2.clear()
             
-            # 绘制振幅响应
-            self.ax1.semilogx(frequencies, amplitudes, 'b-', linewidth=2, marker='o', markersize=3)
+            traces = plot_data.get('traces')
+            if traces:
+                # 多次扫描：每个方向一条均值曲线，阴影为±1倍标准误差
+                for trace, color in zip(traces, ['b', 'r']):
+                    trace_freq = np.asarray(trace['frequency'])
+                    amplitude = np.asarray(trace['amplitude'])
+                    amplitude_err = np.asarray(trace['amplitude_err'])
+                    phase = np.asarray(trace['phase'])
+                    phase_err = np.asarray(trace['phase_err'])
+                    self.ax1.semilogx(trace_freq, amplitude, color + '-', linewidth=1.5,
+                                      marker='o', markersize=2, label=trace['label'])
+                    self.ax1.fill_between(trace_freq, amplitude - amplitude_err, amplitude + amplitude_err,
+                                          color=color, alpha=0.2)
+                    self.ax2.semilogx(trace_freq, phase, color + '-', linewidth=1.5,
+                                      marker='s', markersize=2, label=trace['label'])
+                    self.ax2.fill_between(trace_freq, phase - phase_err, phase + phase_err,
+                                          color=color, alpha=0.2)
+                self.ax1.legend(loc='upper right')
+                self.ax2.legend(loc='upper right')
+            else:
+                # 绘制振幅响应
+                self.ax1.semilogx(frequencies, amplitudes, 'b-', linewidth=2, marker='o', markersize=3)
+                # 绘制相位响应
+                self.ax2.semilogx(frequencies, phases, 'r-', linewidth=2, marker='s', markersize=3)
             self.ax1.set_title("频率扫描 - 振幅响应", fontsize=12, fontweight='bold')
             self.ax1.set_ylabel("振幅 (V)")
             self.ax1.grid(True, alpha=0.3)
             
-            # 绘制相位响应
-            self.ax2.semilogx(frequencies, phases, 'r-', linewidth=2, marker='s', markersize=3)
             self.ax2.set_title("频率扫描 - 相位响应", fontsize=12, fontweight='bold')
             self.ax2.set_xlabel("频率 (Hz)")
             self.ax2.set_ylabel("相位 (°)")
             self.ax2.grid(True, alpha=0.3)
             
+            # 叠加拟合曲线
+            fit = plot_data.get('fit')
+            if fit:
+                self.ax1.semilogx(fit['frequency'], fit['amplitude'], 'k--', linewidth=1.5, label='拟合')
+                self.ax2.semilogx(fit['frequency'], fit['phase'], 'k--', linewidth=1.5, label='拟合')
+                self.ax1.legend(loc='upper right')
+                self.ax2.legend(loc='upper right')
+            
             # 自动调整范围
             if len(frequencies) > 0:
                 freq_min, freq_max = min(frequencies), max(frequencies)
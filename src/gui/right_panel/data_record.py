@@ -12,8 +12,13 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from component.datasort import DataRecordThread, DataSort
+from component.sampleclock import SampleClock
+from component.exportservice import ExportJobs
 
 class PyDataRecord(QWidget):
+    # 图表只显示最近的数据点数（与绘图窗口的显示点数一致）
+    PLOT_WINDOW = 1000
+    
     # 信号定义
     recording_started = Signal()  # 开始记录信号
     recording_stopped = Signal()  # 停止记录信号
@@ -27,6 +32,9 @@ class PyDataRecord(QWidget):
         self.data_record_thread = None
         self.data_sort = DataSort()
         
+        # 记录数据在共用的导出服务中后台保存（任务标记：是否为自动保存）
+        self.export_jobs = ExportJobs(self)
+        
         # UI状态
         self.is_recording = False
         
@@ -77,6 +85,22 @@ class PyDataRecord(QWidget):
         self.time_step_spinbox.setDecimals(1)
         layout.addRow("时间步长:", self.time_step_spinbox)
         
+        # SR830内部缓存采样率
+        self.buffer_rate_combo = QComboBox()
+        self.buffer_rate_combo.addItem("关闭 (逐点读取)", None)
+        for rate in [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]:
+            self.buffer_rate_combo.addItem(f"{rate} Hz", float(rate))
+        self.buffer_rate_combo.setToolTip("使用SR830内部缓存按设定采样率采集，每个时间步长批量读取一次")
+        layout.addRow("SR830缓存采样:", self.buffer_rate_combo)
+        
+        # 采集超过一个时间步长后的处理方式
+        self.overrun_policy_combo = QComboBox()
+        for policy, name in SampleClock.POLICIES.items():
+            self.overrun_policy_combo.addItem(name, policy)
+        self.overrun_policy_combo.setToolTip("采样点按固定的计划时刻采集；某次采集超时后，补采：立即采集已到期的点，不丢点；"
+                                             "跳过：丢弃已到期的点，等待下一个计划时刻")
+        layout.addRow("超时处理:", self.overrun_policy_combo)
+        
         # 记录时长设置
         duration_layout = QHBoxLayout()
         self.unlimited_checkbox = QCheckBox("无限时记录")
@@ -200,6 +224,12 @@ class PyDataRecord(QWidget):
         """)
         layout.addWidget(self.save_button)
         
+        # 取消保存按钮，只在有保存任务时显示
+        self.cancel_save_button = QPushButton("取消保存")
+        self.cancel_save_button.setVisible(False)
+        self.cancel_save_button.setToolTip("停止正在进行的保存，已记录的数据保留，可以再次保存")
+        layout.addWidget(self.cancel_save_button)
+        
         group.setLayout(layout)
         parent_layout.addWidget(group)
         
@@ -289,10 +319,15 @@ class PyDataRecord(QWidget):
         self.start_button.clicked.connect(self.start_recording)
         self.stop_button.clicked.connect(self.stop_recording)
         self.save_button.clicked.connect(self.save_data)
+        self.cancel_save_button.clicked.connect(self.cancel_save)
         
         # 无限时记录复选框
         self.unlimited_checkbox.toggled.connect(self.on_unlimited_toggled)
         
+        # 导出服务
+        self.export_jobs.job_progress.connect(self.on_export_progress)
+        self.export_jobs.job_finished.connect(self.on_export_finished)
+        
         # 状态更新定时器
         self.status_timer = QTimer()
         self.status_timer.timeout.connect(self.update_status_display)
@@ -358,10 +393,17 @@ class PyDataRecord(QWidget):
             # 获取记录参数
             time_step = self.time_step_spinbox.value()
             max_duration = None if self.unlimited_checkbox.isChecked() else self.duration_spinbox.value()
+            sr830_sample_rate = self.buffer_rate_combo.currentData()
+            
+            # SR830缓存每通道16383点，时间步长内的采样点必须能放下
+            if sr830_sample_rate and time_step * sr830_sample_rate > 16000:
+                self.add_log(f"错误: 时间步长过长，{sr830_sample_rate:.0f} Hz 采样时时间步长不能超过 {16000 / sr830_sample_rate:.1f}s")
+                return
             
             # 创建记录线程
             self.data_record_thread = DataRecordThread(
-                self.instruments_control, time_step, max_duration
+                self.instruments_control, time_step, max_duration, sr830_sample_rate,
+                self.overrun_policy_combo.currentData()
             )
             
             # 连接信号
@@ -396,6 +438,8 @@ class PyDataRecord(QWidget):
             self.time_label.setText("00:00:00")
             
             self.add_log(f"开始记录 - 时间步长: {time_step}s, 最大时长: {max_duration or '无限'}s")
+            if sr830_sample_rate:
+                self.add_log(f"SR830缓存采样: {sr830_sample_rate:.0f} Hz")
             
             # 发射开始记录信号
             self.recording_started.emit()
@@ -410,48 +454,72 @@ class PyDataRecord(QWidget):
             self.data_record_thread.stop_recording()
             
     def save_data(self):
-        """手动保存数据"""
+        """手动保存数据（后台保存，完成后弹窗）"""
         if not self.data_record_thread:
             return
             
-        try:
-            filename = self.filename_lineedit.text().strip()
-            if not filename:
-                filename = None
-                
-            success, filepath = self.data_record_thread.save_final_data(filename)
-            if success:
-                self.add_log(f"数据保存成功: {filepath}")
-                QMessageBox.information(self, "成功", f"数据已保存到:\n{filepath}")
-                self.save_button.setEnabled(False)  # 保存成功后禁用按钮
-            else:
-                self.add_log("数据保存失败")
-                
-        except Exception as e:
-            self.add_log(f"保存数据时出错: {e}")
-            QMessageBox.critical(self, "错误", f"保存数据失败:\n{e}")
+        if self._submit_save(auto=False) is not None:
+            self.save_button.setEnabled(False)
             
     def _auto_save_data(self):
-        """自动保存数据（无弹窗）"""
+        """自动保存数据（后台保存，无弹窗），返回是否已提交"""
         if not self.data_record_thread:
             return False
             
+        return self._submit_save(auto=True) is not None
+        
+    def _submit_save(self, auto):
+        """把当前记录的最终数据保存提交到导出服务，返回任务编号，提交失败时返回None"""
         try:
             filename = self.filename_lineedit.text().strip()
             if not filename:
                 filename = None
                 
-            success, filepath = self.data_record_thread.save_final_data(filename)
-            if success:
-                self.add_log(f"数据自动保存成功: {filepath}")
-                return True
-            else:
-                self.add_log("数据自动保存失败")
-                return False
-                
+            thread = self.data_record_thread
+            job_id = self.export_jobs.submit(
+                thread.save_final_data, filename, tag=auto,
+                description="保存记录数据", progress=True, cancel=thread.cancel_save
+            )
+            self.cancel_save_button.setVisible(True)
+            return job_id
+            
         except Exception as e:
-            self.add_log(f"自动保存数据时出错: {e}")
-            return False
+            self.add_log(f"保存数据时出错: {e}")
+            if not auto:
+                QMessageBox.critical(self, "错误", f"保存数据失败:\n{e}")
+            return None
+            
+    def cancel_save(self):
+        """取消排队中和正在进行的保存任务"""
+        self.export_jobs.cancel_all()
+        self.add_log("正在取消保存...")
+        
+    def on_export_progress(self, auto, done, total):
+        """导出进度"""
+        if self.is_recording:
+            return
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+        
+    def on_export_finished(self, auto, success, filepath):
+        """导出完成"""
+        self.cancel_save_button.setVisible(bool(self.export_jobs.pending()))
+        if not self.is_recording:
+            self.progress_bar.setVisible(False)
+            
+        if success:
+            self.add_log(f"数据{'自动' if auto else ''}保存成功: {filepath}")
+            self.status_label.setText("数据已保存")
+            self.status_label.setStyleSheet("QLabel { color: #4CAF50; font-weight: bold; }")
+            self.save_button.setEnabled(False)  # 已保存，禁用手动保存按钮
+            if not auto:
+                QMessageBox.information(self, "成功", f"数据已保存到:\n{filepath}")
+        else:
+            self.add_log(f"数据{'自动' if auto else ''}保存失败")
+            self.status_label.setText("保存失败，可手动保存")
+            self.status_label.setStyleSheet("QLabel { color: #f44336; font-weight: bold; }")
+            self.save_button.setEnabled(True)  # 保存失败，允许手动保存
             
     def on_unlimited_toggled(self, checked):
         """无限时记录复选框状态改变"""
@@ -462,7 +530,7 @@ class PyDataRecord(QWidget):
         self.data_sort.update_data(data_point)
         
         # 更新数据点计数
-        count = len(self.data_sort.current_data)
+        count = len(self.data_sort)
         self.count_label.setText(str(count))
         
         # 广播数据到其他组件（如仪器数据显示面板）
@@ -481,18 +549,20 @@ class PyDataRecord(QWidget):
         self.status_timer.stop()
         
         self.add_log("记录完成")
+        if self.data_record_thread and self.data_record_thread.clock:
+            self.add_log(f"采样统计: {self.data_record_thread.clock.summary()}")
         
         # 发射停止记录信号
         self.recording_stopped.emit()
         
-        # 自动保存数据
+        # 自动保存数据（在导出服务中后台进行，结果见 on_export_finished）
         if self.data_record_thread:
             self.add_log("正在自动保存数据...")
             success = self._auto_save_data()
             if success:
-                self.status_label.setText("数据已保存")
-                self.status_label.setStyleSheet("QLabel { color: #4CAF50; font-weight: bold; }")
-                self.save_button.setEnabled(False)  # 已自动保存，禁用手动保存按钮
+                self.status_label.setText("正在保存...")
+                self.status_label.setStyleSheet("QLabel { color: #2196F3; font-weight: bold; }")
+                self.save_button.setEnabled(False)
             else:
                 self.status_label.setText("保存失败，可手动保存")
                 self.status_label.setStyleSheet("QLabel { color: #f44336; font-weight: bold; }")
@@ -554,7 +624,7 @@ class PyDataRecord(QWidget):
         
     def get_data_for_plotting(self):
         """获取用于绘图的数据"""
-        if not self.data_sort.current_data:
+        if not len(self.data_sort):
             return None
             
         plot_settings = self.get_plot_settings()
@@ -562,12 +632,14 @@ class PyDataRecord(QWidget):
         # 获取两个图表的数据
         plot1_x, plot1_y = self.data_sort.get_data_for_plotting(
             plot_settings['plot1']['x_axis'],
-            plot_settings['plot1']['y_axis']
+            plot_settings['plot1']['y_axis'],
+            self.PLOT_WINDOW
         )
         
         plot2_x, plot2_y = self.data_sort.get_data_for_plotting(
             plot_settings['plot2']['x_axis'],
-            plot_settings['plot2']['y_axis']
+            plot_settings['plot2']['y_axis'],
+            self.PLOT_WINDOW
         )
         
         return {
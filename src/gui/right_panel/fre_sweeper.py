@@ -2,7 +2,7 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, 
     QLabel, QSpinBox, QDoubleSpinBox, QComboBox, QPushButton,
     QCheckBox, QProgressBar, QTextEdit, QGroupBox, QFormLayout,
-    QMessageBox, QFileDialog, QLineEdit, QSlider
+    QMessageBox, QFileDialog, QLineEdit, QSlider, QListWidget, QListWidgetItem
 )
 from PySide6.QtCore import Qt, QTimer, QThread, Signal
 from PySide6.QtGui import QFont, QTextCursor
@@ -10,6 +10,8 @@ from PySide6.QtGui import QFont, QTextCursor
 import sys
 import os
 import time
+import threading
+import bisect
 import numpy as np
 from datetime import datetime
 
@@ -18,6 +20,179 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from instruments.wf1947 import WF1947
 from instruments.sr830 import SR830
 from component.datasort import DataSort
+from component.resonancefit import ResonanceFitter, MODELS, half_power_width
+from component.campaign import CampaignDataset, parse_setpoints
+from component.exportservice import ExportJobs
+from instruments.ppms import PPMS
+from instruments.actor import InstrumentActor
+
+
+# 扫描结果的列，FrequencySweepThread.results 为以此为字段的结构化数组
+SWEEP_FIELDS = ['frequency', 'X', 'Y', 'R', 'theta', 'timestamp', 'elapsed_time']
+SWEEP_DTYPE = np.dtype([(name, np.float64) for name in SWEEP_FIELDS])
+
+# 每台SR830的列；第k台（k>=2）的列名带后缀，如 X_2、theta_2
+LOCKIN_FIELDS = ['X', 'Y', 'R', 'theta']
+
+
+def lockin_field(name, k):
+    """第 k 台SR830（从0计）的列名"""
+    return name if k == 0 else f"{name}_{k + 1}"
+
+
+def sweep_fields(lockins=1):
+    """有 lockins 台SR830时扫描结果的列"""
+    columns = [lockin_field(name, k) for k in range(lockins) for name in LOCKIN_FIELDS]
+    return ['frequency'] + columns + ['timestamp', 'elapsed_time']
+
+
+def frequency_grid(start_hz, stop_hz, spacing='LINear', points=None, step_hz=None, frequencies=None):
+    """
+    生成扫描的频率点（NumPy数组）
+    
+    Args:
+        start_hz, stop_hz: 起止频率（Hz），均包含在内
+        spacing: 'LINear'（等间隔）或 'LOGarithmic'（等比）
+        points: 点数
+        step_hz: 频率步长（Hz），未给出points时使用；对数间距时为起始频率处的步长，之后按等比增大
+        frequencies: 自定义频率列表，或文本文件路径（第一列为频率，'#'开头为注释，.csv以逗号分隔）；
+                     给出时忽略其余参数，按列表顺序扫描
+    """
+    if frequencies is not None:
+        if isinstance(frequencies, str):
+            delimiter = ',' if frequencies.lower().endswith('.csv') else None
+            grid = np.loadtxt(frequencies, comments='#', delimiter=delimiter, usecols=0, ndmin=1)
+        else:
+            grid = np.asarray(frequencies, dtype=float).ravel()
+        if len(grid) == 0 or np.any(grid <= 0):
+            raise ValueError("自定义频率列表为空或包含非正的频率")
+        return grid
+        
+    log_spacing = spacing == 'LOGarithmic'
+    if points is None:
+        if not step_hz or step_hz <= 0:
+            raise ValueError("需要给出点数或正的频率步长")
+        if log_spacing:
+            intervals = np.log(stop_hz / start_hz) / np.log1p(step_hz / start_hz)
+        else:
+            intervals = (stop_hz - start_hz) / step_hz
+        points = int(np.ceil(intervals - 1e-9)) + 1
+    points = max(int(points), 2)
+    if log_spacing:
+        return np.geomspace(start_hz, stop_hz, points)
+    return np.linspace(start_hz, stop_hz, points)
+
+
+class SweepStatistics:
+    """
+    多次扫描中每个频率点的运行均值和方差（Welford算法），内存只与频率点数有关
+    
+    相位（theta开头的列）按与当前均值之差折算到±180°后累积，跨越±180°的相位不会被平均到0°附近。
+    """
+    
+    FIELDS = LOCKIN_FIELDS
+    
+    def __init__(self, frequencies, fields=None):
+        self.FIELDS = list(fields or self.FIELDS)
+        self.frequencies = np.asarray(frequencies, dtype=float)
+        size = len(self.frequencies)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.mean = {name: np.zeros(size) for name in self.FIELDS}
+        self.m2 = {name: np.zeros(size) for name in self.FIELDS}
+        self.timestamp = np.zeros(size)
+        
+    def add(self, index, data_point):
+        """把一次测量累积到第 index 个频率点"""
+        n = self.count[index] + 1
+        self.count[index] = n
+        for name in self.FIELDS:
+            value = data_point[name]
+            delta = value - self.mean[name][index]
+            if name.startswith('theta'):
+                delta = (delta + 180.0) % 360.0 - 180.0
+            mean = self.mean[name][index] + delta / n
+            residual = value - mean
+            if name.startswith('theta'):
+                mean = (mean + 180.0) % 360.0 - 180.0
+                residual = (residual + 180.0) % 360.0 - 180.0
+            self.mean[name][index] = mean
+            self.m2[name][index] += delta * residual
+        self.timestamp[index] = data_point['timestamp']
+        
+    def std_error(self, name):
+        """各频率点均值的标准误差，只测量过一次的点为0"""
+        count = self.count
+        variance = np.divide(self.m2[name], count - 1, out=np.zeros(len(count)), where=count > 1)
+        return np.sqrt(variance / np.maximum(count, 1))
+        
+    def point(self, index):
+        """第 index 个频率点当前的均值（<name>_mean）、标准误差（<name>_err）和次数（passes）"""
+        n = int(self.count[index])
+        result = {'passes': n}
+        for name in self.FIELDS:
+            result[f'{name}_mean'] = float(self.mean[name][index])
+            result[f'{name}_err'] = float(np.sqrt(self.m2[name][index] / (n - 1) / n)) if n > 1 else 0.0
+        return result
+        
+    def rows(self, direction):
+        """已测频率点的均值行（数据点字典的列表），按频率点顺序"""
+        errors = {name: self.std_error(name) for name in self.FIELDS}
+        rows = []
+        for i in np.nonzero(self.count)[0].tolist():
+            row = {'frequency': float(self.frequencies[i]), 'direction': direction}
+            for name in self.FIELDS:
+                row[name] = float(self.mean[name][i])
+            for name in self.FIELDS:
+                row[f'{name}_err'] = float(errors[name][i])
+            row['passes'] = int(self.count[i])
+            row['timestamp'] = float(self.timestamp[i])
+            rows.append(row)
+        return rows
+
+
+def refine_frequencies(frequencies, amplitudes, phases, resolution_hz,
+                       peak_fraction=0.5, curvature_tol=0.02, log_spacing=False):
+    """返回需要补测的频率：相邻测量点之间需要细化的区间的中点（输入需按频率排序）
+
+    需要细化的区间：
+    - R的局部最大值（不低于 peak_fraction*最大R）两侧的区间
+    - R穿过半功率点（最大R/√2）的区间
+    - θ过零的区间（两端R都不低于最大R的10%，避免噪声中的随机相位）
+    - R的线性插值误差超过 curvature_tol*最大R 的点两侧的区间
+    宽度不大于 resolution_hz 的区间不再细分。
+    """
+    f = np.asarray(frequencies, dtype=float)
+    r = np.asarray(amplitudes, dtype=float)
+    theta = np.asarray(phases, dtype=float)
+    if len(f) < 3:
+        return np.empty(0)
+    r_max = r.max()
+    if r_max <= 0:
+        return np.empty(0)
+    refine = np.zeros(len(f) - 1, dtype=bool)
+
+    # 峰
+    peaks = np.nonzero((r[1:-1] >= r[:-2]) & (r[1:-1] >= r[2:]) & (r[1:-1] >= peak_fraction * r_max))[0] + 1
+    refine[peaks - 1] = True
+    refine[peaks] = True
+
+    # 半功率点
+    above_half = r >= r_max / np.sqrt(2)
+    refine |= above_half[:-1] != above_half[1:]
+
+    # 相位过零（跳变±180°的区间除外）
+    strong = (r[:-1] >= 0.1 * r_max) & (r[1:] >= 0.1 * r_max)
+    refine |= strong & (np.signbit(theta[:-1]) != np.signbit(theta[1:])) & (np.abs(np.diff(theta)) < 180)
+
+    # 曲率：中间点偏离两侧点连线
+    linear = r[:-2] + (r[2:] - r[:-2]) * (f[1:-1] - f[:-2]) / (f[2:] - f[:-2])
+    bent = np.abs(r[1:-1] - linear) > curvature_tol * r_max
+    refine[:-1] |= bent
+    refine[1:] |= bent
+
+    refine &= np.diff(f) > resolution_hz
+    left, right = f[:-1][refine], f[1:][refine]
+    return np.sqrt(left * right) if log_spacing else (left + right) / 2
 
 
 class FrequencySweepThread(QThread):
@@ -27,194 +202,410 @@ class FrequencySweepThread(QThread):
     data_acquired = Signal(dict)  # 每次数据采集完成时发射
     sweep_finished = Signal()     # 扫描完成时发射
     error_occurred = Signal(str)  # 发生错误时发射
+    warning_occurred = Signal(str)  # 不中断扫描的问题（如某个频率点读取失败）时发射
     progress_updated = Signal(int, int)  # 进度更新 (current, total)
     
+    # 多台SR830读取时，等待其他SR830发出SNAP?请求的最长时间（秒）
+    SNAP_SYNC_TIMEOUT = 2.0
+    
     def __init__(self, wf1947_instrument, sr830_instrument, sweep_params):
+        """
+        Args:
+            sr830_instrument: SR830，或多台SR830的列表（第一台为主SR830，用于绘图、拟合和硬件扫描）；
+                              程序步进和自适应扫描在每个频率点同时读取所有SR830，结果按
+                              sweep_fields() 存为同一行的不同列
+        """
         super().__init__()
         self.wf1947: WF1947 = wf1947_instrument
-        self.sr830: SR830 = sr830_instrument
+        if isinstance(sr830_instrument, (list, tuple)):
+            self.lockins = list(sr830_instrument)
+        else:
+            self.lockins = [sr830_instrument]
+        self.sr830: SR830 = self.lockins[0]
         self.sweep_params = sweep_params
         self.running = False
-        self.sweep_data = []
+        self.fields = sweep_fields(len(self.lockins))
+        self.results = np.zeros(0, dtype=SWEEP_DTYPE)
+        self.count = 0
+        self.statistics = None    # 多次扫描时为 {方向(1上扫/-1下扫): SweepStatistics}
         
-    # def run(self):
-    #     """执行频率扫描（使用WF1947内置扫描功能）"""
-    #     try:
-    #         self.running = True
-    #         self.sweep_data = []
-            
-    #         # 获取扫描参数
-    #         start_hz = self.sweep_params['start_hz']
-    #         stop_hz = self.sweep_params['stop_hz']
-    #         sweep_time_s = self.sweep_params['sweep_time_s']
-    #         spacing = self.sweep_params['spacing']
-    #         direction = self.sweep_params['direction']
-    #         sample_interval = self.sweep_params['sample_interval']
-            
-    #         # 设置WF1947基本参数
-    #         self.wf1947.set_waveform(self.sweep_params['waveform'])
-    #         self.wf1947.set_amplitude(self.sweep_params['amplitude'])
-    #         self.wf1947.set_offset(self.sweep_params['offset'])
-            
-    #         # 配置WF1947频率扫描
-    #         self.wf1947.setup_frequency_sweep(
-    #             start_hz=start_hz,
-    #             stop_hz=stop_hz,
-    #             sweep_time_s=sweep_time_s,
-    #             spacing=spacing,
-    #             direction=direction,
-    #             load=self.sweep_params['load']
-    #         )
-            
-    #         # 开启扫描输出
-    #         self.wf1947.set_output(True)
-            
-    #         # 计算采样点数
-    #         total_samples = int(sweep_time_s / sample_interval)
-            
-    #         # 在扫描过程中采样数据
-    #         start_time = time.perf_counter()
-    #         i = 0
-    #         while time.perf_counter() - start_time < sweep_time_s and self.running and self.wf1947.get_frequency() <= stop_hz:
-    #             o_time = time.perf_counter()
-                
-    #             # 从SR830读取数据
-    #             try:
-    #                 frequency_data = self.wf1947.get_frequency()
-    #                 snap_data = self.sr830.getSnap(1, 2, 3, 4)
-    #                 # 构建数据点
-    #                 data_point = {
-    #                     'frequency': frequency_data,
-    #                     'X': snap_data[0],
-    #                     'Y': snap_data[1], 
-    #                     'R': snap_data[2],
-    #                     'theta': snap_data[3],
-    #                     'timestamp': time.time(),
-    #                     'elapsed_time': time.perf_counter() - start_time
-    #                 }
-    #             except Exception as e:
-    #                 # 如果读取失败，使用基于时间进度的估算作为备用
-    #                 progress = (time.perf_counter() - start_time) / sweep_time_s
-    #                 if spacing == 'LINear':
-    #                     current_freq = start_hz + (stop_hz - start_hz) * progress
-    #                 else:  # LOGarithmic
-    #                     current_freq = start_hz * ((stop_hz / start_hz) ** progress)
-    #                 # 构建备用数据点
-    #                 data_point = {
-    #                     'frequency': current_freq,
-    #                     'X': 0.0,
-    #                     'Y': 0.0, 
-    #                     'R': 0.0,
-    #                     'theta': 0.0,
-    #                     'timestamp': time.time(),
-    #                     'elapsed_time': time.perf_counter() - start_time
-    #                 }
-    #                 print(f"警告: 无法从SR830读取数据")
-                
-    #             self.sweep_data.append(data_point)
-                
-    #             # 发射数据信号
-    #             self.data_acquired.emit(data_point)
-    #             self.progress_updated.emit(i + 1, total_samples)
-    #             i += 1
-    #             # 等待采样间隔
-    #             time.sleep(max(0, sample_interval-(time.perf_counter()-o_time)))
+    def run(self):
+        """执行频率扫描"""
+        mode = self.sweep_params.get('mode', 'stepped')
+        if mode == 'hardware':
+            self._run_hardware_sweep()
+        elif mode == 'adaptive':
+            self._run_adaptive_sweep()
+        else:
+            self._run_stepped_sweep()
+            
+    def _run_stepped_sweep(self):
+        """执行频率扫描（程序控制WF1947）
+        
+        按 frequency_grid() 预先算好的频率点逐点扫描（线性、对数或自定义列表），结果写入
+        预先分配的 results 数组；每步只等待SR830输出滤波器稳定到设定精度所需的时间
+        （由时间常数和滤波器斜率计算），可选地再重复读取直到相邻两次读数一致。
+        
+        passes > 1 或 bidirectional 时重复扫描（往返扫描时每次包括一趟上扫和一趟下扫），每次的读数按
+        频率点和方向累积到 statistics 的均值和方差中，不再逐点保存；发射的数据点附带
+        direction、pass、index 以及该频率点当前的均值和标准误差。
+        """
+        try:
+            self.running = True
+            
+            # 频率点
+            frequencies = self._frequency_grid()
+            points = len(frequencies)
+            passes = max(int(self.sweep_params.get('passes', 1)), 1)
+            bidirectional = bool(self.sweep_params.get('bidirectional', False))
+            if passes > 1 or bidirectional:
+                directions = [1, -1] if bidirectional else [1]
+                values = self.fields[1:-2]
+                self.statistics = {direction: SweepStatistics(frequencies, values) for direction in directions}
+                self._allocate(0)
+            else:
+                self.statistics = None
+                self._allocate(points)
+            # 往返扫描时每次扫描为一上一下两趟，passes = 1 也得到两个方向的曲线
+            sweeps = 2 * passes if bidirectional else passes
+            total_samples = points * sweeps
+            step = 0
+            
+            # 每步的稳定时间由SR830当前的时间常数和滤波器斜率决定
+            settle_time = self._settle_time()
+            
+            self._start_output(float(frequencies[0]))
+            
+            # 在扫描过程中采样数据
+            start_time = time.perf_counter()
+            for sweep_index in range(sweeps):
+                direction = -1 if bidirectional and sweep_index % 2 else 1
+                pass_index = sweep_index // 2 if bidirectional else sweep_index
+                order = range(points) if direction == 1 else range(points - 1, -1, -1)
+                for i in order:
+                    if not self.running:
+                        break
+                    frequency = float(frequencies[i])
+                    step_start = time.perf_counter()
+                    
+                    # 设置频率
+                    self.wf1947.set_frequency(frequency)
+                    
+                    # 等待稳定后从SR830读取数据
+                    step += 1
+                    try:
+                        data_point = self._read_point(step_start + settle_time, start_time)
+                    except Exception as e:
+                        # 读取失败的频率点不保存、不计入统计，扫描继续
+                        self.warning_occurred.emit(f"{frequency:g} Hz 无法从SR830读取数据，已跳过: {e}")
+                        self.progress_updated.emit(step, total_samples)
+                        continue
+                    
+                    if self.statistics is None:
+                        self._store(data_point)
+                    else:
+                        statistics = self.statistics[direction]
+                        statistics.add(i, data_point)
+                        data_point.update(statistics.point(i), direction=direction, index=i)
+                        data_point['pass'] = pass_index + 1
+                    
+                    # 发射数据信号
+                    self.data_acquired.emit(data_point)
+                    self.progress_updated.emit(step, total_samples)
                 
-    #         # 关闭输出
-    #         self.wf1947.set_output(False)
+            # 关闭输出
+            self.wf1947.set_output(False)
 
-    #         # 重置WF1947
-    #         self.wf1947.reset()
+            # 重置WF1947
+            self.wf1947.reset()
             
-    #         # 发射完成信号
-    #         if self.running:
-    #             self.sweep_finished.emit()
+            # 发射完成信号
+            if self.running:
+                self.sweep_finished.emit()
                 
-    #     except Exception as e:
-    #         self.error_occurred.emit(str(e))
-    #     finally:
-    #         # 确保关闭输出
-    #         try:
-    #             self.wf1947.set_output(False)
-    #         except:
-    #             pass
-
-    def run(self):
-        """执行频率扫描（程序控制WF1947）"""
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+        finally:
+            # 确保关闭输出
+            try:
+                self.wf1947.set_output(False)
+            except:
+                pass
+                
+    def _frequency_grid(self):
+        """由扫描参数生成频率点：自定义列表/文件、点数或步长，都未给出时点数为 扫描时间/采样间隔"""
+        params = self.sweep_params
+        custom = params.get('frequencies')
+        if custom is None:
+            custom = params.get('grid_file') or None
+        points = params.get('points')
+        if custom is None and points is None and not params.get('step_hz'):
+            points = int(params['sweep_time_s'] / params['sample_interval'])
+        return frequency_grid(params['start_hz'], params['stop_hz'], params['spacing'],
+                              points=points, step_hz=params.get('step_hz'), frequencies=custom)
+        
+    def _allocate(self, size, fields=None):
+        """预先分配 size 行的结果数组，列为 fields（默认为全部SR830的列）"""
+        self.fields = fields or sweep_fields(len(self.lockins))
+        self.results = np.zeros(size, dtype=[(name, np.float64) for name in self.fields])
+        self.count = 0
+        
+    def _reserve(self, size):
+        """保证结果数组还能容纳 size 行，不够时按倍数扩大"""
+        needed = self.count + size
+        if needed > len(self.results):
+            grown = np.zeros(max(needed, 2 * len(self.results)), dtype=self.results.dtype)
+            grown[:self.count] = self.results[:self.count]
+            self.results = grown
+            
+    def _store(self, data_point):
+        """写入一个数据点"""
+        self._reserve(1)
+        self.results[self.count] = tuple(data_point[name] for name in self.fields)
+        self.count += 1
+        
+    def _store_columns(self, columns):
+        """写入一批数据点（{字段: 数组}），返回写入的行"""
+        size = len(columns['frequency'])
+        self._reserve(size)
+        rows = self.results[self.count:self.count + size]
+        for name in self.fields:
+            rows[name] = columns[name]
+        self.count += size
+        return rows
+        
+    def _start_output(self, start_hz):
+        """设置WF1947基本参数并开启扫描输出（合并为一条SCPI消息发送）"""
+        with self.wf1947.batch(opc=True):
+            self.wf1947.set_waveform(self.sweep_params['waveform'])
+            self.wf1947.set_amplitude(self.sweep_params['amplitude'])
+            self.wf1947.set_offset(self.sweep_params['offset'])
+            self.wf1947.set_frequency(start_hz)
+            self.wf1947.set_output(True)
+            
+    def _settle_time(self):
+        """所有SR830中最长的稳定时间"""
+        accuracy = self.sweep_params.get('settle_accuracy', 1e-3)
+        return max(lockin.settleTime(accuracy) for lockin in self.lockins)
+        
+    def _read_snaps(self):
+        """读取所有SR830的SNAP，返回各台的(X, Y, R, θ)
+        
+        同一GPIB总线上的仪器共用一个BusScheduler，每条命令独占总线。每台SR830的
+        SNAP?请求和读回在它的actor中作为一个任务执行（其间不会插入其他调用者的查询），
+        发出请求后让出总线，等所有SR830都发出请求后再取回总线读回：各台SR830同时准备
+        回复，总线只在写和读时占用。总线传输时间仍随SR830台数线性增加，节省的是仪器
+        准备回复的时间。不是actor的SR830（无法保证请求和读回之间不被插入）逐台用getSnap读取。
+        """
+        if len(self.lockins) == 1 or not all(isinstance(lockin, InstrumentActor) for lockin in self.lockins):
+            return [lockin.getSnap(1, 2, 3, 4) for lockin in self.lockins]
+            
+        barrier = threading.Barrier(len(self.lockins))
+        
+        def snap(lockin):
+            # 在SR830的actor线程中执行
+            try:
+                lockin.requestSnap(1, 2, 3, 4)
+            except Exception:
+                barrier.abort()
+                raise
+            try:
+                with lockin.bus_released():
+                    barrier.wait(self.SNAP_SYNC_TIMEOUT)
+            except threading.BrokenBarrierError:
+                # 其他SR830的请求失败或超时，照常读回自己的回复
+                pass
+            return lockin.readSnap()
+            
+        jobs = [lockin.submit_job(snap, lockin) for lockin in self.lockins]
+        return [job.result() for job in jobs]
+        
+    def _read_point(self, settled_at, start_time):
+        """等待到 settled_at（perf_counter时刻）后读取当前频率和所有SR830的SNAP，返回数据点"""
+        time.sleep(max(0.0, settled_at - time.perf_counter()))
+        frequency_data = self.wf1947.get_frequency()
+        if self.sweep_params.get('converge', False):
+            snaps = self._read_converged(self.sweep_params.get('converge_tolerance', 0.01))
+        else:
+            snaps = self._read_snaps()
+        data_point = {'frequency': frequency_data}
+        for k, snap_data in enumerate(snaps):
+            for name, value in zip(LOCKIN_FIELDS, snap_data):
+                data_point[lockin_field(name, k)] = value
+        data_point['timestamp'] = time.time()
+        data_point['elapsed_time'] = time.perf_counter() - start_time
+        return data_point
+        
+    def _read_converged(self, tolerance, max_reads=10):
+        """每隔一个时间常数重复读取SNAP，直到每台SR830相邻两次的X、Y之差都不超过 tolerance*R
+        或达到最大读取次数，返回最后一次读数"""
+        previous = self._read_snaps()
+        wait = max(lockin.it for lockin in self.lockins)
+        for _ in range(max_reads):
+            time.sleep(wait)
+            current = self._read_snaps()
+            if all(abs(now[0] - before[0]) <= tolerance * abs(now[2]) and
+                   abs(now[1] - before[1]) <= tolerance * abs(now[2])
+                   for now, before in zip(current, previous)):
+                break
+            previous = current
+        return current
+        
+    def _run_adaptive_sweep(self):
+        """执行自适应细化频率扫描（程序控制WF1947）
+        
+        先在整个范围内粗扫 coarse_points 个点，再由 refine_frequencies() 找出峰、半功率点、
+        相位过零和曲率大的区间并在区间中点补测，重复直到没有宽于 resolution_hz 的区间需要
+        细化；总点数不超过 扫描时间/采样间隔。结果按频率排序。
+        补测点之间频率跳变较大，高Q谐振器的振铃时间可能长于SR830的稳定时间，此时应开启收敛检查。
+        """
         try:
             self.running = True
-            self.sweep_data = []
             
             # 获取扫描参数
             start_hz = self.sweep_params['start_hz']
             stop_hz = self.sweep_params['stop_hz']
-            sweep_time_s = self.sweep_params['sweep_time_s']
             spacing = self.sweep_params['spacing']
-            sample_interval = 0.5 # 采样间隔固定为0.5s
-            
-            # 设置WF1947基本参数
-            self.wf1947.set_waveform(self.sweep_params['waveform'])
-            self.wf1947.set_amplitude(self.sweep_params['amplitude'])
-            self.wf1947.set_offset(self.sweep_params['offset'])
+            log_spacing = spacing == 'LOGarithmic'
+            coarse_points = self.sweep_params.get('coarse_points', 21)
+            resolution_hz = self.sweep_params.get('resolution_hz', (stop_hz - start_hz) / 1000)
+            max_points = max(int(self.sweep_params['sweep_time_s'] / self.sweep_params['sample_interval']),
+                             coarse_points)
+            settle_time = self._settle_time()
+            self._allocate(max_points)
             
-            # 开启扫描输出
-            self.wf1947.set_output(True)
+            self._start_output(start_hz)
             
-            # 计算采样点数
-            total_samples = int(sweep_time_s / sample_interval)
-
-            # 计算频率间隔
-            frequency_interval = (stop_hz - start_hz) / total_samples
+            pending = frequency_grid(start_hz, stop_hz, spacing, points=coarse_points)
             
-            # 在扫描过程中采样数据
             start_time = time.perf_counter()
-            for i in range(total_samples):
+            while self.running and len(pending):
+                for frequency in pending[:max_points - self.count].tolist():
+                    if not self.running:
+                        break
+                    step_start = time.perf_counter()
+                    self.wf1947.set_frequency(frequency)
+                    data_point = self._read_point(step_start + settle_time, start_time)
+                    self._store(data_point)
+                    self.data_acquired.emit(data_point)
+                    self.progress_updated.emit(self.count, max_points)
+                if self.count >= max_points:
+                    break
+                    
+                # 由已测的全部点决定下一轮补测的频率
+                measured = self.results[:self.count]
+                measured.sort(order='frequency')
+                pending = refine_frequencies(measured['frequency'], measured['R'], measured['theta'],
+                                             resolution_hz, log_spacing=log_spacing)
                 
-                # 设置频率
-                self.wf1947.set_frequency(start_hz + i * frequency_interval)
+            self.results[:self.count].sort(order='frequency')
+            
+            # 关闭输出
+            self.wf1947.set_output(False)
 
-                # 等待稳定
-                time.sleep(sample_interval)
-                
-                # 从SR830读取数据
-                try:
-                    frequency_data = self.wf1947.get_frequency()
-                    snap_data = self.sr830.getSnap(1, 2, 3, 4)
-                    # 构建数据点
-                    data_point = {
-                        'frequency': frequency_data,
-                        'X': snap_data[0],
-                        'Y': snap_data[1], 
-                        'R': snap_data[2],
-                        'theta': snap_data[3],
-                        'timestamp': time.time(),
-                        'elapsed_time': time.perf_counter() - start_time
-                    }
-                except Exception as e:
-                    # 如果读取失败，使用基于时间进度的估算作为备用
-                    progress = (time.perf_counter() - start_time) / sweep_time_s
-                    if spacing == 'LINear':
-                        current_freq = start_hz + (stop_hz - start_hz) * progress
-                    else:  # LOGarithmic
-                        current_freq = start_hz * ((stop_hz / start_hz) ** progress)
-                    # 构建备用数据点
-                    data_point = {
-                        'frequency': current_freq,
-                        'X': 0.0,
-                        'Y': 0.0, 
-                        'R': 0.0,
-                        'theta': 0.0,
-                        'timestamp': time.time(),
-                        'elapsed_time': time.perf_counter() - start_time
-                    }
-                    print(f"警告: 无法从SR830读取数据")
-                
-                self.sweep_data.append(data_point)
+            # 重置WF1947
+            self.wf1947.reset()
+            
+            # 发射完成信号
+            if self.running:
+                self.sweep_finished.emit()
                 
-                # 发射数据信号
-                self.data_acquired.emit(data_point)
-                self.progress_updated.emit(i + 1, total_samples)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+        finally:
+            # 确保关闭输出
+            try:
+                self.wf1947.set_output(False)
+            except:
+                pass
                 
+    def _run_hardware_sweep(self):
+        """执行频率扫描（WF1947单次硬件扫描，SR830内部缓存定时采样）
+        
+        SR830缓存先启动，随后*TRG触发WF1947扫描；两条命令完成时刻之差即扫描开始时
+        在缓存中的时间偏移，每个缓存点的频率由采样序号、采样率和扫描参数直接换算，
+        扫描过程中不再逐点查询频率和SNAP。
+        """
+        try:
+            self.running = True
+            
+            # 获取扫描参数
+            start_hz = self.sweep_params['start_hz']
+            stop_hz = self.sweep_params['stop_hz']
+            sweep_time_s = self.sweep_params['sweep_time_s']
+            spacing = self.sweep_params['spacing']
+            direction = self.sweep_params['direction']
+            
+            # 采样率：扫描时间内至少采到频率点数（点数/步长/频率文件，未给出时为 扫描时间/采样间隔）
+            # 的最小SR830缓存采样率，最高512 Hz，且整个扫描能放进缓存
+            rates = np.array(self.sr830.rate)
+            usable = np.nonzero(rates * sweep_time_s <= self.sr830.bufferSize - 64)[0]
+            if len(usable) == 0:
+                raise Exception(f"扫描时间过长，SR830缓存无法容纳 {sweep_time_s:.1f}s 的数据")
+            points = len(self._frequency_grid())
+            wanted = np.nonzero(rates * sweep_time_s >= points - 1)[0]
+            rate_index = int(min(wanted[0], usable[-1])) if len(wanted) else int(usable[-1])
+            rate = rates[rate_index]
+            total_samples = int(sweep_time_s * rate) + 1
+            # 硬件扫描只使用主SR830的缓存
+            self._allocate(total_samples, SWEEP_FIELDS)
+            
+            # 设置WF1947基本参数和单次扫描（合并为一条SCPI消息发送），输出从起始频率开始
+            with self.wf1947.batch(opc=True):
+                self.wf1947.set_waveform(self.sweep_params['waveform'])
+                self.wf1947.set_amplitude(self.sweep_params['amplitude'])
+                self.wf1947.set_offset(self.sweep_params['offset'])
+                self.wf1947.set_frequency(start_hz)
+                self.wf1947.setup_frequency_sweep(
+                    start_hz=start_hz,
+                    stop_hz=stop_hz,
+                    sweep_time_s=sweep_time_s,
+                    spacing=spacing,
+                    direction=direction,
+                    load=self.sweep_params['load'],
+                    single=True
+                )
+                self.wf1947.set_output(True)
+            self.sr830.setupBuffer(i=rate_index)
+            
+            # 启动缓存后立即触发扫描
+            self.sr830.startBuffer()
+            buffer_started = time.perf_counter()
+            buffer_started_wall = time.time()
+            self.wf1947.trigger()
+            sweep_delay = time.perf_counter() - buffer_started
+            
+            received = 0
+            emitted = 0
+            deadline = buffer_started + sweep_delay + sweep_time_s + 5.0
+            while self.running:
+                time.sleep(0.2)
+                x, y = self.sr830.readBuffer()
+                if len(x):
+                    # 缓存点相对扫描开始的时间，只保留扫描期间的点
+                    t = (received + np.arange(len(x))) / rate - sweep_delay
+                    keep = (t >= 0) & (t <= sweep_time_s)
+                    t, x, y = t[keep], x[keep], y[keep]
+                    received += int(len(keep))
+                    rows = self._store_columns({
+                        'frequency': WF1947.sweep_frequencies(t, start_hz, stop_hz, sweep_time_s, spacing, direction),
+                        'X': x,
+                        'Y': y,
+                        'R': np.hypot(x, y),
+                        'theta': np.degrees(np.arctan2(y, x)),
+                        'timestamp': buffer_started_wall + sweep_delay + t,
+                        'elapsed_time': t
+                    })
+                    for point in rows.tolist():
+                        self.data_acquired.emit(dict(zip(self.fields, point)))
+                    emitted += len(t)
+                    self.progress_updated.emit(min(emitted, total_samples), total_samples)
+                # 缓存已覆盖整个扫描，或长时间没有收到数据
+                if received / rate - sweep_delay >= sweep_time_s or time.perf_counter() > deadline:
+                    break
+                    
+            self.sr830.pauseBuffer()
+            
             # 关闭输出
             self.wf1947.set_output(False)
 
@@ -239,13 +630,174 @@ class FrequencySweepThread(QThread):
         self.running = False
         
     def get_sweep_data(self):
-        """获取扫描数据"""
-        return self.sweep_data.copy()
+        """获取扫描数据（数据点字典的列表）；多次扫描时为各方向每个频率点的均值行"""
+        if self.statistics is not None:
+            return [row for direction, statistics in self.statistics.items()
+                    for row in statistics.rows(direction)]
+        return [dict(zip(self.fields, point)) for point in self.results[:self.count].tolist()]
+        
+    def get_sweep_arrays(self):
+        """获取扫描数据（结构化数组的副本，字段见 sweep_fields()）"""
+        return self.results[:self.count].copy()
+
+
+class SweepCampaignThread(QThread):
+    """扫描序列线程：依次把PPMS温度或磁场设到每个设定点，等待稳定后执行一次频率扫描
+    
+    每个设定点的扫描结果写入 CampaignDataset 并记录进度；用同一目录重新开始时跳过已完成的设定点。
+    """
+    
+    # 信号定义
+    setpoint_changed = Signal(int, float)   # 开始处理设定点 (序号, 设定值)
+    setpoint_finished = Signal(int, int)    # 设定点扫描完成 (序号, 数据点数)
+    status_changed = Signal(str)            # 等待稳定等状态信息
+    data_acquired = Signal(dict)            # 转发当前扫描的数据点
+    progress_updated = Signal(int, int)     # 转发当前扫描的进度
+    campaign_finished = Signal()            # 全部设定点完成
+    error_occurred = Signal(str)
+    warning_occurred = Signal(str)          # 转发当前扫描的警告
+    
+    def __init__(self, ppms_instrument, wf1947_instrument, sr830_instrument, sweep_params, campaign_params):
+        """
+        Args:
+            sweep_params: 每个设定点的扫描参数（同 FrequencySweepThread）
+            campaign_params: {
+                'quantity': 'temperature' 或 'field',
+                'setpoints': 设定点列表（K 或 Oe）,
+                'rate': 变温速率（K/min）或扫场速率（Oe/s）,
+                'stable_time_s': 状态稳定后再保持的时间,
+                'tolerance': 读数与设定点的最大偏差（可选）,
+                'timeout_s': 等待稳定的最长时间（可选，超时则中止序列）,
+                'directory': 数据集目录
+            }
+        """
+        super().__init__()
+        self.ppms: PPMS = ppms_instrument
+        self.wf1947: WF1947 = wf1947_instrument
+        self.sr830: SR830 = sr830_instrument
+        self.sweep_params = sweep_params
+        self.campaign_params = campaign_params
+        self.poll_interval = 1.0
+        # 设定后PPMS可能还报告上一个设定点的"稳定"状态：状态离开稳定之前，
+        # 至少等待这段时间才接受稳定状态
+        self.min_settle_s = 10.0
+        self.running = False
+        self.sweep = None
+        self.dataset = None
+        
+    def run(self):
+        """执行扫描序列"""
+        try:
+            self.running = True
+            params = self.campaign_params
+            quantity = params['quantity']
+            self.dataset = CampaignDataset(params['directory'], quantity, params['setpoints'], self.sweep_params)
+            if self.dataset.completed():
+                self.status_changed.emit(f"继续未完成的序列，已完成 {len(self.dataset.completed())} 个设定点")
+                
+            for index in self.dataset.pending():
+                if not self.running:
+                    break
+                set_point = self.dataset.setpoints[index]
+                self.setpoint_changed.emit(index, set_point)
+                
+                if quantity == 'temperature':
+                    self.ppms.set_temperature(set_point, params['rate'])
+                else:
+                    self.ppms.set_field(set_point, params['rate'])
+                if not self._wait_stable(set_point):
+                    break
+                    
+                before = self.ppms.get_temperature_field()
+                errors = []
+                self.sweep = FrequencySweepThread(self.wf1947, self.sr830, self.sweep_params)
+                self.sweep.data_acquired.connect(self.data_acquired.emit)
+                self.sweep.progress_updated.connect(self.progress_updated.emit)
+                self.sweep.error_occurred.connect(lambda message: errors.append(message))
+                self.sweep.warning_occurred.connect(self.warning_occurred.emit)
+                self.sweep.run()
+                if errors:
+                    raise Exception(f"设定点 {set_point:g} 扫描失败: {errors[0]}")
+                if not self.running:
+                    break
+                after = self.ppms.get_temperature_field()
+                
+                rows = self.sweep.get_sweep_data()
+                self.dataset.append(index, rows, {
+                    'before': dict(zip(['T', 'sT', 'F', 'sF'], before)),
+                    'after': dict(zip(['T', 'sT', 'F', 'sF'], after))
+                })
+                self.setpoint_finished.emit(index, len(rows))
+                
+            if self.running and self.dataset.is_complete():
+                self.campaign_finished.emit()
+                
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            
+    def _wait_stable(self, set_point):
+        """等待PPMS状态稳定并保持 stable_time_s 秒；停止时返回False，超时抛出TimeoutError
+        
+        设定后的稳定状态只有在状态离开过稳定、或已过 min_settle_s 秒后才被接受，
+        避免把上一个设定点的稳定状态当作新设定点已稳定。
+        """
+        params = self.campaign_params
+        quantity = params['quantity']
+        tolerance = params.get('tolerance')
+        timeout_s = params.get('timeout_s')
+        stable_time_s = params.get('stable_time_s', 0.0)
+        start = time.monotonic()
+        stable_since = None
+        left_stable = False
+        while self.running:
+            temperature, temperature_status, field, field_status = self.ppms.get_temperature_field()
+            if quantity == 'temperature':
+                value, status, unit = temperature, temperature_status, "K"
+                stable = PPMS.temperature_stable(status)
+            else:
+                value, status, unit = field, field_status, "Oe"
+                stable = PPMS.field_stable(status)
+            if tolerance is not None and abs(value - set_point) > tolerance:
+                stable = False
+                
+            now = time.monotonic()
+            if not stable:
+                left_stable = True
+            elif not left_stable and now - start < self.min_settle_s:
+                # 可能仍是上一个设定点的状态
+                stable = False
+            if not stable:
+                stable_since = None
+            elif stable_since is None:
+                stable_since = now
+            elif now - stable_since >= stable_time_s:
+                return True
+            if stable_since is not None and stable_time_s <= 0:
+                return True
+            self.status_changed.emit(f"等待稳定: {value:.4g} {unit} ({status})")
+            
+            if timeout_s and now - start > timeout_s:
+                raise TimeoutError(f"等待 {set_point:g} {unit} 稳定超时（{timeout_s:.0f}s）")
+            time.sleep(self.poll_interval)
+        return False
+        
+    def stop_sweep(self):
+        """停止序列（当前设定点的扫描也随之停止，重新开始时从该设定点继续）"""
+        self.running = False
+        if self.sweep is not None:
+            self.sweep.stop_sweep()
+            
+    def get_sweep_data(self):
+        """当前设定点的扫描数据"""
+        return self.sweep.get_sweep_data() if self.sweep is not None else []
 
 
 class PyFreSweeper(QWidget):
     """频率扫描面板"""
     
+    # 扫描过程中两次拟合之间的最小间隔（秒）
+    FIT_INTERVAL = 0.2
+    
     # 信号定义，用于控制仪器显示面板的启停
     request_stop_display = Signal()  # 请求停止仪器显示更新
     request_start_display = Signal()  # 请求开始仪器显示更新
@@ -261,6 +813,17 @@ class PyFreSweeper(QWidget):
         # 扫描数据
         self.sweep_data = []
         
+        # 多次扫描时各方向每个频率点的最新均值 {方向: {频率点序号: 数据点}}
+        self.trace_bins = {}
+        
+        # 共振拟合
+        self.fitter = None
+        self.fit_result = None
+        self._last_fit_time = 0.0
+        
+        # 扫描数据的后台保存任务，标记为是否自动保存
+        self.export_jobs = ExportJobs(self)
+        
         self.init_ui()
         self.connect_signals()
         
@@ -290,6 +853,9 @@ class PyFreSweeper(QWidget):
         # WF1947和扫描参数设置组（合并）
         self.create_wf1947_and_sweep_group(layout)
         
+        # 扫描序列组
+        self.create_campaign_group(layout)
+        
         # 数据保存设置组
         self.create_save_settings_group(layout)
         
@@ -299,6 +865,9 @@ class PyFreSweeper(QWidget):
         # 状态显示组
         self.create_status_group(layout)
         
+        # 共振拟合组
+        self.create_fit_group(layout)
+        
         # 日志显示
         self.create_log_group(layout)
         
@@ -337,6 +906,13 @@ class PyFreSweeper(QWidget):
         self.sr830_combo.setMaximumWidth(150)
         layout.addRow("SR830:", self.sr830_combo)
         
+        # 附加SR830：与主SR830在每个频率点同时读取，结果存为带编号后缀的列（X_2、Y_2…）
+        self.extra_sr830_list = QListWidget()
+        self.extra_sr830_list.setMaximumHeight(60)
+        self.extra_sr830_list.setMaximumWidth(150)
+        self.extra_sr830_list.setToolTip("勾选的SR830与主SR830在每个频率点同时读取（硬件扫描只读取主SR830）")
+        layout.addRow("附加SR830:", self.extra_sr830_list)
+        
         # 刷新仪器列表按钮
         refresh_button = QPushButton("刷新")
         refresh_button.setMaximumHeight(22)
@@ -439,6 +1015,69 @@ class PyFreSweeper(QWidget):
         self.spacing_combo.setMaximumWidth(120)
         layout.addRow("频率间距:", self.spacing_combo)
         
+        # 程序步进的频率点：点数、步长或自定义频率文件
+        self.grid_mode_combo = QComboBox()
+        self.grid_mode_combo.addItem("点数", "points")
+        self.grid_mode_combo.addItem("步长", "step")
+        self.grid_mode_combo.addItem("自定义文件", "file")
+        self.grid_mode_combo.setMaximumHeight(22)
+        self.grid_mode_combo.setMaximumWidth(120)
+        layout.addRow("频率点:", self.grid_mode_combo)
+        
+        self.points_spinbox = QSpinBox()
+        self.points_spinbox.setRange(2, 100000)
+        self.points_spinbox.setValue(101)
+        self.points_spinbox.setMaximumHeight(22)
+        self.points_spinbox.setMaximumWidth(120)
+        layout.addRow("点数:", self.points_spinbox)
+        
+        self.step_spinbox = QDoubleSpinBox()
+        self.step_spinbox.setRange(0.001, 1000000.0)
+        self.step_spinbox.setValue(10.0)
+        self.step_spinbox.setSuffix(" Hz")
+        self.step_spinbox.setDecimals(3)
+        self.step_spinbox.setMaximumHeight(22)
+        self.step_spinbox.setMaximumWidth(120)
+        layout.addRow("步长:", self.step_spinbox)
+        
+        grid_file_layout = QHBoxLayout()
+        self.grid_file_lineedit = QLineEdit()
+        self.grid_file_lineedit.setPlaceholderText("每行一个频率(Hz)")
+        self.grid_file_lineedit.setMaximumHeight(22)
+        grid_file_layout.addWidget(self.grid_file_lineedit)
+        grid_file_button = QPushButton("浏览...")
+        grid_file_button.setMaximumHeight(22)
+        grid_file_button.clicked.connect(self.browse_grid_file)
+        grid_file_layout.addWidget(grid_file_button)
+        layout.addRow("频率文件:", grid_file_layout)
+        
+        # 扫描模式：程序逐点设置频率，WF1947硬件扫描配合SR830缓存采样，
+        # 或粗扫后在共振峰附近自适应加密
+        self.sweep_mode_combo = QComboBox()
+        self.sweep_mode_combo.addItem("程序步进", "stepped")
+        self.sweep_mode_combo.addItem("硬件扫描", "hardware")
+        self.sweep_mode_combo.addItem("自适应细化", "adaptive")
+        self.sweep_mode_combo.setMaximumHeight(22)
+        self.sweep_mode_combo.setMaximumWidth(120)
+        layout.addRow("扫描模式:", self.sweep_mode_combo)
+        
+        # 自适应细化：粗扫点数和细化的频率分辨率
+        self.coarse_points_spinbox = QSpinBox()
+        self.coarse_points_spinbox.setRange(5, 1000)
+        self.coarse_points_spinbox.setValue(21)
+        self.coarse_points_spinbox.setMaximumHeight(22)
+        self.coarse_points_spinbox.setMaximumWidth(120)
+        layout.addRow("粗扫点数:", self.coarse_points_spinbox)
+        
+        self.resolution_spinbox = QDoubleSpinBox()
+        self.resolution_spinbox.setRange(0.001, 100000.0)
+        self.resolution_spinbox.setValue(1.0)
+        self.resolution_spinbox.setSuffix(" Hz")
+        self.resolution_spinbox.setDecimals(3)
+        self.resolution_spinbox.setMaximumHeight(22)
+        self.resolution_spinbox.setMaximumWidth(120)
+        layout.addRow("细化分辨率:", self.resolution_spinbox)
+        
         # 扫描方向
         self.direction_combo = QComboBox()
         self.direction_combo.addItems(["RAMP", "TRIangle"])
@@ -457,6 +1096,117 @@ class PyFreSweeper(QWidget):
         self.sample_interval_spinbox.setMaximumWidth(120)
         layout.addRow("采样间隔:", self.sample_interval_spinbox)
         
+        # 程序步进时每步的稳定精度，等待时间由SR830时间常数和滤波器斜率计算
+        self.settle_accuracy_combo = QComboBox()
+        self.settle_accuracy_combo.addItem("1%", 1e-2)
+        self.settle_accuracy_combo.addItem("0.1%", 1e-3)
+        self.settle_accuracy_combo.addItem("0.01%", 1e-4)
+        self.settle_accuracy_combo.setCurrentIndex(1)
+        self.settle_accuracy_combo.setMaximumHeight(22)
+        self.settle_accuracy_combo.setMaximumWidth(120)
+        layout.addRow("稳定精度:", self.settle_accuracy_combo)
+        
+        # 稳定后重复读取，直到相邻两次读数一致
+        self.converge_checkbox = QCheckBox("收敛检查")
+        self.converge_checkbox.setChecked(False)
+        layout.addRow("", self.converge_checkbox)
+        
+        # 程序步进重复扫描取平均，往返扫描时上扫和下扫分别统计
+        self.passes_spinbox = QSpinBox()
+        self.passes_spinbox.setRange(1, 1000)
+        self.passes_spinbox.setValue(1)
+        self.passes_spinbox.setMaximumHeight(22)
+        self.passes_spinbox.setMaximumWidth(120)
+        layout.addRow("扫描次数:", self.passes_spinbox)
+        
+        self.bidirectional_checkbox = QCheckBox("往返扫描")
+        self.bidirectional_checkbox.setChecked(False)
+        self.bidirectional_checkbox.setToolTip("每次扫描包括一趟上扫和一趟下扫")
+        layout.addRow("", self.bidirectional_checkbox)
+        
+        group.setLayout(layout)
+        parent_layout.addWidget(group)
+        
+    def create_campaign_group(self, parent_layout):
+        """创建扫描序列组：在PPMS的一系列温度或磁场下依次扫描"""
+        group = QGroupBox("扫描序列 (PPMS)")
+        group.setStyleSheet("QGroupBox { font-weight: bold; padding-top: 8px; font-size: 10px; }")
+        layout = QFormLayout()
+        layout.setSpacing(2)
+        layout.setContentsMargins(3, 3, 3, 3)
+        
+        self.ppms_combo = QComboBox()
+        self.ppms_combo.addItem("请先连接PPMS")
+        self.ppms_combo.setMinimumHeight(22)
+        self.ppms_combo.setMaximumWidth(150)
+        layout.addRow("PPMS:", self.ppms_combo)
+        
+        self.campaign_quantity_combo = QComboBox()
+        self.campaign_quantity_combo.addItem("温度 (K)", "temperature")
+        self.campaign_quantity_combo.addItem("磁场 (Oe)", "field")
+        self.campaign_quantity_combo.setMaximumHeight(22)
+        self.campaign_quantity_combo.setMaximumWidth(120)
+        layout.addRow("设定量:", self.campaign_quantity_combo)
+        
+        self.setpoints_lineedit = QLineEdit()
+        self.setpoints_lineedit.setPlaceholderText("例如 2, 5, 10:300:10")
+        self.setpoints_lineedit.setMaximumHeight(22)
+        self.setpoints_lineedit.setMaximumWidth(180)
+        layout.addRow("设定点:", self.setpoints_lineedit)
+        
+        # 变温速率 K/min 或扫场速率 Oe/s
+        self.campaign_rate_spinbox = QDoubleSpinBox()
+        self.campaign_rate_spinbox.setRange(0.001, 10000.0)
+        self.campaign_rate_spinbox.setValue(5.0)
+        self.campaign_rate_spinbox.setDecimals(3)
+        self.campaign_rate_spinbox.setMaximumHeight(22)
+        self.campaign_rate_spinbox.setMaximumWidth(120)
+        layout.addRow("速率(K/min|Oe/s):", self.campaign_rate_spinbox)
+        
+        self.campaign_tolerance_spinbox = QDoubleSpinBox()
+        self.campaign_tolerance_spinbox.setRange(0.0, 10000.0)
+        self.campaign_tolerance_spinbox.setValue(0.1)
+        self.campaign_tolerance_spinbox.setDecimals(3)
+        self.campaign_tolerance_spinbox.setMaximumHeight(22)
+        self.campaign_tolerance_spinbox.setMaximumWidth(120)
+        layout.addRow("允许偏差:", self.campaign_tolerance_spinbox)
+        
+        self.campaign_stable_spinbox = QDoubleSpinBox()
+        self.campaign_stable_spinbox.setRange(0.0, 36000.0)
+        self.campaign_stable_spinbox.setValue(60.0)
+        self.campaign_stable_spinbox.setSuffix(" s")
+        self.campaign_stable_spinbox.setDecimals(0)
+        self.campaign_stable_spinbox.setMaximumHeight(22)
+        self.campaign_stable_spinbox.setMaximumWidth(120)
+        layout.addRow("稳定时间:", self.campaign_stable_spinbox)
+        
+        self.campaign_timeout_spinbox = QDoubleSpinBox()
+        self.campaign_timeout_spinbox.setRange(0.0, 86400.0)
+        self.campaign_timeout_spinbox.setValue(7200.0)
+        self.campaign_timeout_spinbox.setSuffix(" s")
+        self.campaign_timeout_spinbox.setDecimals(0)
+        self.campaign_timeout_spinbox.setSpecialValueText("不限")
+        self.campaign_timeout_spinbox.setMaximumHeight(22)
+        self.campaign_timeout_spinbox.setMaximumWidth(120)
+        layout.addRow("等待上限:", self.campaign_timeout_spinbox)
+        
+        # 数据集目录，已有未完成的序列时从中断处继续
+        campaign_dir_layout = QHBoxLayout()
+        self.campaign_dir_lineedit = QLineEdit()
+        self.campaign_dir_lineedit.setPlaceholderText("留空将自动生成目录")
+        self.campaign_dir_lineedit.setMaximumHeight(22)
+        campaign_dir_layout.addWidget(self.campaign_dir_lineedit)
+        campaign_dir_button = QPushButton("浏览...")
+        campaign_dir_button.setMaximumHeight(22)
+        campaign_dir_button.clicked.connect(self.browse_campaign_directory)
+        campaign_dir_layout.addWidget(campaign_dir_button)
+        layout.addRow("数据目录:", campaign_dir_layout)
+        
+        self.campaign_button = QPushButton("开始序列")
+        self.campaign_button.setMaximumHeight(25)
+        self.campaign_button.setMaximumWidth(70)
+        layout.addRow("", self.campaign_button)
+        
         group.setLayout(layout)
         parent_layout.addWidget(group)
         
@@ -613,6 +1363,36 @@ class PyFreSweeper(QWidget):
         group.setLayout(layout)
         parent_layout.addWidget(group)
         
+    def create_fit_group(self, parent_layout):
+        """创建共振拟合组"""
+        group = QGroupBox("共振拟合")
+        group.setStyleSheet("QGroupBox { font-weight: bold; padding-top: 8px; font-size: 10px; }")
+        layout = QFormLayout()
+        layout.setSpacing(2)
+        layout.setContentsMargins(3, 3, 3, 3)
+        
+        # 扫描过程中实时拟合X/Y数据并在图上叠加拟合曲线
+        self.fit_enabled_checkbox = QCheckBox("实时拟合")
+        self.fit_enabled_checkbox.setChecked(True)
+        layout.addRow("", self.fit_enabled_checkbox)
+        
+        self.fit_model_combo = QComboBox()
+        for model, name in MODELS.items():
+            self.fit_model_combo.addItem(name, model)
+        self.fit_model_combo.setMaximumHeight(22)
+        self.fit_model_combo.setMaximumWidth(120)
+        layout.addRow("拟合模型:", self.fit_model_combo)
+        
+        self.fit_labels = {}
+        for key, title in [('f0', "f0:"), ('Q', "Q:"), ('amplitude', "幅度:"), ('background', "背景:")]:
+            label = QLabel("--")
+            label.setStyleSheet("QLabel { font-family: monospace; font-size: 9px; }")
+            self.fit_labels[key] = label
+            layout.addRow(title, label)
+        
+        group.setLayout(layout)
+        parent_layout.addWidget(group)
+        
     def create_log_group(self, parent_layout):
         """创建日志显示组"""
         group = QGroupBox("日志")
@@ -649,6 +1429,10 @@ class PyFreSweeper(QWidget):
         self.start_button.clicked.connect(self.start_sweep)
         self.stop_button.clicked.connect(self.stop_sweep)
         self.save_button.clicked.connect(self.save_data)
+        self.campaign_button.clicked.connect(self.start_campaign)
+        
+        # 导出服务
+        self.export_jobs.job_finished.connect(self.on_export_finished)
         
     def set_instruments_control(self, instruments_control):
         """设置仪器控制实例"""
@@ -660,6 +1444,10 @@ class PyFreSweeper(QWidget):
         if not self.instruments_control:
             return
             
+        # 仪器连接/移除后重新填充，保留原来的选择
+        previous = [(combo, combo.currentData())
+                    for combo in (self.wf1947_combo, self.sr830_combo, self.ppms_combo)]
+            
         # 清空并重新填充WF1947列表
         self.wf1947_combo.clear()
         wf1947_found = False
@@ -682,6 +1470,33 @@ class PyFreSweeper(QWidget):
         if not sr830_found:
             self.sr830_combo.addItem("未找到SR830")
             
+        # 附加SR830列表保留之前的勾选
+        checked = set(self._checked_extra_sr830())
+        self.extra_sr830_list.clear()
+        for address, instrument in self.instruments_control.instruments_instance.items():
+            if hasattr(instrument, 'type') and instrument.type == "SR830":
+                item = QListWidgetItem(f"SR830 - {address}")
+                item.setData(Qt.UserRole, address)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked if address in checked else Qt.Unchecked)
+                self.extra_sr830_list.addItem(item)
+            
+        # 清空并重新填充PPMS列表
+        self.ppms_combo.clear()
+        ppms_found = False
+        for address, instrument in self.instruments_control.instruments_instance.items():
+            if hasattr(instrument, 'type') and instrument.type == "PPMS":
+                self.ppms_combo.addItem(f"PPMS - {address}", address)
+                ppms_found = True
+                
+        if not ppms_found:
+            self.ppms_combo.addItem("未找到PPMS")
+            
+        for combo, address in previous:
+            index = combo.findData(address) if address else -1
+            if index >= 0:
+                combo.setCurrentIndex(index)
+            
     def get_selected_instruments(self):
         """获取选中的仪器"""
         wf1947_address = self.wf1947_combo.currentData()
@@ -693,8 +1508,38 @@ class PyFreSweeper(QWidget):
         wf1947 = self.instruments_control.instruments_instance.get(wf1947_address)
         sr830 = self.instruments_control.instruments_instance.get(sr830_address)
         
+        # 勾选了附加SR830时返回列表，主SR830在前
+        extras = [self.instruments_control.instruments_instance.get(address)
+                  for address in self._checked_extra_sr830() if address != sr830_address]
+        extras = [instrument for instrument in extras if instrument is not None]
+        if sr830 and extras:
+            sr830 = [sr830] + extras
+        
         return wf1947, sr830
         
+    def _checked_extra_sr830(self):
+        """勾选的附加SR830地址"""
+        addresses = []
+        for row in range(self.extra_sr830_list.count()):
+            item = self.extra_sr830_list.item(row)
+            if item.checkState() == Qt.Checked:
+                addresses.append(item.data(Qt.UserRole))
+        return addresses
+        
+    def browse_campaign_directory(self):
+        """选择扫描序列数据目录"""
+        directory = QFileDialog.getExistingDirectory(self, "选择扫描序列数据目录")
+        if directory:
+            self.campaign_dir_lineedit.setText(directory)
+            
+    def browse_grid_file(self):
+        """选择自定义频率文件"""
+        filepath, _ = QFileDialog.getOpenFileName(
+            self, "选择频率文件", "", "文本文件 (*.txt *.dat *.csv);;所有文件 (*)")
+        if filepath:
+            self.grid_file_lineedit.setText(filepath)
+            self.grid_mode_combo.setCurrentIndex(self.grid_mode_combo.findData('file'))
+            
     def get_sweep_parameters(self):
         """获取扫描参数（严格按照WF1947 setup_frequency_sweep方法）"""
         load_value = self.load_combo.currentText()
@@ -718,7 +1563,27 @@ class PyFreSweeper(QWidget):
             'direction': self.direction_combo.currentText(),
             
             # 数据采样参数
-            'sample_interval': self.sample_interval_spinbox.value()
+            'sample_interval': self.sample_interval_spinbox.value(),
+            
+            # 程序步进的频率点：points / step_hz / grid_file 三者之一
+            'points': self.points_spinbox.value() if self.grid_mode_combo.currentData() == 'points' else None,
+            'step_hz': self.step_spinbox.value() if self.grid_mode_combo.currentData() == 'step' else None,
+            'grid_file': self.grid_file_lineedit.text().strip() if self.grid_mode_combo.currentData() == 'file' else None,
+            
+            # 'stepped' / 'hardware'（WF1947硬件扫描 + SR830缓存采样）/ 'adaptive'
+            'mode': self.sweep_mode_combo.currentData(),
+            
+            # 自适应细化参数
+            'coarse_points': self.coarse_points_spinbox.value(),
+            'resolution_hz': self.resolution_spinbox.value(),
+            
+            # 程序步进的稳定参数
+            'settle_accuracy': self.settle_accuracy_combo.currentData(),
+            'converge': self.converge_checkbox.isChecked(),
+            
+            # 程序步进的重复扫描
+            'passes': self.passes_spinbox.value(),
+            'bidirectional': self.bidirectional_checkbox.isChecked()
         }
         
     def start_sweep(self):
@@ -741,18 +1606,24 @@ class PyFreSweeper(QWidget):
             if sweep_params['start_hz'] >= sweep_params['stop_hz']:
                 self.add_log("错误: 起始频率必须小于结束频率")
                 return
+            if self.grid_mode_combo.currentData() == 'file' and not sweep_params['grid_file']:
+                self.add_log("错误: 请选择自定义频率文件")
+                return
                 
             # 创建扫描线程
             self.sweep_thread = FrequencySweepThread(wf1947, sr830, sweep_params)
+            if isinstance(sr830, list):
+                self.add_log(f"同时读取 {len(sr830)} 台SR830，附加SR830的数据保存为 X_2、Y_2… 列")
             
             # 连接信号
             self.sweep_thread.data_acquired.connect(self.on_data_acquired)
             self.sweep_thread.sweep_finished.connect(self.on_sweep_finished)
             self.sweep_thread.error_occurred.connect(self.on_error_occurred)
+            self.sweep_thread.warning_occurred.connect(self.on_warning_occurred)
             self.sweep_thread.progress_updated.connect(self.on_progress_updated)
             
             # 清空之前的数据
-            self.sweep_data = []
+            self._reset_results()
             
             # 开始扫描
             self.sweep_thread.start()
@@ -763,6 +1634,7 @@ class PyFreSweeper(QWidget):
             # 更新UI状态
             self.is_sweeping = True
             self.start_button.setEnabled(False)
+            self.campaign_button.setEnabled(False)
             self.stop_button.setEnabled(True)
             self.save_button.setEnabled(False)
             self.status_label.setText("扫描中...")
@@ -782,6 +1654,128 @@ class PyFreSweeper(QWidget):
             self.add_log(f"启动扫描失败: {e}")
             QMessageBox.critical(self, "错误", f"启动频率扫描失败:\n{e}")
             
+    def _reset_results(self):
+        """清空扫描数据，新建拟合器（不沿用上一次扫描的解）"""
+        self.sweep_data = []
+        self.trace_bins = {}
+        if self.fit_enabled_checkbox.isChecked():
+            self.fitter = ResonanceFitter(self.fit_model_combo.currentData())
+        else:
+            self.fitter = None
+        self.fit_result = None
+        self._last_fit_time = 0.0
+        self._show_fit_result()
+        
+    def start_campaign(self):
+        """开始（或继续）扫描序列"""
+        if not self.instruments_control:
+            self.add_log("错误: 未连接仪器控制系统")
+            return
+            
+        wf1947, sr830 = self.get_selected_instruments()
+        ppms_address = self.ppms_combo.currentData()
+        ppms = self.instruments_control.instruments_instance.get(ppms_address) if ppms_address else None
+        if not wf1947 or not sr830 or not ppms:
+            self.add_log("错误: 请选择有效的WF1947、SR830和PPMS仪器")
+            return
+            
+        try:
+            setpoints = parse_setpoints(self.setpoints_lineedit.text())
+        except ValueError as e:
+            self.add_log(f"错误: {e}")
+            return
+            
+        try:
+            sweep_params = self.get_sweep_parameters()
+            if sweep_params['start_hz'] >= sweep_params['stop_hz']:
+                self.add_log("错误: 起始频率必须小于结束频率")
+                return
+                
+            directory = self.campaign_dir_lineedit.text().strip()
+            if not directory:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                directory = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'history_data',
+                                         f"sweep_campaign_{timestamp}")
+                self.campaign_dir_lineedit.setText(os.path.normpath(directory))
+                
+            campaign_params = {
+                'quantity': self.campaign_quantity_combo.currentData(),
+                'setpoints': setpoints,
+                'rate': self.campaign_rate_spinbox.value(),
+                'stable_time_s': self.campaign_stable_spinbox.value(),
+                'tolerance': self.campaign_tolerance_spinbox.value() or None,
+                'timeout_s': self.campaign_timeout_spinbox.value() or None,
+                'directory': directory
+            }
+            
+            self.sweep_thread = SweepCampaignThread(ppms, wf1947, sr830, sweep_params, campaign_params)
+            self.sweep_thread.setpoint_changed.connect(self.on_campaign_setpoint)
+            self.sweep_thread.setpoint_finished.connect(self.on_campaign_setpoint_finished)
+            self.sweep_thread.status_changed.connect(self.on_campaign_status)
+            self.sweep_thread.data_acquired.connect(self.on_data_acquired)
+            self.sweep_thread.progress_updated.connect(self.on_progress_updated)
+            self.sweep_thread.campaign_finished.connect(self.on_campaign_finished)
+            self.sweep_thread.error_occurred.connect(self.on_error_occurred)
+            self.sweep_thread.warning_occurred.connect(self.on_warning_occurred)
+            
+            self._reset_results()
+            self.sweep_thread.start()
+            
+            # 请求停止仪器显示面板更新，避免数据读取冲突
+            self.request_stop_display.emit()
+            
+            # 更新UI状态
+            self.is_sweeping = True
+            self.start_button.setEnabled(False)
+            self.campaign_button.setEnabled(False)
+            self.stop_button.setEnabled(True)
+            self.save_button.setEnabled(False)
+            self.status_label.setText("序列进行中...")
+            self.status_label.setStyleSheet("QLabel { color: #4CAF50; font-weight: bold; }")
+            self.progress_bar.setVisible(True)
+            
+            self.add_log(f"开始扫描序列: {len(setpoints)} 个设定点，数据目录 {directory}")
+            
+        except Exception as e:
+            self.add_log(f"启动扫描序列失败: {e}")
+            QMessageBox.critical(self, "错误", f"启动扫描序列失败:\n{e}")
+            
+    def on_campaign_setpoint(self, index, set_point):
+        """开始处理新的设定点"""
+        total = len(self.sweep_thread.campaign_params['setpoints'])
+        self._reset_results()
+        self.status_label.setText(f"设定点 {index + 1}/{total}: {set_point:g}")
+        self.add_log(f"设定点 {index + 1}/{total}: {set_point:g}，等待稳定...")
+        
+    def on_campaign_status(self, message):
+        """显示等待稳定等状态"""
+        self.current_freq_label.setText(message)
+        
+    def on_campaign_setpoint_finished(self, index, points):
+        """一个设定点的扫描完成并已写入数据集"""
+        set_point = self.sweep_thread.campaign_params['setpoints'][index]
+        self._update_fit()
+        message = f"设定点 {set_point:g} 扫描完成，{points} 个数据点已保存"
+        if self.fit_result is not None:
+            message += f"；f0 = {self.fit_result['f0']:.4f} Hz, Q = {self.fit_result['Q']:.2f}"
+        self.add_log(message)
+        
+    def on_campaign_finished(self):
+        """扫描序列全部完成"""
+        self.is_sweeping = False
+        self.start_button.setEnabled(True)
+        self.campaign_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.progress_bar.setVisible(False)
+        self.status_label.setText("序列完成")
+        self.status_label.setStyleSheet("QLabel { color: #4CAF50; font-weight: bold; }")
+        
+        # 请求重新开始仪器显示面板更新
+        self.request_start_display.emit()
+        
+        self.add_log(f"扫描序列完成，数据保存在 {self.sweep_thread.campaign_params['directory']}")
+        self.add_log("已恢复仪器显示更新")
+        
     def stop_sweep(self):
         """停止频率扫描"""
         if self.sweep_thread and self.is_sweeping:
@@ -791,6 +1785,7 @@ class PyFreSweeper(QWidget):
             # 更新UI状态
             self.is_sweeping = False
             self.start_button.setEnabled(True)
+            self.campaign_button.setEnabled(True)
             self.stop_button.setEnabled(False)
             self.progress_bar.setVisible(False)
             self.status_label.setText("已停止")
@@ -801,52 +1796,32 @@ class PyFreSweeper(QWidget):
             
             self.add_log("扫描已停止")
             self.add_log("已恢复仪器显示更新")
+            if self.trace_bins:
+                self.sweep_data = self.sweep_thread.get_sweep_data()
+            self._update_fit()
             
             # 如果有数据，允许保存
             if self.sweep_data:
                 self.save_button.setEnabled(True)
             
     def save_data(self):
-        """保存扫描数据"""
+        """保存扫描数据（后台保存，完成后弹窗）"""
         if not self.sweep_data:
             self.add_log("没有数据可保存")
             return
             
-        try:
-            # 生成文件名
-            filename = self.filename_lineedit.text().strip()
-            if not filename:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"frequency_sweep_{timestamp}"
-                
-            # 确保保存到history_data文件夹
-            save_dir = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'history_data')
-            filepath = os.path.join(save_dir, filename)
-            
-            # 使用统一的数据保存方法
-            success, message = DataSort.save_data_to_file(
-                self.sweep_data, 
-                filepath, 
-                "Frequency Sweep Data"
-            )
-            
-            if success:
-                self.add_log(f"数据保存成功: {message}")
-                QMessageBox.information(self, "成功", message)
-                self.save_button.setEnabled(False)
-            else:
-                self.add_log(f"保存数据失败: {message}")
-                QMessageBox.critical(self, "错误", f"保存数据失败:\n{message}")
-            
-        except Exception as e:
-            self.add_log(f"保存数据失败: {e}")
-            QMessageBox.critical(self, "错误", f"保存数据失败:\n{e}")
+        if self._submit_save(auto=False) is not None:
+            self.save_button.setEnabled(False)
             
     def _auto_save_data(self):
-        """自动保存数据（无弹窗）"""
+        """自动保存数据（后台保存，无弹窗），返回是否已提交"""
         if not self.sweep_data:
             return False
             
+        return self._submit_save(auto=True) is not None
+        
+    def _submit_save(self, auto):
+        """把扫描数据的保存提交到导出服务，返回任务编号，提交失败时返回None"""
         try:
             # 生成文件名
             filename = self.filename_lineedit.text().strip()
@@ -858,27 +1833,45 @@ class PyFreSweeper(QWidget):
             save_dir = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'history_data')
             filepath = os.path.join(save_dir, filename)
             
-            # 使用统一的数据保存方法
-            success, message = DataSort.save_data_to_file(
-                self.sweep_data, 
-                filepath, 
-                "Frequency Sweep Data (Auto-saved)"
+            # 使用统一的数据保存方法；传入数据列表的副本，保存期间可以开始新的扫描
+            return self.export_jobs.submit(
+                DataSort.save_data_to_file,
+                list(self.sweep_data),
+                filepath,
+                "Frequency Sweep Data (Auto-saved)" if auto else "Frequency Sweep Data",
+                tag=auto, description="保存扫描数据"
             )
             
-            if success:
-                self.add_log(f"数据自动保存成功: {message}")
-                return True
-            else:
-                self.add_log(f"自动保存数据失败: {message}")
-                return False
-            
         except Exception as e:
-            self.add_log(f"自动保存数据失败: {e}")
-            return False
+            self.add_log(f"保存数据失败: {e}")
+            if not auto:
+                QMessageBox.critical(self, "错误", f"保存数据失败:\n{e}")
+            return None
+            
+    def on_export_finished(self, auto, success, message):
+        """导出完成"""
+        if success:
+            self.add_log(f"数据{'自动' if auto else ''}保存成功: {message}")
+            if not auto:
+                QMessageBox.information(self, "成功", message)
+        else:
+            self.add_log(f"{'自动' if auto else ''}保存数据失败: {message}")
+            self.save_button.setEnabled(True)
+            if not auto:
+                QMessageBox.critical(self, "错误", f"保存数据失败:\n{message}")
             
     def on_data_acquired(self, data_point):
         """接收到新数据"""
-        self.sweep_data.append(data_point)
+        if 'direction' in data_point:
+            # 多次扫描：只保留每个频率点的最新均值，扫描结束后从线程取均值行
+            self.trace_bins.setdefault(data_point['direction'], {})[data_point['index']] = data_point
+        elif self.sweep_data and data_point['frequency'] < self.sweep_data[-1]['frequency'] \
+                and self.sweep_thread and self.sweep_thread.sweep_params.get('mode') == 'adaptive':
+            # 自适应细化的补测点按频率插入，保持数据有序
+            index = bisect.bisect([point['frequency'] for point in self.sweep_data], data_point['frequency'])
+            self.sweep_data.insert(index, data_point)
+        else:
+            self.sweep_data.append(data_point)
         
         # 更新当前频率显示
         freq = data_point['frequency']
@@ -888,8 +1881,50 @@ class PyFreSweeper(QWidget):
             freq_str = f"{freq:.2f} Hz"
         self.current_freq_label.setText(freq_str)
         
+        # 限制拟合频率，拟合以上一次的解为初值，每次只需几毫秒
+        if time.perf_counter() - self._last_fit_time >= self.FIT_INTERVAL:
+            self._update_fit()
+            
+    def _update_fit(self):
+        """用当前的全部扫描数据更新共振拟合"""
+        if self.trace_bins:
+            # 多次扫描拟合上扫（没有时为下扫）的均值
+            trace = self.trace_bins.get(1) or self.trace_bins.get(-1)
+            points = [trace[index] for index in sorted(trace)]
+            x_key, y_key = 'X_mean', 'Y_mean'
+        else:
+            points = self.sweep_data
+            x_key, y_key = 'X', 'Y'
+        if self.fitter is None or not points:
+            return
+        self._last_fit_time = time.perf_counter()
+        try:
+            result = self.fitter.update([point['frequency'] for point in points],
+                                        [point[x_key] for point in points],
+                                        [point[y_key] for point in points])
+        except Exception as e:
+            self.add_log(f"共振拟合失败: {e}")
+            return
+        if result is not None:
+            self.fit_result = result
+            self._show_fit_result()
+            
+    def _show_fit_result(self):
+        """在拟合组中显示拟合结果"""
+        result = self.fit_result
+        if result is None:
+            for label in self.fit_labels.values():
+                label.setText("--")
+            return
+        self.fit_labels['f0'].setText(f"{result['f0']:.4f} Hz")
+        self.fit_labels['Q'].setText(f"{result['Q']:.2f}  (Δf {result['linewidth']:.4g} Hz)")
+        self.fit_labels['amplitude'].setText(f"{result['amplitude']:.4g} V ∠ {result['phase']:.2f}°")
+        background = result['background']
+        self.fit_labels['background'].setText(f"{background.real:.3g} + {background.imag:.3g}j V")
+        
     def on_progress_updated(self, current, total):
         """更新进度"""
+        self.progress_bar.setMaximum(total)
         self.progress_bar.setValue(current)
         self.progress_label.setText(f"{current}/{total}")
         
@@ -897,6 +1932,7 @@ class PyFreSweeper(QWidget):
         """扫描完成"""
         self.is_sweeping = False
         self.start_button.setEnabled(True)
+        self.campaign_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         
         self.progress_bar.setVisible(False)
@@ -906,7 +1942,21 @@ class PyFreSweeper(QWidget):
         # 请求重新开始仪器显示面板更新
         self.request_start_display.emit()
         
-        self.add_log(f"频率扫描完成，共采集 {len(self.sweep_data)} 个数据点")
+        if self.trace_bins:
+            self.sweep_data = self.sweep_thread.get_sweep_data()
+            passes = self.sweep_thread.sweep_params.get('passes', 1)
+            self.add_log(f"频率扫描完成，{passes} 次扫描，共 {len(self.sweep_data)} 个频率点均值")
+        else:
+            self.add_log(f"频率扫描完成，共采集 {len(self.sweep_data)} 个数据点")
+        self._update_fit()
+        if self.fit_result is not None:
+            self.add_log(f"共振拟合: f0 = {self.fit_result['f0']:.4f} Hz, Q = {self.fit_result['Q']:.2f}, "
+                         f"幅度 = {self.fit_result['amplitude']:.4g} V")
+        if self.sweep_thread and self.sweep_thread.sweep_params.get('mode') == 'adaptive':
+            width = half_power_width([point['frequency'] for point in self.sweep_data],
+                                     [point['R'] for point in self.sweep_data])
+            if width is not None:
+                self.add_log(f"半功率线宽估计: {width:.3f} Hz")
         self.add_log("已恢复仪器显示更新")
         
         # 自动保存数据
@@ -922,6 +1972,7 @@ class PyFreSweeper(QWidget):
         """发生错误"""
         self.is_sweeping = False
         self.start_button.setEnabled(True)
+        self.campaign_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         self.progress_bar.setVisible(False)
         
@@ -939,6 +1990,10 @@ class PyFreSweeper(QWidget):
         if self.sweep_data:
             self.save_button.setEnabled(True)
             
+    def on_warning_occurred(self, message):
+        """扫描中不中断扫描的问题，记入日志"""
+        self.add_log(f"警告: {message}")
+        
     def add_log(self, message):
         """添加日志消息"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -955,6 +2010,8 @@ class PyFreSweeper(QWidget):
         
     def get_data_for_plotting(self):
         """获取用于绘图的数据"""
+        if self.trace_bins:
+            return self._get_trace_plot_data()
         if not self.sweep_data:
             return None
             
@@ -962,8 +2019,49 @@ class PyFreSweeper(QWidget):
         amplitudes = [point['R'] for point in self.sweep_data]
         phases = [point['theta'] for point in self.sweep_data]
         
-        return {
+        plot_data = {
             'frequency': frequencies,
             'amplitude': amplitudes,
             'phase': phases
-        }
\ No newline at end of file
+        }
+        self._add_fit_curve(plot_data)
+        return plot_data
+        
+    def _get_trace_plot_data(self):
+        """多次扫描的绘图数据：上扫/下扫各一条均值曲线和标准误差"""
+        plot_data = {'frequency': [], 'amplitude': [], 'phase': [], 'traces': []}
+        for direction, label in [(1, "上扫"), (-1, "下扫")]:
+            trace = self.trace_bins.get(direction)
+            if not trace:
+                continue
+            points = sorted(trace.values(), key=lambda point: point['frequency'])
+            frequencies = [point['frequency'] for point in points]
+            amplitudes = [point['R_mean'] for point in points]
+            phases = [point['theta_mean'] for point in points]
+            plot_data['traces'].append({
+                'label': label,
+                'frequency': frequencies,
+                'amplitude': amplitudes,
+                'amplitude_err': [point['R_err'] for point in points],
+                'phase': phases,
+                'phase_err': [point['theta_err'] for point in points]
+            })
+            plot_data['frequency'] += frequencies
+            plot_data['amplitude'] += amplitudes
+            plot_data['phase'] += phases
+        self._add_fit_curve(plot_data)
+        return plot_data
+        
+    def _add_fit_curve(self, plot_data):
+        """在绘图数据中加入拟合曲线"""
+        frequencies = plot_data['frequency']
+        
+        # 拟合曲线：在数据频率范围内均匀取点计算
+        if self.fitter is not None and self.fit_result is not None:
+            fit_frequencies = np.linspace(min(frequencies), max(frequencies), 500)
+            fit_values = self.fitter.evaluate(fit_frequencies)
+            plot_data['fit'] = {
+                'frequency': fit_frequencies.tolist(),
+                'amplitude': np.abs(fit_values).tolist(),
+                'phase': np.degrees(np.angle(fit_values)).tolist()
+            }
\ No newline at end of file
@@ -148,6 +148,12 @@ class PyFreTrack(QWidget):
         if not self.instruments_control:
             return
             
+        # 仪器连接/移除后重新填充，保留原来的选择，填充完成后统一更新PID控制器的仪器
+        previous_wf1947 = self.wf1947_combo.currentData()
+        previous_sr830 = self.sr830_combo.currentData()
+        self.wf1947_combo.blockSignals(True)
+        self.sr830_combo.blockSignals(True)
+        
         # 清空并重新填充WF1947列表
         self.wf1947_combo.clear()
         wf1947_found = False
@@ -170,6 +176,12 @@ class PyFreTrack(QWidget):
         if not sr830_found:
             self.sr830_combo.addItem("未找到SR830")
             
+        for combo, previous in ((self.wf1947_combo, previous_wf1947), (self.sr830_combo, previous_sr830)):
+            index = combo.findData(previous) if previous else -1
+            if index >= 0:
+                combo.setCurrentIndex(index)
+            combo.blockSignals(False)
+            
         # 触发仪器选择更新
         self.on_instrument_selected()
             
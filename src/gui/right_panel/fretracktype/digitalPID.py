@@ -6,6 +6,9 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "../../../.."))
 from src.component.PID import FrequencyTrackingThread
+# 导出服务按 component 包导入，与其他面板共用同一个实例
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+from component.exportservice import ExportJobs
 from datetime import datetime
 
 
@@ -35,6 +38,10 @@ class PyDigitalPID(QWidget):
         self.selected_wf1947 = None
         self.selected_sr830 = None
         
+        # 追踪数据的后台保存任务
+        self.export_jobs = ExportJobs(self)
+        self.export_jobs.job_finished.connect(self.on_export_finished)
+        
         self.init_ui()
         
     def init_ui(self):
@@ -126,6 +133,13 @@ class PyDigitalPID(QWidget):
         sample_layout.addWidget(self.sample_interval_spinbox)
         tracking_layout.addLayout(sample_layout)
         
+        # SR830 FAST数据流选项
+        self.stream_checkbox = QCheckBox("使用SR830数据流读取相位")
+        self.stream_checkbox.setToolTip("SR830以512Hz FAST模式持续输出R/θ，追踪循环直接读取最新样本；\n"
+                                        "追踪期间该SR830不响应其他查询")
+        self.stream_checkbox.setChecked(False)
+        tracking_layout.addWidget(self.stream_checkbox)
+        
         # 自动保存选项
         self.auto_save_checkbox = QCheckBox("自动保存数据")
         self.auto_save_checkbox.setChecked(True)
@@ -235,13 +249,12 @@ class PyDigitalPID(QWidget):
                 QMessageBox.warning(self, "错误", "请先在频率追踪面板中选择WF1947和SR830仪器")
                 return
             
-            # 设置WF1947的初始频率
+            # 设置WF1947的初始频率并开启输出（合并为一条SCPI消息发送）
             initial_frequency = self.initial_freq_spinbox.value()
-            self.selected_wf1947.set_frequency(initial_frequency)
+            with self.selected_wf1947.batch(opc=True):
+                self.selected_wf1947.set_frequency(initial_frequency)
+                self.selected_wf1947.set_output(True)
             print(f"设置WF1947初始频率: {initial_frequency} Hz")
-            
-            # 开启WF1947输出
-            self.selected_wf1947.set_output(True)
             print("WF1947输出已开启")
                 
             # 获取PID参数
@@ -262,7 +275,9 @@ class PyDigitalPID(QWidget):
             
             # 设置追踪参数
             sample_interval = self.sample_interval_spinbox.value()
-            self.tracking_thread.set_tracking_params(sample_interval)
+            self.tracking_thread.set_tracking_params(
+                sample_interval, use_stream=self.stream_checkbox.isChecked()
+            )
             
             # 连接信号
             self.tracking_thread.data_updated.connect(self.on_data_updated)
@@ -397,32 +412,40 @@ class PyDigitalPID(QWidget):
         )
         
         if filename:
-            success, message = self.save_tracking_data(filename)
-            if success:
-                QMessageBox.information(self, "成功", message)
-            else:
-                QMessageBox.critical(self, "失败", message)
+            self._submit_save(filename, auto=False)
                 
     def save_data_automatically(self):
-        """自动保存数据"""
+        """自动保存数据（后台保存）"""
         if not self.tracking_data:
             return
             
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"history_data/frequency_tracking_{timestamp}.dat"
+        self._submit_save(filename, auto=True)
+        
+    def _submit_save(self, filename, auto):
+        """把追踪数据的保存提交到导出服务（传入数据副本，保存期间可以继续追踪）"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"history_data/frequency_tracking_{timestamp}.dat"
-            
-            success, message = self.save_tracking_data(filename)
-            if success:
-                print(f"数据自动保存成功: {message}")
-            else:
-                print(f"数据自动保存失败: {message}")
-                
+            self.export_jobs.submit(
+                self.save_tracking_data, filename, list(self.tracking_data),
+                tag=auto, description="保存追踪数据"
+            )
         except Exception as e:
-            print(f"自动保存数据时出错: {e}")
+            print(f"保存数据时出错: {e}")
+            if not auto:
+                QMessageBox.critical(self, "失败", f"保存数据失败: {e}")
+                
+    def on_export_finished(self, auto, success, message):
+        """导出完成"""
+        if auto:
+            print(f"数据自动保存{'成功' if success else '失败'}: {message}")
+        elif success:
+            QMessageBox.information(self, "成功", message)
+        else:
+            QMessageBox.critical(self, "失败", message)
             
-    def save_tracking_data(self, filename):
-        """保存追踪数据"""
+    def save_tracking_data(self, filename, data=None):
+        """保存追踪数据（data 默认为当前的追踪数据）"""
         try:
             from src.component.datasort import DataSort
             
@@ -430,7 +453,7 @@ class PyDigitalPID(QWidget):
             os.makedirs("history_data", exist_ok=True)
             
             success, message = DataSort.save_data_to_file(
-                self.tracking_data, filename, "Frequency Tracking Data"
+                self.tracking_data if data is None else data, filename, "Frequency Tracking Data"
             )
             
             return success, message
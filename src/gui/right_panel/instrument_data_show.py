@@ -4,12 +4,13 @@ from PySide6.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QComboBox, QCheckBox,
     QDialogButtonBox, QMessageBox
 )
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtCore import QTimer, Qt, Signal
 from PySide6.QtGui import QFont
 from typing import Dict, Optional, Any
 from numpy.typing import NDArray
 
 import logging
+import threading
 import time
 
 import os
@@ -17,6 +18,8 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from instruments.instrumentscontrol import InstrumentsControl
+from instruments.actor import call_async
+from instruments.busscheduler import bus_priority, DISPLAY
 from instruments.sr830 import SR830
 from instruments.ppms import PPMS
 from instruments.wf1947 import WF1947
@@ -86,6 +89,9 @@ class WF1947SettingsDialog(QDialog):
             return
             
         try:
+            # 重新读取仪器设置，避免显示前面板修改前的缓存值
+            self.instrument.refresh()
+            
             # 获取当前值并填入表单
             current_waveform = self.instrument.get_waveform()
             waveform_index = self.waveform_combo.findText(current_waveform)
@@ -147,6 +153,9 @@ class WF1947SettingsDialog(QDialog):
             QMessageBox.critical(self, "设置失败", f"设置参数时发生错误: {e}")
 
 class PyInstrumentDataShow(QWidget):
+    # 后台读取完成 (仪器地址, 仪器, 读取的Future元组)，在界面线程中更新标签
+    data_ready = Signal(str, object, object)
+    
     def __init__(self, instruments_control: InstrumentsControl) -> None:
         super().__init__()
         
@@ -161,6 +170,10 @@ class PyInstrumentDataShow(QWidget):
         # 设置日志
         self.logger = logging.getLogger(__name__)
         
+        # 已提交、尚未完成的读取 {仪器地址: 仪器}，总线忙时不重复排队
+        self._pending_reads: Dict[str, Any] = {}
+        self.data_ready.connect(self.on_data_ready)
+        
         self.init_ui()
         self.setup_timer()
         
@@ -663,22 +676,92 @@ class PyInstrumentDataShow(QWidget):
         # 先检查是否有新的仪器需要添加
         self.refresh_instruments()
         
-        # 更新每个仪器的数据（仅在非外部数据源模式下）
-        for address, instrument in self.instruments_control.instruments_instance.items():
-            if address in self.data_labels:
+        # 显示刷新使用最低的总线优先级，不延迟PID控制和数据记录的读取
+        with bus_priority(DISPLAY):
+            self._update_instruments()
+            
+    def _update_instruments(self) -> None:
+        """提交所有已显示仪器的读取，读取完成后由 data_ready 信号更新界面
+        
+        各仪器在自己的I/O线程中并行读取，界面线程不等待总线（显示读取的优先级最低，
+        可能排在数据记录的大批量缓存读取之后）。
+        """
+        instruments = {address: instrument
+                       for address, instrument in self.instruments_control.instruments_instance.items()
+                       if address in self.data_labels}
+        for address, instrument in instruments.items():
+            if self._pending_reads.get(address) is instrument:
+                # 上一次读取还在排队
+                continue
+            try:
+                request = self.request_instrument_data(instrument)
+            except Exception as e:
+                self.logger.error(f"提交仪器读取失败 {address}: {e}")
+                continue
+            if request is None:
+                # FAST数据流模式的SR830直接显示环形缓存中的最新样本
                 self.update_instrument_data(address, instrument)
+                continue
+            self._pending_reads[address] = instrument
+            self._notify_when_done(address, instrument, request)
+            
+    def _notify_when_done(self, address: str, instrument: Any, request: tuple) -> None:
+        """request 中的读取全部完成后发射 data_ready（在仪器的I/O线程中发射，排队到界面线程）"""
+        remaining = [len(request)]
+        lock = threading.Lock()
+        
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                self.data_ready.emit(address, instrument, request)
+                
+        for future in request:
+            future.add_done_callback(done)
+            
+    def on_data_ready(self, address: str, instrument: Any, request: tuple) -> None:
+        """后台读取完成，更新仪器的标签（读取已完成，result()不会等待）"""
+        if self._pending_reads.get(address) is instrument:
+            del self._pending_reads[address]
+        if address not in self.data_labels or self.use_external_data:
+            return
+        self.update_instrument_data(address, instrument, request)
                 
-    def update_instrument_data(self, address: str, instrument: Any) -> None:
-        """更新单个仪器的数据"""
+    @staticmethod
+    def _is_streaming(instrument: SR830) -> bool:
+        """SR830是否在FAST数据流模式（直接读属性，不经过仪器的I/O线程排队）"""
+        stream = instrument.stream
+        return stream is not None and stream.is_alive()
+        
+    def request_instrument_data(self, instrument: Any) -> Optional[tuple]:
+        """提交单个仪器的读取，返回Future元组（无需提前读取时返回None）"""
+        instrument_type = getattr(instrument, 'type', 'Unknown')
+        if instrument_type == "SR830" and not self._is_streaming(instrument):
+            return (call_async(instrument, "getSnap", 1, 2, 3, 4, 9),
+                    call_async(instrument, "getFreSou"))
+        if instrument_type == "PPMS":
+            return (call_async(instrument, "get_temperature_field"),)
+        if instrument_type == "WF1947":
+            return tuple(call_async(instrument, method) for method in
+                         ("get_waveform", "get_frequency", "get_amplitude", "get_offset", "get_load", "get_output"))
+        return None
+                
+    def update_instrument_data(self, address: str, instrument: Any, request: Optional[tuple] = None) -> None:
+        """更新单个仪器的数据
+        
+        Args:
+            request: request_instrument_data()提前提交的读取，为None时直接读取
+        """
         try:
             instrument_type = getattr(instrument, 'type', 'Unknown')
             
             if instrument_type == "SR830":
-                self.update_sr830_data(address, instrument)
+                self.update_sr830_data(address, instrument, request)
             elif instrument_type == "PPMS":
-                self.update_ppms_data(address, instrument)
+                self.update_ppms_data(address, instrument, request)
             elif instrument_type == "WF1947":
-                self.update_wf1947_data(address, instrument)
+                self.update_wf1947_data(address, instrument, request)
                 
         except Exception as e:
             self.logger.error(f"更新仪器数据失败 {address}: {e}")
@@ -687,14 +770,30 @@ class PyInstrumentDataShow(QWidget):
                 label.setText("Error")
                 label.setStyleSheet(label.styleSheet() + "color: red;")
                 
-    def update_sr830_data(self, address: str, instrument: SR830) -> None:
+    def update_sr830_data(self, address: str, instrument: SR830, request: Optional[tuple] = None) -> None:
         """更新SR830数据"""
         try:
-            # 获取X, Y, R, theta和frequency数据
-            xyrthfreq_data: NDArray = instrument.getSnap(1, 2, 3, 4, 9)  # 返回[X, Y, R, theta, frequency]
-            
-            # 参考源数据
-            reference_source = instrument.getFreSou()
+            # FAST数据流模式下SR830总线由读取线程占用，直接显示环形缓存中的最新样本
+            if request is None and self._is_streaming(instrument):
+                xyrt_data = instrument.stream.latest_xyrt()
+                if xyrt_data is not None:
+                    labels = self.data_labels[address]
+                    labels["X"].setText(f"{xyrt_data[0]:.6f}")
+                    labels["Y"].setText(f"{xyrt_data[1]:.6f}")
+                    labels["R"].setText(f"{xyrt_data[2]:.6f}")
+                    labels["theta"].setText(f"{xyrt_data[3]:.3f}")
+                return
+            
+            if request is not None:
+                snap_request, source_request = request
+                xyrthfreq_data: NDArray = snap_request.result()
+                reference_source = source_request.result()
+            else:
+                # 获取X, Y, R, theta和frequency数据
+                xyrthfreq_data: NDArray = instrument.getSnap(1, 2, 3, 4, 9)  # 返回[X, Y, R, theta, frequency]
+                
+                # 参考源数据
+                reference_source = instrument.getFreSou()
             
             # 更新标签
             labels = self.data_labels[address]
@@ -753,11 +852,14 @@ class PyInstrumentDataShow(QWidget):
             self.logger.error(f"读取SR830数据失败 {address}: {e}")
             raise
             
-    def update_ppms_data(self, address: str, instrument: PPMS) -> None:
+    def update_ppms_data(self, address: str, instrument: PPMS, request: Optional[tuple] = None) -> None:
         """更新PPMS数据"""
         try:
             # 获取温度和磁场数据
-            T, sT, F, sF = instrument.get_temperature_field()
+            if request is not None:
+                T, sT, F, sF = request[0].result()
+            else:
+                T, sT, F, sF = instrument.get_temperature_field()
             
             # 更新标签
             labels = self.data_labels[address]
@@ -782,16 +884,19 @@ class PyInstrumentDataShow(QWidget):
             self.logger.error(f"读取PPMS数据失败 {address}: {e}")
             raise
             
-    def update_wf1947_data(self, address: str, instrument: WF1947) -> None:
+    def update_wf1947_data(self, address: str, instrument: WF1947, request: Optional[tuple] = None) -> None:
         """更新WF1947数据"""
         try:
             # 获取WF1947各项数据
-            waveform = instrument.get_waveform()
-            frequency = instrument.get_frequency()
-            amplitude = instrument.get_amplitude() 
-            offset = instrument.get_offset()
-            load = instrument.get_load()
-            output = instrument.get_output()
+            if request is not None:
+                waveform, frequency, amplitude, offset, load, output = (future.result() for future in request)
+            else:
+                waveform = instrument.get_waveform()
+                frequency = instrument.get_frequency()
+                amplitude = instrument.get_amplitude() 
+                offset = instrument.get_offset()
+                load = instrument.get_load()
+                output = instrument.get_output()
             
             # 更新标签
             labels = self.data_labels[address]
@@ -0,0 +1,249 @@
+"""
+Per-instrument I/O actor.
+
+Every instrument created by InstrumentsControl is wrapped in an InstrumentActor.
+The actor owns one worker thread and a command queue; each method call made on
+the proxy is queued and executed by that worker, so the VISA session of an
+instrument is only ever used by one thread at a time, while different
+instruments work in parallel.
+
+Calling a method on the proxy blocks until the worker has run it and returns
+its result (or raises its exception), so existing code keeps working unchanged.
+submit() / call_async() return a Future instead, which lets a consumer start
+reads on several instruments and collect them afterwards.
+
+Each call carries the bus priority of the thread that made it (see
+busscheduler). Pending calls are served in priority order, and when the actor
+has a BusScheduler every call holds a slot of the shared bus while it runs.
+
+Main objects:
+InstrumentActor(instrument, name):      Proxy serialising all method calls of "instrument".
+call_async(instrument, method, ...):    Future of instrument.method(...) for actors and plain instruments.
+"""
+
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from .busscheduler import current_priority
+
+# Priority of the stop marker queued by close(): after every pending call
+_STOP = float("inf")
+
+
+def call_async(instrument, method, *args, **kwargs):
+    """
+    Return a Future of instrument.method(*args, **kwargs).
+    Actors queue the call on their worker; plain instruments run it immediately.
+    """
+    if isinstance(instrument, InstrumentActor):
+        return instrument.submit(method, *args, **kwargs)
+    future = Future()
+    try:
+        future.set_result(getattr(instrument, method)(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class InstrumentActor:
+    """
+    Proxy running all method calls of one instrument on a dedicated worker thread.
+
+    Initialization parameters:
+    instrument:  The driver instance (SR830, WF1947, PPMS, ...).
+    name:        String used for the worker thread name, e.g. the instrument address.
+    scheduler:   BusScheduler of the bus the instrument is on, or None for
+                 instruments with a bus of their own (PPMS over TCP).
+
+    Attribute access:
+    Methods of the instrument are returned as wrappers that queue the call and
+    wait for its result. Other attributes (type, rate, stream, ...) are read and
+    written directly on the instrument.
+
+    Main methods:
+    .submit(method, *args, **kwargs):   Queue a call and return a Future.
+    .submit_job(function, *args):       Queue function(*args) as one job on the worker and return a
+                                        Future; no other call of the instrument runs in between.
+    .bus_released():                    Inside a job, context manager letting other instruments use
+                                        the bus (the worker stays reserved for the job).
+    .exclusive():                       Context manager reserving the worker (and the bus) for the
+                                        calling thread; calls made inside run directly on that
+                                        thread, so multi-step sequences are not interleaved.
+    .batch(*args, **kwargs):            instrument.batch() (WF1947) inside exclusive().
+    .close():                           Close the instrument on the worker and stop the worker.
+    """
+
+    def __init__(self, instrument, name=None, scheduler=None):
+        object.__setattr__(self, "_instrument", instrument)
+        object.__setattr__(self, "_scheduler", scheduler)
+        object.__setattr__(self, "_queue", queue.PriorityQueue())
+        object.__setattr__(self, "_sequence", itertools.count())
+        object.__setattr__(self, "_owner", None)
+        object.__setattr__(self, "_closed", False)
+        name = name or getattr(instrument, "type", "instrument")
+        worker = threading.Thread(target=self._run, name=f"io-{name}", daemon=True)
+        object.__setattr__(self, "_worker", worker)
+        worker.start()
+
+    # ---- proxy
+    def __getattr__(self, name):
+        attribute = getattr(self._instrument, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._call(attribute, args, kwargs)
+        call.__name__ = name
+        call.__doc__ = getattr(attribute, "__doc__", None)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._instrument, name, value)
+
+    def __repr__(self):
+        return f"InstrumentActor({self._instrument!r})"
+
+    @property
+    def instrument(self):
+        """The wrapped driver instance."""
+        return self._instrument
+
+    @property
+    def scheduler(self):
+        """BusScheduler of the instrument's bus, or None."""
+        return self._scheduler
+
+    # ---- worker
+    def _run(self):
+        while True:
+            priority, _, future, function, args, kwargs = self._queue.get()
+            if future is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._execute(priority, function, args, kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _execute(self, priority, function, args, kwargs):
+        """Run function while holding a bus slot of the given priority."""
+        if self._scheduler is None:
+            return function(*args, **kwargs)
+        with self._scheduler.slot(priority):
+            return function(*args, **kwargs)
+
+    def _on_worker(self):
+        """True on the worker thread or on the thread holding exclusive()."""
+        ident = threading.get_ident()
+        return ident == self._worker.ident or ident == self._owner
+
+    def _submit_function(self, function, args=(), kwargs=None, priority=None):
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError(f"{self._worker.name} is closed"))
+            return future
+        if priority is None:
+            priority = current_priority()
+        self._queue.put((priority, next(self._sequence), future, function, args, kwargs or {}))
+        return future
+
+    def _call(self, function, args, kwargs):
+        if self._on_worker():
+            return function(*args, **kwargs)
+        return self._submit_function(function, args, kwargs).result()
+
+    def submit(self, method, *args, **kwargs):
+        """Queue instrument.method(*args, **kwargs) and return a Future of its result."""
+        function = getattr(self._instrument, method)
+        if self._on_worker():
+            future = Future()
+            try:
+                future.set_result(self._call(function, args, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._submit_function(function, args, kwargs)
+
+    def submit_job(self, function, *args, **kwargs):
+        """
+        Queue function(*args, **kwargs) as a single job and return a Future of
+        its result. The function runs on the worker holding a bus slot; calls it
+        makes on this actor go straight to the instrument, so a write/read pair
+        cannot be interleaved with other callers' commands.
+        """
+        if self._on_worker():
+            future = Future()
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._submit_function(function, args, kwargs)
+
+    @contextmanager
+    def bus_released(self):
+        """
+        Inside a job, give the bus slot back while the block runs (e.g. while the
+        instrument prepares a reply) and take it again afterwards. The worker is
+        not released, so other calls of this instrument still wait for the job.
+        """
+        if self._scheduler is None or threading.get_ident() != self._worker.ident:
+            yield
+            return
+        with self._scheduler.released():
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Reserve the worker for the calling thread. The worker waits while the
+        block runs, holding the bus slot, and calls made by this thread inside
+        the block go straight to the instrument, so a sequence of commands is
+        not interleaved with requests from other threads.
+        """
+        if self._on_worker():
+            yield self
+            return
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            acquired.set()
+            release.wait()
+
+        future = self._submit_function(hold)
+        while not acquired.wait(0.1):
+            if future.done():
+                future.result()  # raises if the actor is closed
+        object.__setattr__(self, "_owner", threading.get_ident())
+        try:
+            yield self
+        finally:
+            object.__setattr__(self, "_owner", None)
+            release.set()
+
+    @contextmanager
+    def batch(self, *args, **kwargs):
+        """Run instrument.batch(*args, **kwargs) (WF1947) while holding exclusive()."""
+        with self.exclusive():
+            with self._instrument.batch(*args, **kwargs):
+                yield self
+
+    def close(self):
+        """Close the instrument on its worker thread and stop the worker."""
+        if self._closed:
+            return
+        try:
+            if hasattr(self._instrument, "close"):
+                self._call(self._instrument.close, (), {})
+        finally:
+            object.__setattr__(self, "_closed", True)
+            self._queue.put((_STOP, next(self._sequence), None, None, None, None))
+            if threading.get_ident() != self._worker.ident:
+                self._worker.join(timeout=5)
@@ -0,0 +1,234 @@
+"""
+Priority-aware scheduling of a shared instrument bus (GPIB board).
+
+Instruments on the same GPIB board share one bus: while one of them is talking,
+commands for the others wait. The BusScheduler hands the bus to one command at
+a time and, when several are waiting, picks the one with the highest priority
+class, so the PID control loop is not delayed by display refreshes queued before it.
+
+Priority classes (lower value = served first):
+CONTROL:        Feedback loops (FrequencyTrackingThread), latency critical.
+ACQUISITION:    Data recording and sweeps. Default for threads that set nothing.
+DISPLAY:        Live display / status queries.
+
+Each class can be given a bus-time budget, a fraction of every accounting window.
+A class that has used up its budget is only served when no class within its
+budget is waiting, so the bus is never left idle but a busy display cannot starve
+the recorder.
+
+The priority of a command is the priority of the thread that issued it, set with
+bus_priority() or set_thread_priority(). InstrumentActor captures it when a call
+is submitted and holds a bus slot while the call runs.
+
+Main functions:
+bus_priority(priority):         Context manager setting the priority of the calling thread.
+set_thread_priority(priority):  Set the priority of the calling thread until changed again.
+current_priority():             Priority of the calling thread.
+bus_name(address):              Bus of a VISA address, e.g. "GPIB0::8::INSTR" -> "GPIB0".
+get_scheduler(bus):             Shared BusScheduler of a bus, created on first use.
+all_schedulers():               {bus: BusScheduler} of all buses in use.
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+CONTROL = 0
+ACQUISITION = 1
+DISPLAY = 2
+PRIORITY_NAMES = {CONTROL: "control", ACQUISITION: "acquisition", DISPLAY: "display"}
+
+# Fraction of each accounting window a class may occupy the bus; None = no limit
+DEFAULT_BUDGETS = {CONTROL: None, ACQUISITION: 0.7, DISPLAY: 0.2}
+
+_local = threading.local()
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def current_priority():
+    return getattr(_local, "priority", ACQUISITION)
+
+
+def set_thread_priority(priority):
+    _local.priority = priority
+
+
+@contextmanager
+def bus_priority(priority):
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def bus_name(address):
+    return str(address).split("::")[0]
+
+
+def get_scheduler(bus):
+    with _schedulers_lock:
+        if bus not in _schedulers:
+            _schedulers[bus] = BusScheduler(bus)
+        return _schedulers[bus]
+
+
+def all_schedulers():
+    with _schedulers_lock:
+        return dict(_schedulers)
+
+
+class BusScheduler:
+    """
+    Grants exclusive use of one bus to one command at a time, by priority class.
+
+    Initialization parameters:
+    name:       String, name of the bus (e.g. "GPIB0").
+    budgets:    Dict {priority: fraction or None}, bus-time budget of each class
+                per window. Defaults to DEFAULT_BUDGETS.
+    window:     Float, length of the budget accounting window in seconds.
+
+    Main methods:
+    .slot(priority):    Context manager holding the bus for one command. Re-entrant
+                        for the thread that already holds it.
+    .released():        Context manager giving the bus back inside a slot (e.g. while an
+                        instrument prepares a reply) and taking it again afterwards.
+    .acquire(priority): Wait for the bus. .release() gives it back.
+    .stats():           Dict {class name: {...}} with current and peak queue depth,
+                        number of commands, mean/max wait time (s), total bus time (s)
+                        and the share of the current window used.
+    .reset_stats():     Clear the statistics.
+    """
+
+    def __init__(self, name, budgets=None, window=1.0):
+        self.name = name
+        self.budgets = dict(DEFAULT_BUDGETS if budgets is None else budgets)
+        self.window = window
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._waiting = []          # [(priority, sequence)]
+        self._owner = None          # thread ident holding the bus
+        self._depth = 0             # nesting depth of the owner
+        self._slot_priority = None
+        self._slot_start = 0.0
+        self._window_start = time.monotonic()
+        self._window_used = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._cond:
+            self._stats = {priority: {"commands": 0, "max_depth": 0, "total_wait": 0.0,
+                                      "max_wait": 0.0, "bus_time": 0.0}
+                           for priority in PRIORITY_NAMES}
+
+    # ---- budget
+    def _roll_window(self, now):
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            for priority in self._window_used:
+                self._window_used[priority] = 0.0
+
+    def _over_budget(self, priority):
+        budget = self.budgets.get(priority)
+        return budget is not None and self._window_used[priority] >= budget * self.window
+
+    def _next(self):
+        self._roll_window(time.monotonic())
+        return min(self._waiting, key=lambda request: (self._over_budget(request[0]), request))
+
+    # ---- slots
+    def acquire(self, priority=None):
+        if priority is None:
+            priority = current_priority()
+        ident = threading.get_ident()
+        with self._cond:
+            if self._owner == ident:
+                self._depth += 1
+                return
+            request = (priority, next(self._sequence))
+            self._waiting.append(request)
+            stats = self._stats[priority]
+            stats["max_depth"] = max(stats["max_depth"],
+                                     sum(1 for waiting in self._waiting if waiting[0] == priority))
+            start = time.monotonic()
+            while self._owner is not None or self._next() != request:
+                self._cond.wait()
+            self._waiting.remove(request)
+            self._owner = ident
+            self._depth = 1
+            self._slot_priority = priority
+            self._slot_start = time.monotonic()
+            wait = self._slot_start - start
+            stats["commands"] += 1
+            stats["total_wait"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError(f"Bus {self.name} released by a thread that does not hold it")
+            self._depth -= 1
+            if self._depth:
+                return
+            now = time.monotonic()
+            used = now - self._slot_start
+            self._stats[self._slot_priority]["bus_time"] += used
+            self._roll_window(now)
+            self._window_used[self._slot_priority] += min(used, now - self._window_start)
+            self._owner = None
+            self._slot_priority = None
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def released(self):
+        """
+        Let other commands use the bus while the block runs, then wait for the
+        bus again with the same priority and nesting depth. Does nothing for a
+        thread that does not hold the bus.
+        """
+        with self._cond:
+            if self._owner != threading.get_ident():
+                depth = 0
+            else:
+                depth, priority = self._depth, self._slot_priority
+                self._depth = 1
+                self.release()
+        try:
+            yield
+        finally:
+            if depth:
+                self.acquire(priority)
+                with self._cond:
+                    self._depth = depth
+
+    def stats(self):
+        with self._cond:
+            self._roll_window(time.monotonic())
+            result = {}
+            for priority, name in PRIORITY_NAMES.items():
+                stats = self._stats[priority]
+                commands = stats["commands"]
+                result[name] = {
+                    "depth": sum(1 for waiting in self._waiting if waiting[0] == priority),
+                    "max_depth": stats["max_depth"],
+                    "commands": commands,
+                    "mean_wait": stats["total_wait"] / commands if commands else 0.0,
+                    "max_wait": stats["max_wait"],
+                    "bus_time": stats["bus_time"],
+                    "window_share": self._window_used[priority] / self.window,
+                }
+            return result
+
+    def __repr__(self):
+        return f"BusScheduler({self.name!r})"
@@ -0,0 +1,253 @@
+"""
+Opt-in per-command latency instrumentation of the instrument connections.
+
+The drivers wrap their connection object with instrumented(): SR830.inst and
+WF1947.inst (the pyVISA resources behind SR830 queries and WF1947._send/_query)
+and PPMS.client (the MultiPyVu client). While instrumentation is disabled (the
+default) the wrapper only checks a flag; once enable() is called, every call
+is timed and recorded into a histogram for its (instrument, command) pair.
+
+Commands are named after the method and the message header, e.g.
+"query SNAP?", "write SOURce1:FREQ" or "get_temperature"; coalesced WF1947
+messages are recorded as "write batch".
+
+Histograms have logarithmic bins (BINS_PER_DECADE per decade from 1 us to
+100 s), so recording is a single increment and percentiles are accurate to
+about one bin width (~12 %).
+
+Main functions:
+enable() / disable() / is_enabled():    Switch recording on or off.
+reset():                                Clear all recorded data.
+instrumented(target, instrument):       Wrap a connection object of an instrument.
+record(instrument, command, seconds):   Record one call (used by the wrapper).
+percentiles(instrument, command):       {"p50", "p95", "p99"} in seconds.
+calls_per_second():                     {instrument: calls/s over the last second}.
+summary():                              List of dicts, one row per (instrument, command).
+export_csv(path) / export_json(path):   Write summary() as a CSV or JSON report.
+"""
+
+import csv
+import json
+import math
+import threading
+import time
+
+BINS_PER_DECADE = 20
+MIN_LATENCY = 1e-6
+DECADES = 8
+SUMMARY_FIELDS = ["instrument", "command", "calls", "calls_per_second", "mean",
+                  "p50", "p95", "p99", "min", "max", "total"]
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}    # {(instrument, command): LatencyHistogram}
+_rates = {}         # {instrument: _CallRate}
+_started = time.monotonic()
+
+
+class LatencyHistogram:
+    """
+    Histogram of call durations with logarithmic bins.
+
+    Main methods:
+    .add(seconds):          Record one duration.
+    .percentile(q):         Duration below which q percent of the calls finished.
+    Attributes: .count, .total, .min, .max (seconds).
+    """
+
+    _size = BINS_PER_DECADE * DECADES + 2
+
+    def __init__(self):
+        self.counts = [0] * self._size
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= MIN_LATENCY:
+            index = 0
+        else:
+            index = min(int(math.log10(seconds / MIN_LATENCY) * BINS_PER_DECADE) + 1, self._size - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = q / 100 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                # geometric centre of the bin, clipped to the observed range
+                value = MIN_LATENCY * 10 ** ((index - 0.5) / BINS_PER_DECADE)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class _CallRate:
+    """Calls counted in fixed one-second windows."""
+
+    def __init__(self):
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.rate = 0.0
+
+    def add(self, now):
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            # an idle gap longer than one window means no calls in the last second
+            self.rate = self.count / elapsed if elapsed < 2.0 else 0.0
+            self.window_start = now
+            self.count = 0
+        self.count += 1
+
+    def current(self, now):
+        elapsed = now - self.window_start
+        if elapsed >= 2.0:
+            return 0.0
+        if elapsed >= 1.0:
+            return self.count / elapsed
+        return self.rate
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    global _started
+    with _lock:
+        _histograms.clear()
+        _rates.clear()
+        _started = time.monotonic()
+
+
+def record(instrument, command, seconds):
+    now = time.monotonic()
+    with _lock:
+        histogram = _histograms.get((instrument, command))
+        if histogram is None:
+            histogram = _histograms[(instrument, command)] = LatencyHistogram()
+        histogram.add(seconds)
+        rate = _rates.get(instrument)
+        if rate is None:
+            rate = _rates[instrument] = _CallRate()
+        rate.add(now)
+
+
+def percentiles(instrument, command):
+    with _lock:
+        histogram = _histograms.get((instrument, command))
+        if histogram is None:
+            return None
+        return {"p50": histogram.percentile(50), "p95": histogram.percentile(95),
+                "p99": histogram.percentile(99)}
+
+
+def calls_per_second():
+    now = time.monotonic()
+    with _lock:
+        return {instrument: rate.current(now) for instrument, rate in _rates.items()}
+
+
+def summary():
+    """Rows sorted by total time spent, so the commands dominating a cycle come first."""
+    with _lock:
+        elapsed = max(time.monotonic() - _started, 1e-9)
+        rows = [{"instrument": instrument,
+                 "command": command,
+                 "calls": histogram.count,
+                 "calls_per_second": histogram.count / elapsed,
+                 "mean": histogram.total / histogram.count,
+                 "p50": histogram.percentile(50),
+                 "p95": histogram.percentile(95),
+                 "p99": histogram.percentile(99),
+                 "min": histogram.min,
+                 "max": histogram.max,
+                 "total": histogram.total}
+                for (instrument, command), histogram in _histograms.items()]
+    rows.sort(key=lambda row: row["total"], reverse=True)
+    return rows
+
+
+def export_csv(path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summary())
+
+
+def export_json(path):
+    report = {"generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "calls_per_second": calls_per_second(),
+              "commands": summary()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def _command_name(method, args):
+    if args and isinstance(args[0], str):
+        message = args[0].strip()
+        if ";" in message:
+            return f"{method} batch"
+        if message:
+            return f"{method} {message.split(None, 1)[0]}"
+    return method
+
+
+def instrumented(target, instrument):
+    """Wrap a VISA resource or MultiPyVu client so its calls are recorded under "instrument"."""
+    if isinstance(target, InstrumentedConnection):
+        return target
+    return InstrumentedConnection(target, instrument)
+
+
+class InstrumentedConnection:
+    """
+    Proxy timing every method call of a connection object while instrumentation
+    is enabled. Attribute reads and writes (e.g. .timeout) go to the wrapped object.
+    """
+
+    def __init__(self, target, instrument):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_instrument", instrument)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        instrument = self._instrument
+
+        def call(*args, **kwargs):
+            if not _enabled:
+                return attribute(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                record(instrument, _command_name(name, args), time.perf_counter() - start)
+        call.__name__ = name
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __repr__(self):
+        return f"InstrumentedConnection({self._target!r})"
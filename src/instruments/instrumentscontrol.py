@@ -1,16 +1,26 @@
 from .sr830 import SR830
 from .wf1947 import WF1947
 from .ppms import PPMS
+from .simulation import is_sim_address, parse_sim_address, open_sim_resource
+from .traffic import is_replay_address, open_replay_resource
+from .actor import InstrumentActor
+from .busscheduler import bus_name, get_scheduler
 
 import os
 import json
 import logging
-import time
-from typing import Dict, Tuple, Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, Optional
 
 
 class InstrumentsControl:
-    def __init__(self):
+    def __init__(self, autoconnect: bool = True):
+        """
+        Args:
+            autoconnect: 是否在创建时（顺序、阻塞地）连接配置文件中的仪器。
+                         GUI使用False，注册监听器后调用init_instruments_async()在后台并行连接
+        """
         # 设置日志
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
@@ -26,50 +36,97 @@ class InstrumentsControl:
                     "WF1947": [],
                     "PPMS": []
                 }
-        self.instruments_instance = {} # 仪器实例字典：{仪器地址: 仪器实例}
+        # 仪器实例字典：{仪器地址: 仪器实例}
+        # 仪器实例是InstrumentActor代理，所有方法调用在该仪器专属的I/O线程中串行执行
+        # 修改时整体替换（写时复制），其他线程遍历旧字典不会出错
+        self.instruments_instance = {}
         
         # 配置文件路径
         self.config_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'config')
         self.config_file = os.path.join(self.config_dir, 'instruments_config.json')
         
-        self.init_instruments()
+        # 后台连接
+        self.connect_timeout = 15.0  # 单次连接尝试的超时时间（秒）
+        self.max_workers = 8  # 并行连接的线程数
+        self.reconnect_initial_delay = 2.0  # 重连的初始等待时间（秒），之后每次失败加倍
+        self.reconnect_max_delay = 60.0  # 重连等待时间上限（秒）
+        self._lock = threading.RLock()  # 保护仪器实例字典和配置文件
+        self._listeners: List[Callable[[str, str, str, str], None]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._reconnecting = set()  # 正在后台重连的仪器地址
+        self._closing = threading.Event()
+        
+        if autoconnect:
+            self.init_instruments()
+
+    def add_listener(self, callback: Callable[[str, str, str, str], None]) -> None:
+        """注册连接状态监听器
+        
+        callback(event, instrument_type, instrument_address, message) 在连接线程中被调用，
+        event为 "connecting" / "connected" / "failed" / "reconnecting" / "removed"。
+        GUI应通过Qt信号转发到主线程。
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, str, str, str], None]) -> None:
+        """移除连接状态监听器"""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, event: str, instrument_type: str, instrument_address: str, message: str = "") -> None:
+        """通知所有监听器"""
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event, instrument_type, instrument_address, message)
+            except Exception as e:
+                self.logger.error(f"连接状态监听器出错: {e}")
+
+    def _load_config(self) -> List[Tuple[str, str]]:
+        """读取配置文件，返回 [(仪器类型, 仪器地址)]，配置文件不存在时创建"""
+        # 检查并创建config文件夹
+        if not os.path.exists(self.config_dir):
+            os.makedirs(self.config_dir)
+            self.logger.info(f"已创建配置文件夹: {self.config_dir}")
+
+        # 检查并创建instruments_config.json文件
+        if not os.path.exists(self.config_file):
+            self.logger.warning(f"仪器配置文件不存在: {self.config_file}")
+            with self._lock:
+                with open(self.config_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.instruments_config, f, indent=2)
+            self.logger.info(f"已创建仪器配置文件: {self.config_file}")
+            return []
+
+        # 加载仪器配置
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            loaded_config = json.load(f)
+        self.logger.info(f"已加载仪器配置: {loaded_config}")
+        
+        configured = []
+        for instrument_type, instrument_addresses in loaded_config.items():
+            if instrument_type not in self.instruments_config:
+                self.logger.warning(f"未知的仪器类型: {instrument_type}")
+                continue
+            configured.extend((instrument_type, address) for address in instrument_addresses)
+        return configured
 
     def init_instruments(self) -> Dict[str, bool]:
-        """初始化仪器配置
+        """初始化仪器配置（顺序连接，阻塞直到全部完成）
         
         Returns:
             Dict[str, bool]: 仪器地址到连接状态的映射
         """
         try:
-            # 检查并创建config文件夹
-            if not os.path.exists(self.config_dir):
-                os.makedirs(self.config_dir)
-                self.logger.info(f"已创建配置文件夹: {self.config_dir}")
-
-            # 检查并创建instruments_config.json文件
-            if not os.path.exists(self.config_file):
-                self.logger.warning(f"仪器配置文件不存在: {self.config_file}")
-                with open(self.config_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.instruments_config, f, indent=2)
-                self.logger.info(f"已创建仪器配置文件: {self.config_file}")
-                return {}
-
-            # 加载仪器配置
             config_status = {} # 记录仪器配置文件导入是否加载成功，{仪器地址: 导入状态}
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                loaded_config = json.load(f)
-                self.logger.info(f"已加载仪器配置: {loaded_config}")
-                
-                for instrument_type, instrument_addresses in loaded_config.items():
-                    if instrument_type not in self.instruments_config:
-                        self.logger.warning(f"未知的仪器类型: {instrument_type}")
-                        continue
-                        
-                    for instrument_address in instrument_addresses:
-                        success, error_msg = self.add_instrument(instrument_type, instrument_address)
-                        config_status[instrument_address] = success
-                        if not success:
-                            self.logger.error(f"加载仪器失败 {instrument_address}: {error_msg}")
+            for instrument_type, instrument_address in self._load_config():
+                success, error_msg = self.add_instrument(instrument_type, instrument_address)
+                config_status[instrument_address] = success
+                if not success:
+                    self.logger.error(f"加载仪器失败 {instrument_address}: {error_msg}")
                         
             return config_status
             
@@ -80,13 +137,172 @@ class InstrumentsControl:
             self.logger.error(f"初始化仪器配置时发生未知错误: {e}")
             return {}
 
+    def init_instruments_async(self) -> Dict[str, Future]:
+        """在线程池中并行连接配置文件中的仪器，立即返回
+        
+        每个仪器的连接结果通过监听器通知；连接失败的仪器在后台按指数退避重连。
+        
+        Returns:
+            Dict[str, Future]: 仪器地址到连接任务的映射，任务结果为 (成功状态, 错误信息)
+        """
+        try:
+            configured = self._load_config()
+        except json.JSONDecodeError as e:
+            self.logger.error(f"配置文件格式错误: {e}")
+            return {}
+        except Exception as e:
+            self.logger.error(f"初始化仪器配置时发生未知错误: {e}")
+            return {}
+            
+        return {instrument_address: self.connect_instrument_async(instrument_type, instrument_address)
+                for instrument_type, instrument_address in configured}
+
+    def connect_instrument_async(self, instrument_type: str, instrument_address: str,
+                                 port: int = 5000, reconnect: bool = True) -> Future:
+        """在线程池中连接仪器，立即返回
+        
+        Args:
+            instrument_type: 仪器类型
+            instrument_address: 仪器地址
+            port: 端口号（用于PPMS）
+            reconnect: 连接失败后是否在后台按指数退避重连
+            
+        Returns:
+            Future: 结果为 (成功状态, 错误信息)
+        """
+        self._notify("connecting", instrument_type, instrument_address)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="instrument-connect")
+            executor = self._executor
+        return executor.submit(self._connect_job, instrument_type, instrument_address, port, reconnect)
+
+    def _connect_job(self, instrument_type: str, instrument_address: str,
+                     port: int, reconnect: bool) -> Tuple[bool, Optional[str]]:
+        """线程池中执行的连接任务"""
+        success, error_msg = self.add_instrument(instrument_type, instrument_address, port)
+        if not success and reconnect and not self._closing.is_set():
+            self._start_reconnect(instrument_type, instrument_address, port)
+        return success, error_msg
+
+    def reconnect(self, instrument_address: str, port: int = 5000) -> bool:
+        """关闭仪器当前的连接并在后台重新连接（按指数退避重试直到成功）
+        
+        Returns:
+            bool: 是否已开始重连
+        """
+        instrument_type = self.get_instrument_type(instrument_address)
+        if instrument_type is None:
+            self.logger.warning(f"仪器不存在: {instrument_address}")
+            return False
+            
+        with self._lock:
+            instrument = self.instruments_instance.get(instrument_address)
+            if instrument is not None:
+                self.instruments_instance = {address: inst for address, inst in self.instruments_instance.items()
+                                             if address != instrument_address}
+        if instrument is not None and hasattr(instrument, 'close'):
+            try:
+                instrument.close()
+            except Exception as e:
+                self.logger.warning(f"关闭仪器 {instrument_address} 时出错: {e}")
+                
+        self._start_reconnect(instrument_type, instrument_address, port, initial_delay=0.0)
+        return True
+
+    def _start_reconnect(self, instrument_type: str, instrument_address: str,
+                         port: int = 5000, initial_delay: Optional[float] = None) -> None:
+        """启动后台重连线程（同一地址只有一个）"""
+        with self._lock:
+            if instrument_address in self._reconnecting or self._closing.is_set():
+                return
+            self._reconnecting.add(instrument_address)
+        delay = self.reconnect_initial_delay if initial_delay is None else initial_delay
+        threading.Thread(target=self._reconnect_loop,
+                         args=(instrument_type, instrument_address, port, delay),
+                         name=f"instrument-reconnect-{instrument_address}", daemon=True).start()
+
+    def _reconnect_loop(self, instrument_type: str, instrument_address: str, port: int, delay: float) -> None:
+        """按指数退避重连，直到成功、仪器被移除或程序退出"""
+        try:
+            while instrument_address in self._reconnecting:
+                self._notify("reconnecting", instrument_type, instrument_address, f"{delay:.0f}s后重试")
+                if self._closing.wait(delay) or instrument_address not in self._reconnecting:
+                    break
+                success, _ = self.add_instrument(instrument_type, instrument_address, port, retry_count=1)
+                if success:
+                    break
+                delay = min(max(delay * 2, self.reconnect_initial_delay), self.reconnect_max_delay)
+        finally:
+            with self._lock:
+                self._reconnecting.discard(instrument_address)
+
+    def get_instrument_type(self, instrument_address: str) -> Optional[str]:
+        """根据配置或实例获取仪器类型"""
+        with self._lock:
+            for instrument_type, addresses in self.instruments_config.items():
+                if instrument_address in addresses:
+                    return instrument_type
+            instrument = self.instruments_instance.get(instrument_address)
+        return getattr(instrument, 'type', None)
+
+    def _create_instrument(self, instrument_type: str, instrument_address: str, port: int):
+        """创建仪器实例，超过connect_timeout仍未完成时抛出TimeoutError
+        
+        连接在单独的线程中进行；超时后才完成的连接会被立即关闭。
+        """
+        result = {}
+        result_lock = threading.Lock()
+        abandoned = threading.Event()
+        
+        def connect():
+            try:
+                # 模拟仪器和回放仪器使用模拟的VISA资源/MultiPyVu客户端，驱动类本身不变
+                if is_sim_address(instrument_address):
+                    sim = open_sim_resource(instrument_address)
+                elif is_replay_address(instrument_address):
+                    sim = open_replay_resource(instrument_address)
+                else:
+                    sim = None
+                if instrument_type == "SR830":
+                    instrument = SR830(instrument_address, inst=sim)
+                elif instrument_type == "WF1947":
+                    instrument = WF1947(instrument_address, inst=sim)
+                else:
+                    instrument = PPMS(instrument_address, port, client=sim)
+            except BaseException as e:
+                result['error'] = e
+                return
+            with result_lock:
+                if not abandoned.is_set():
+                    result['instrument'] = instrument
+                    return
+            # 调用方已超时放弃，关闭迟到的连接
+            try:
+                instrument.close()
+            except Exception:
+                pass
+                
+        thread = threading.Thread(target=connect, name=f"instrument-open-{instrument_address}", daemon=True)
+        thread.start()
+        thread.join(self.connect_timeout)
+        with result_lock:
+            if 'instrument' not in result and 'error' not in result:
+                abandoned.set()
+                raise TimeoutError(f"{self.connect_timeout:.0f}s内未完成连接")
+        if 'error' in result:
+            raise result['error']
+        return result['instrument']
+
     def add_instrument(self, instrument_type: str, instrument_address: str, 
                       port: int = 5000, retry_count: int = 3) -> Tuple[bool, Optional[str]]:
         """添加仪器到列表
         
         Args:
             instrument_type: 仪器类型
-            instrument_address: 仪器地址
+            instrument_address: 仪器地址，"SIM::<类型>::<编号>"形式的地址（如SIM::SR830::1）连接模拟仪器，
+                                "REPLAY::<录制时的地址>"形式的地址回放已加载的通信录制文件
             port: 端口号（用于PPMS）
             retry_count: 重试次数
             
@@ -94,70 +310,98 @@ class InstrumentsControl:
             Tuple[bool, Optional[str]]: (成功状态, 错误信息)
         """
         if instrument_type not in self.instruments_config:
-            error_msg = f"不支持的仪器类型: {instrument_type}"
-            self.logger.error(error_msg)
-            return False, error_msg
+            return self._connect_failed(instrument_type, instrument_address,
+                                        f"不支持的仪器类型: {instrument_type}")
         
         # 检查是否已经存在
         if instrument_address in self.instruments_instance:
             self.logger.info(f"仪器 {instrument_address} 已存在")
             return True, None
         
+        # 模拟仪器地址的类型必须与仪器类型一致
+        simulated = is_sim_address(instrument_address)
+        if simulated:
+            try:
+                sim_type, _ = parse_sim_address(instrument_address)
+            except ValueError as e:
+                return self._connect_failed(instrument_type, instrument_address, str(e))
+            if sim_type != instrument_type:
+                return self._connect_failed(instrument_type, instrument_address,
+                                            f"模拟仪器地址 {instrument_address} 与仪器类型 {instrument_type} 不一致")
+        
         # 尝试连接仪器
         for attempt in range(retry_count):
             try:
-                if instrument_type == "SR830":
-                    instrument = SR830(instrument_address)
-                elif instrument_type == "WF1947":
-                    instrument = WF1947(instrument_address)
-                elif instrument_type == "PPMS":
-                    instrument = PPMS(instrument_address, port)
-                else:
-                    return False, f"不支持的仪器类型: {instrument_type}"
+                # GPIB仪器共享所在板卡的总线调度器；PPMS通过TCP连接，不占用GPIB总线
+                scheduler = None if instrument_type == "PPMS" else get_scheduler(bus_name(instrument_address))
+                instrument = InstrumentActor(self._create_instrument(instrument_type, instrument_address, port),
+                                             name=instrument_address, scheduler=scheduler)
                 
                 # 连接成功
-                self.instruments_instance[instrument_address] = instrument
+                with self._lock:
+                    if instrument_address in self.instruments_instance or self._closing.is_set():
+                        # 其他线程已经连接了该仪器，或程序正在退出
+                        duplicate = True
+                    else:
+                        duplicate = False
+                        self.instruments_instance = {**self.instruments_instance, instrument_address: instrument}
+                if duplicate:
+                    instrument.close()
+                    if self._closing.is_set():
+                        return False, "程序正在退出"
+                    return True, None
+                self._reconnecting.discard(instrument_address)
                 self.update_instrument_config(instrument_type, instrument_address)
                 self.logger.info(f"成功连接仪器: {instrument_type} at {instrument_address}")
+                self._notify("connected", instrument_type, instrument_address)
                 return True, None
                 
             except ConnectionError as e:
                 error_msg = f"连接错误 (尝试 {attempt + 1}/{retry_count}): {e}"
                 self.logger.warning(error_msg)
                 if attempt < retry_count - 1:
-                    time.sleep(1)  # 等待1秒后重试
+                    self._closing.wait(1)  # 等待1秒后重试
                     
             except TimeoutError as e:
                 error_msg = f"连接超时 (尝试 {attempt + 1}/{retry_count}): {e}"
                 self.logger.warning(error_msg)
                 if attempt < retry_count - 1:
-                    time.sleep(2)  # 等待2秒后重试
+                    self._closing.wait(2)  # 等待2秒后重试
                     
             except PermissionError as e:
-                error_msg = f"权限错误: {e}"
-                self.logger.error(error_msg)
-                return False, error_msg  # 权限错误不重试
+                # 权限错误不重试
+                return self._connect_failed(instrument_type, instrument_address, f"权限错误: {e}")
                 
             except Exception as e:
                 error_msg = f"未知错误 (尝试 {attempt + 1}/{retry_count}): {e}"
                 self.logger.error(error_msg)
                 if attempt < retry_count - 1:
-                    time.sleep(1)
+                    self._closing.wait(1)
+                    
+            if self._closing.is_set():
+                break
                     
         # 所有重试都失败
         final_error = f"{instrument_type}连接失败: 经过{retry_count}次尝试后仍无法连接到{instrument_address}"
-        self.logger.error(final_error)
-        return False, final_error
+        return self._connect_failed(instrument_type, instrument_address, final_error)
+    
+    def _connect_failed(self, instrument_type: str, instrument_address: str,
+                        error_msg: str) -> Tuple[bool, Optional[str]]:
+        """记录连接失败并通知监听器"""
+        self.logger.error(error_msg)
+        self._notify("failed", instrument_type, instrument_address, error_msg)
+        return False, error_msg
     
     def update_instrument_config(self, instrument_type: str, instrument_address: str):
         """更新连接成功的仪器配置，写入到仪器配置文件中"""
         try:
-            if instrument_address not in self.instruments_config[instrument_type]:
-                self.instruments_config[instrument_type].append(instrument_address)
-                
-                with open(self.config_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.instruments_config, f, indent=2, ensure_ascii=False)
-                self.logger.info(f"已更新仪器配置: {instrument_type} - {instrument_address}")
+            with self._lock:
+                if instrument_address not in self.instruments_config[instrument_type]:
+                    self.instruments_config[instrument_type].append(instrument_address)
+                    
+                    with open(self.config_file, 'w', encoding='utf-8') as f:
+                        json.dump(self.instruments_config, f, indent=2, ensure_ascii=False)
+                    self.logger.info(f"已更新仪器配置: {instrument_type} - {instrument_address}")
                 
         except Exception as e:
             self.logger.error(f"更新配置文件失败: {e}")
@@ -172,26 +416,36 @@ class InstrumentsControl:
             bool: 移除是否成功
         """
         try:
-            if instrument_address in self.instruments_instance:
-                # 关闭仪器连接
-                instrument = self.instruments_instance[instrument_address]
-                if hasattr(instrument, 'close'):
-                    instrument.close()
+            # 停止该仪器的后台重连
+            with self._lock:
+                was_reconnecting = instrument_address in self._reconnecting
+                self._reconnecting.discard(instrument_address)
                 
-                # 从实例字典中移除
-                del self.instruments_instance[instrument_address]
+            if instrument_address in self.instruments_instance or was_reconnecting:
+                instrument_type = self.get_instrument_type(instrument_address) or ""
                 
-                # 从配置中移除
-                for instrument_type, addresses in self.instruments_config.items():
-                    if instrument_address in addresses:
-                        addresses.remove(instrument_address)
-                        break
+                with self._lock:
+                    # 从实例字典中移除
+                    instrument = self.instruments_instance.get(instrument_address)
+                    self.instruments_instance = {address: inst for address, inst in self.instruments_instance.items()
+                                                 if address != instrument_address}
+                    
+                    # 从配置中移除
+                    for addresses in self.instruments_config.values():
+                        if instrument_address in addresses:
+                            addresses.remove(instrument_address)
+                            break
+                    
+                    # 更新配置文件
+                    with open(self.config_file, 'w', encoding='utf-8') as f:
+                        json.dump(self.instruments_config, f, indent=2, ensure_ascii=False)
                 
-                # 更新配置文件
-                with open(self.config_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.instruments_config, f, indent=2, ensure_ascii=False)
+                # 关闭仪器连接
+                if instrument is not None and hasattr(instrument, 'close'):
+                    instrument.close()
                 
                 self.logger.info(f"已移除仪器: {instrument_address}")
+                self._notify("removed", instrument_type, instrument_address)
                 return True
             else:
                 self.logger.warning(f"仪器不存在: {instrument_address}")
@@ -208,11 +462,19 @@ class InstrumentsControl:
             bool: 清理是否成功
         """
         success = True
-        instruments_to_close = list(self.instruments_instance.keys())  # 创建副本避免修改字典时出错
         
-        for instrument_address in instruments_to_close:
+        # 停止后台连接和重连
+        self._closing.set()
+        with self._lock:
+            self._reconnecting.clear()
+            executor, self._executor = self._executor, None
+            instruments_to_close = self.instruments_instance
+            self.instruments_instance = {}
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        for instrument_address, instrument in instruments_to_close.items():
             try:
-                instrument = self.instruments_instance[instrument_address]
                 if hasattr(instrument, 'close'):
                     instrument.close()
                     self.logger.info(f"已关闭仪器连接: {instrument_address}")
@@ -223,9 +485,6 @@ class InstrumentsControl:
                 self.logger.error(f"关闭仪器 {instrument_address} 时发生错误: {e}")
                 success = False
         
-        # 清空实例字典
-        self.instruments_instance.clear()
-        
         if success:
             self.logger.info("所有仪器连接已成功关闭")
         else:
@@ -1,5 +1,7 @@
 import MultiPyVu as mpv
 import threading
+from .instrumentation import instrumented
+from .traffic import recorded
 
 class PPMS:
     """
@@ -8,6 +10,15 @@ class PPMS:
     Initialization parameters:
     host: String, IP address of the PPMS.
     port: Integer, port number of the PPMS. Default is 5000.
+    client: MultiPyVu client to use instead of connecting to host:port
+            (e.g. a simulated client from instruments.simulation).
+
+    Main methods:
+    .get_temperature_field():   Temperature, its status, field and its status.
+    .set_temperature(set_point, rate_per_min, approach_mode):   Start a temperature ramp.
+    .set_field(set_point, rate_per_sec, approach_mode):         Start a field ramp.
+    .temperature_stable(status) / .field_stable(status):        Whether a status reported
+                                by get_temperature_field() means the value has settled.
 
     Attributes:
     ._port: Integer, port number of the PPMS.
@@ -16,13 +27,14 @@ class PPMS:
     """
     type = "PPMS"
 
-    def __init__(self, host, port=5000):
+    def __init__(self, host, port=5000, client=None):
         self._port = port
         self._host = host
         self._lock = threading.RLock()  # 使用可重入锁防止死锁
 
         try:
-            self.client = mpv.Client(self._host, self._port)
+            client = client if client is not None else mpv.Client(self._host, self._port)
+            self.client = instrumented(recorded(client, self._host), self._host)
             self.client.open()
             print("PPMS connected")
             print("PPMS线程安全访问已启用 - 支持多线程并发数据读取")
@@ -61,6 +73,48 @@ class PPMS:
                 # 在锁内重新抛出异常，确保锁被正确释放
                 raise e
     
+    def _approach_mode(self, system, name):
+        """MultiPyVu approach mode enum member, e.g. client.temperature.approach_mode.fast_settle;
+        None for clients without the enums (simulation, replay)."""
+        try:
+            return getattr(getattr(self.client, system).approach_mode, name)
+        except AttributeError:
+            return None
+
+    def set_temperature(self, set_point, rate_per_min=10.0, approach_mode=None):
+        """
+        Set the temperature setpoint.
+        set_point: Float, temperature in Kelvin.
+        rate_per_min: Float, ramp rate in K/min.
+        approach_mode: MultiPyVu temperature approach mode. Default is fast settle.
+        """
+        with self._lock:
+            if approach_mode is None:
+                approach_mode = self._approach_mode("temperature", "fast_settle")
+            self.client.set_temperature(set_point, rate_per_min, approach_mode)
+
+    def set_field(self, set_point, rate_per_sec=100.0, approach_mode=None):
+        """
+        Set the field setpoint.
+        set_point: Float, field in Oe.
+        rate_per_sec: Float, ramp rate in Oe/s.
+        approach_mode: MultiPyVu field approach mode. Default is linear.
+        """
+        with self._lock:
+            if approach_mode is None:
+                approach_mode = self._approach_mode("field", "linear")
+            self.client.set_field(set_point, rate_per_sec, approach_mode)
+
+    @staticmethod
+    def temperature_stable(status):
+        return str(status).strip().lower() == "stable"
+
+    @staticmethod
+    def field_stable(status):
+        # e.g. "Holding (Driven)", "Persistent Stable", "Driven Stable"
+        status = str(status).strip().lower()
+        return status.startswith("holding") or status.endswith("stable")
+
     def close(self):
         with self._lock:
             self.client.close_client()
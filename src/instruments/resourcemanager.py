@@ -0,0 +1,41 @@
+"""
+Shared, lazily created pyVISA ResourceManager.
+
+Importing the drivers no longer initialises a VISA backend: the ResourceManager
+is created on the first open_resource()/list_resources() call and then reused
+by every driver and by the instrument discovery dialog.
+
+Main functions:
+get_resource_manager():         Return the shared ResourceManager, creating it on first use.
+open_resource(address, **kw):   Open a VISA resource through the shared ResourceManager.
+list_resources(refresh):        Return the available VISA resources. The result is cached;
+                                refresh=True queries the backend again.
+"""
+
+import threading
+
+_rm = None
+_resources = None
+_lock = threading.Lock()
+
+
+def get_resource_manager():
+    global _rm
+    with _lock:
+        if _rm is None:
+            import pyvisa
+            _rm = pyvisa.ResourceManager()
+        return _rm
+
+
+def open_resource(address, **kwargs):
+    return get_resource_manager().open_resource(address, **kwargs)
+
+
+def list_resources(refresh=False):
+    global _resources
+    rm = get_resource_manager()
+    with _lock:
+        if _resources is None or refresh:
+            _resources = tuple(rm.list_resources())
+        return _resources
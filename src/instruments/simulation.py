@@ -0,0 +1,675 @@
+"""
+Simulated instruments for running the acquisition code without hardware.
+
+The simulated resources stand in for the pyVISA resources (SR830, WF1947) and
+the MultiPyVu client (PPMS) used by the drivers, so SR830/WF1947/PPMS keep their
+public APIs and only the transport is replaced. Addresses use the scheme
+"SIM::<TYPE>::<index>", e.g. "SIM::SR830::1"; a WF1947 and an SR830 with the
+same index share one Resonator, so the lock-in demodulates what the generator
+drives.
+
+Main functions:
+is_sim_address(address):            True for "SIM::..." addresses.
+parse_sim_address(address):         Returns (instrument type, index).
+open_sim_resource(address, type):   Returns the simulated resource/client for an address.
+get_plant(index):                   Returns the Resonator shared by the instruments of an index.
+set_latency(seconds, type):         Sets the per-command latency of new simulated resources.
+set_response_time(seconds, type):   Sets the time new simulated resources need to prepare a query reply.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SIM_PREFIX = "SIM::"
+
+# per-command latency (s) applied to every write/query/read of new resources
+DEFAULT_LATENCY = {"SR830": 0.0, "WF1947": 0.0, "PPMS": 0.0}
+# time (s) an instrument needs to prepare the reply of a query, during which the
+# bus is free when the reply is read later with read()
+DEFAULT_RESPONSE_TIME = {"SR830": 0.0, "WF1947": 0.0, "PPMS": 0.0}
+# transfer time per byte (s) of binary reads, roughly 1 MB/s for GPIB
+DEFAULT_BYTE_TIME = 1e-6
+
+_plants = {}
+_plants_lock = threading.Lock()
+
+
+def is_sim_address(address):
+    return str(address).upper().startswith(SIM_PREFIX)
+
+
+def parse_sim_address(address):
+    """Split "SIM::<TYPE>::<index>" into (TYPE, index)."""
+    parts = str(address).split("::")
+    if len(parts) != 3 or parts[0].upper() != "SIM":
+        raise ValueError(f"Invalid simulation address: {address} (expected SIM::<TYPE>::<index>)")
+    return parts[1].upper(), int(parts[2])
+
+
+def set_latency(seconds, instrument_type=None):
+    """Set the per-command latency for one instrument type (or all types if None)."""
+    for key in DEFAULT_LATENCY:
+        if instrument_type is None or key == instrument_type:
+            DEFAULT_LATENCY[key] = seconds
+
+
+def set_response_time(seconds, instrument_type=None):
+    """Set the reply preparation time for one instrument type (or all types if None)."""
+    for key in DEFAULT_RESPONSE_TIME:
+        if instrument_type is None or key == instrument_type:
+            DEFAULT_RESPONSE_TIME[key] = seconds
+
+
+def get_plant(index):
+    """Return the Resonator of simulation index "index", creating it on first use."""
+    with _plants_lock:
+        if index not in _plants:
+            _plants[index] = Resonator()
+        return _plants[index]
+
+
+def open_sim_resource(address, instrument_type=None):
+    """
+    Create the simulated transport for "address".
+    Returns a SimSR830Resource, SimWF1947Resource or SimPPMSClient.
+    """
+    sim_type, index = parse_sim_address(address)
+    if instrument_type is not None and sim_type != instrument_type:
+        raise ValueError(f"Simulation address {address} does not match instrument type {instrument_type}")
+    if sim_type == "SR830":
+        return SimSR830Resource(index)
+    if sim_type == "WF1947":
+        return SimWF1947Resource(index)
+    if sim_type == "PPMS":
+        return SimPPMSClient(index)
+    raise ValueError(f"Unsupported simulated instrument type: {sim_type}")
+
+
+class Resonator:
+    """
+    Damped harmonic oscillator driven by a simulated WF1947.
+
+    The response to a drive at frequency f is
+        H(f) = gain * (j f f0 / Q) / (f0^2 - f^2 + j f f0 / Q)
+    i.e. `gain` volts out per volt in at resonance with zero phase, +90° below
+    and -90° above resonance. The complex envelope follows the steady state with
+    the ring-down time Q / (pi f0), so fast frequency steps and sweeps show the
+    lag of a real resonator.
+
+    Attributes:
+    .f0:        Resonance frequency (Hz).
+    .Q:         Quality factor.
+    .gain:      Output/input ratio at resonance.
+    .noise:     Input referred voltage noise density seen by the lock-in (V/sqrt(Hz)).
+    .drive:     Object providing drive_state(t) -> (frequency Hz, amplitude Vrms), or None.
+    """
+
+    def __init__(self, f0=5000.0, Q=50.0, gain=0.1, noise=20e-9):
+        self.f0 = f0
+        self.Q = Q
+        self.gain = gain
+        self.noise = noise
+        self.drive = None
+        self._z = 0j
+        self._t = None
+        self._lock = threading.Lock()
+
+    def response(self, f):
+        """Steady state complex transfer function at frequency f."""
+        damping = 1j * f * self.f0 / self.Q
+        return self.gain * damping / (self.f0 ** 2 - f ** 2 + damping)
+
+    def drive_state(self, t):
+        if self.drive is None:
+            return 0.0, 0.0
+        return self.drive.drive_state(t)
+
+    def value(self, t):
+        """
+        Return (drive frequency, complex output amplitude in Vrms) at time t.
+        Calls must use non-decreasing t; older times return the latest state.
+        """
+        with self._lock:
+            f, vrms = self.drive_state(t)
+            target = self.response(f) * vrms if f > 0 else 0j
+            if self._t is None:
+                self._z = target
+            elif t > self._t:
+                tau = self.Q / (math.pi * self.f0)
+                self._z += (target - self._z) * (1.0 - math.exp(-(t - self._t) / tau))
+            self._t = max(t, self._t or t)
+            return f, self._z
+
+
+class _SimResource:
+    """Common part of the simulated pyVISA resources: latency, timeout and close."""
+
+    def __init__(self, instrument_type, index):
+        self.index = index
+        self.latency = DEFAULT_LATENCY.get(instrument_type, 0.0)
+        self.response_time = DEFAULT_RESPONSE_TIME.get(instrument_type, 0.0)
+        self.byte_time = DEFAULT_BYTE_TIME
+        self.timeout = 2000
+        self.resource_name = f"SIM::{instrument_type}::{index}"
+        self._lock = threading.RLock()
+        self._output = deque()      # (ready time, reply) of queries sent with write()
+
+    def _wait(self, nbytes=0):
+        delay = self.latency + nbytes * self.byte_time
+        if delay > 0:
+            time.sleep(delay)
+
+    def write(self, message):
+        self._wait(len(message))
+        with self._lock:
+            replies = [self._execute(command) for command in self._split(message)]
+            replies = [r for r in replies if r is not None]
+            if replies:
+                # queries sent with write() are answered by the next read()
+                self._output.append((time.perf_counter() + self.response_time, ";".join(replies)))
+        return len(message)
+
+    def read(self):
+        with self._lock:
+            if not self._output:
+                raise TimeoutError(f"{self.resource_name} simulation: read with no query pending")
+            ready, reply = self._output.popleft()
+        time.sleep(max(0.0, ready - time.perf_counter()))
+        self._wait(len(reply))
+        return reply + "\n"
+
+    def query(self, message):
+        self._wait(len(message))
+        with self._lock:
+            # like the real instrument, a new query discards a reply that was never read
+            self._output.clear()
+            replies = [self._execute(command) for command in self._split(message)]
+        if self.response_time > 0:
+            time.sleep(self.response_time)
+        reply = ";".join(r for r in replies if r is not None)
+        self._wait(len(reply))
+        return reply + "\n"
+
+    def clear(self):
+        self._wait()
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _split(message):
+        return [c.strip() for c in str(message).strip().split(";") if c.strip()]
+
+    @staticmethod
+    def _number(text):
+        match = re.match(r"\s*([-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?)", text)
+        if not match:
+            raise ValueError(f"Invalid numeric parameter: {text}")
+        return float(match.group(1))
+
+    def _execute(self, command):
+        raise NotImplementedError
+
+
+class SimSR830Resource(_SimResource):
+    """
+    Simulated pyVISA resource of an SR830 demodulating the Resonator of its index.
+
+    Supports the commands used by SR830: *IDN?, *OPC?, OFLT, OFSL, SENS, SYNC,
+    FMOD, FREQ, PHAS, OUTP?, SNAP?, DDEF, SRAT, SEND, TSTR, REST, STRT, PAUS,
+    SPTS?, TRCB? (query_binary_values), FAST, STRD (read_bytes).
+    The outputs pass through a cascade of 1..4 first-order low-pass stages with
+    the selected time constant and slope, and carry Gaussian noise with the
+    equivalent noise bandwidth of that filter.
+    """
+
+    TIME_CONSTANTS = [1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3,
+                      1.0, 3.0, 10.0, 30.0, 100.0, 300.0, 1e3, 3e3, 1e4, 3e4]
+    SENSITIVITIES = [2e-9, 5e-9, 1e-8, 2e-8, 5e-8, 1e-7, 2e-7, 5e-7, 1e-6, 2e-6, 5e-6,
+                     1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2,
+                     2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0]
+    SAMPLE_RATES = [0.0625, 0.125, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0,
+                    32.0, 64.0, 128.0, 256.0, 512.0]
+    # equivalent noise bandwidth * time constant for 6/12/18/24 dB/oct
+    ENBW = [1 / 4, 1 / 8, 3 / 32, 5 / 64]
+    BUFFER_SIZE = 16383
+
+    def __init__(self, index):
+        super().__init__("SR830", index)
+        self.plant = get_plant(index)
+        self.settings = {"OFLT": 10, "OFSL": 3, "SENS": 26, "SYNC": 0, "FMOD": 0,
+                         "SRAT": 13, "SEND": 1, "TSTR": 0, "FAST": 0}
+        self.internal_frequency = 1000.0
+        self.reference_phase = 0.0
+        self.display = {1: 0, 2: 0}
+        self._rng = np.random.default_rng()
+        self._stages = [0j] * 4
+        self._t = None
+        self._f_ref = 0.0
+        # data buffer: sample times are t_start + k / rate
+        self._buffer = deque(maxlen=self.BUFFER_SIZE)
+        self._stored = 0
+        self._running = False
+        self._t_start = None
+        self._next_sample = 0
+        self._fast = deque()
+
+    # ---- signal model
+    def _tau(self):
+        return self.TIME_CONSTANTS[self.settings["OFLT"]]
+
+    def _step(self, t):
+        """Advance the low-pass filter to time t and return the filtered X+jY."""
+        if self._t is None:
+            self._t = t
+        dt = t - self._t
+        if dt > 0:
+            tau = self._tau()
+            order = self.settings["OFSL"] + 1
+            # sub-steps keep the filter accurate when the input changes during dt
+            steps = max(1, min(50, int(math.ceil(dt / max(tau, 1e-4)))))
+            h = dt / steps
+            alpha = 1.0 - math.exp(-h / tau)
+            for k in range(1, steps + 1):
+                f_drive, z = self.plant.value(self._t + k * h)
+                self._f_ref = f_drive if self.settings["FMOD"] == 0 else self.internal_frequency
+                if self.settings["FMOD"] == 1 and abs(f_drive - self.internal_frequency) > 1e-6 * max(f_drive, 1.0):
+                    z = 0j  # signal at another frequency averages out
+                value = z * complex(math.cos(math.radians(-self.reference_phase)),
+                                    math.sin(math.radians(-self.reference_phase)))
+                for n in range(order):
+                    self._stages[n] += (value - self._stages[n]) * alpha
+                    value = self._stages[n]
+            self._t = t
+        return self._stages[self.settings["OFSL"]]
+
+    def _sample(self, t):
+        """Filtered output with noise at time t as (X, Y)."""
+        z = self._step(t)
+        sigma = self.plant.noise * math.sqrt(self.ENBW[self.settings["OFSL"]] / self._tau())
+        noise = self._rng.normal(0.0, sigma, 2)
+        return z.real + noise[0], z.imag + noise[1]
+
+    def _advance(self, now=None):
+        """Generate the buffer/FAST samples due up to now and return the current (X, Y)."""
+        now = time.perf_counter() if now is None else now
+        if self._running and self._t_start is not None and now >= self._t_start:
+            rate = self.SAMPLE_RATES[self.settings["SRAT"]]
+            due = int((now - self._t_start) * rate) + 1
+            while self._next_sample < due:
+                if self.settings["SEND"] == 0 and self._stored >= self.BUFFER_SIZE:
+                    break
+                x, y = self._sample(self._t_start + self._next_sample / rate)
+                self._buffer.append((x, y))
+                self._stored += 1
+                if self.settings["FAST"]:
+                    self._fast.append((x, y))
+                self._next_sample += 1
+        return self._sample(max(now, self._t or now))
+
+    def _channel(self, ch, x, y):
+        if ch == 1:
+            return math.hypot(x, y) if self.display[1] == 1 else x
+        return math.degrees(math.atan2(y, x)) if self.display[2] == 1 else y
+
+    def _snap(self, i, x, y):
+        return {1: x, 2: y, 3: math.hypot(x, y), 4: math.degrees(math.atan2(y, x)),
+                5: 0.0, 6: 0.0, 7: 0.0, 8: 0.0, 9: self._f_ref,
+                10: self._channel(1, x, y), 11: self._channel(2, x, y)}[i]
+
+    # ---- command parser
+    def _execute(self, command):
+        match = re.match(r"(\*?[A-Za-z]+)\s*(\?)?\s*(.*)", command)
+        if not match:
+            raise ValueError(f"Invalid SR830 command: {command}")
+        header, is_query, args = match.group(1).upper(), bool(match.group(2)), match.group(3)
+        params = [a.strip() for a in args.split(",") if a.strip()]
+
+        if header == "*IDN":
+            return f"Stanford_Research_Systems,SR830,s/n SIM{self.index:05d},ver1.07"
+        if header == "*OPC":
+            return "1"
+        if header in ("*RST", "*CLS", "*WAI"):
+            return None
+        if header in ("OFLT", "OFSL", "SENS", "SYNC", "FMOD", "SRAT", "SEND", "TSTR", "FAST"):
+            if is_query:
+                return str(self.settings[header])
+            self._advance()
+            self.settings[header] = int(self._number(params[0]))
+            return None
+        if header == "FREQ":
+            if is_query:
+                self._advance()
+                return f"{self._f_ref:.4f}"
+            self.internal_frequency = self._number(params[0])
+            return None
+        if header == "PHAS":
+            if is_query:
+                return f"{self.reference_phase:.2f}"
+            self.reference_phase = self._number(params[0])
+            return None
+        if header == "DDEF":
+            if is_query:
+                return f"{self.display[int(params[0])]},0"
+            self.display[int(params[0])] = int(params[1])
+            return None
+        if header == "OUTP":
+            x, y = self._advance()
+            return f"{self._snap(int(params[0]), x, y):.6e}"
+        if header == "OUTR":
+            x, y = self._advance()
+            return f"{self._channel(int(params[0]), x, y):.6e}"
+        if header == "SNAP":
+            x, y = self._advance()
+            return ",".join(f"{self._snap(int(p), x, y):.6e}" for p in params)
+        if header == "REST":
+            self._running = False
+            self._buffer.clear()
+            self._stored = 0
+            self._next_sample = 0
+            self._t_start = None
+            self._fast.clear()
+            return None
+        if header in ("STRT", "STRD"):
+            if not self._running:
+                now = time.perf_counter()
+                # STRD starts the scan after a 0.5 s delay
+                start = now + (0.5 if header == "STRD" else 0.0)
+                if self._t_start is None:
+                    self._t_start = start
+                else:
+                    # resume: keep the sample grid but skip the paused interval
+                    rate = self.SAMPLE_RATES[self.settings["SRAT"]]
+                    self._t_start = start - self._next_sample / rate
+                self._running = True
+            return None
+        if header == "PAUS":
+            self._advance()
+            self._running = False
+            return None
+        if header == "SPTS":
+            self._advance()
+            return str(len(self._buffer))
+        raise ValueError(f"Unsupported SR830 command: {command}")
+
+    # ---- binary transfers
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list,
+                            header_fmt='ieee', expect_termination=True, data_points=0, **kwargs):
+        match = re.match(r"\s*TRCB\s*\?\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)", message, re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Unsupported SR830 binary query: {message}")
+        ch, start, count = (int(g) for g in match.groups())
+        self._wait(len(message))
+        with self._lock:
+            self._advance()
+            if start + count > len(self._buffer):
+                raise ValueError("TRCB range exceeds the stored points")
+            values = np.array([self._channel(ch, x, y)
+                               for x, y in list(self._buffer)[start:start + count]], dtype=np.float32)
+        self._wait(4 * count)
+        return container(values)
+
+    def read_bytes(self, count, **kwargs):
+        """FAST mode transfer: two little endian int16 per sample (CH1, CH2)."""
+        samples = count // 4
+        deadline = time.perf_counter() + self.timeout / 1000.0
+        while True:
+            with self._lock:
+                self._advance()
+                if len(self._fast) >= samples:
+                    packets = [self._fast.popleft() for _ in range(samples)]
+                    break
+                running = self._running and self.settings["FAST"]
+                rate = self.SAMPLE_RATES[self.settings["SRAT"]]
+                missing = samples - len(self._fast)
+            if not running or time.perf_counter() > deadline:
+                raise TimeoutError("SR830 simulation: FAST read timed out")
+            time.sleep(min(missing / rate, 0.05))
+        sens = self.SENSITIVITIES[self.settings["SENS"]]
+        data = np.empty((samples, 2))
+        for k, (x, y) in enumerate(packets):
+            data[k, 0] = self._channel(1, x, y) / sens * 30000
+            ch2 = self._channel(2, x, y)
+            data[k, 1] = ch2 * 100 if self.display[2] == 1 else ch2 / sens * 30000
+        self._wait(count)
+        return np.clip(np.round(data), -32768, 32767).astype('<i2').tobytes()
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._fast.clear()
+
+
+class SimWF1947Resource(_SimResource):
+    """
+    Simulated pyVISA resource of a WF1947 driving the Resonator of its index.
+
+    Channel 1 drives the resonator. Supports the SCPI commands used by WF1947
+    (long or short form, ';'-joined): *IDN?, *OPC?, *RST, *WAI, *TRG,
+    FREQuency, FREQuency:MODE/STARt/STOP, SWEep:TIME/SPACing/MODE/INTernal:FUNCtion,
+    FUNCtion:SHAPe, VOLTage:AMPLitude/OFFSet, OUTPut:STATe, OUTPut:LOAD and FM:*.
+    Frequency sweeps run in real time: continuously while the output is on, or
+    once per *TRG in single mode.
+    """
+
+    def __init__(self, index):
+        super().__init__("WF1947", index)
+        self.plant = get_plant(index)
+        self.plant.drive = self
+        self._reset()
+
+    def _reset(self):
+        self.channels = {ch: {"FREQ": 1000.0, "MODE": "FIX", "STAR": 1000.0, "STOP": 10000.0,
+                              "TIME": 1.0, "SPAC": "LIN", "SWEMODE": "CONT", "SWEFUNC": "RAMP",
+                              "SHAP": "SIN", "AMPL": 0.1, "OFFS": 0.0, "STAT": False,
+                              "LOAD": "INF", "sweep_start": None}
+                         for ch in (1, 2)}
+
+    def drive_state(self, t):
+        """Return (frequency Hz, amplitude Vrms) driven by channel 1 at time t."""
+        channel = self.channels[1]
+        if not channel["STAT"]:
+            return self._frequency(channel, t), 0.0
+        return self._frequency(channel, t), channel["AMPL"] / (2 * math.sqrt(2))
+
+    @staticmethod
+    def _frequency(channel, t):
+        if channel["MODE"] != "SWE" or channel["sweep_start"] is None:
+            return channel["FREQ"]
+        elapsed = max(t - channel["sweep_start"], 0.0)
+        period = channel["TIME"]
+        if channel["SWEMODE"] == "SING" and elapsed >= period:
+            x = 1.0
+        else:
+            x = (elapsed % period) / period
+        if channel["SWEFUNC"] == "TRI":
+            x = 1.0 - abs(2 * x - 1.0)
+        start, stop = channel["STAR"], channel["STOP"]
+        if channel["SPAC"] == "LOG" and start > 0 and stop > 0:
+            return start * (stop / start) ** x
+        return start + (stop - start) * x
+
+    @staticmethod
+    def _normalize(header):
+        """Reduce a SCPI header to its short form, e.g. 'SOURce1:FREQuency' -> ['SOUR1', 'FREQ']."""
+        nodes = []
+        for node in header.strip(":").split(":"):
+            match = re.match(r"([A-Za-z]+)(\d*)$", node)
+            if not match:
+                raise ValueError(f"Invalid SCPI header: {header}")
+            word, suffix = match.groups()
+            short = "".join(c for c in word if c.isupper()) if not word.isupper() else word[:4]
+            nodes.append(short.upper() + suffix)
+        return nodes
+
+    def _execute(self, command):
+        match = re.match(r"(\*?[:A-Za-z0-9]+)(\?)?\s*(.*)", command)
+        if not match:
+            raise ValueError(f"Invalid WF1947 command: {command}")
+        header, is_query, arg = match.group(1), bool(match.group(2)), match.group(3).strip()
+
+        if header.startswith("*"):
+            header = header.upper()
+            if header == "*IDN":
+                return f"NF Corporation,WF1947,SIM{self.index:05d},Ver1.00"
+            if header == "*OPC":
+                return "1"
+            if header == "*RST":
+                self._reset()
+            elif header == "*TRG":
+                now = time.perf_counter()
+                for channel in self.channels.values():
+                    if channel["MODE"] == "SWE":
+                        channel["sweep_start"] = now
+            return None
+
+        nodes = self._normalize(header)
+        ch = 1
+        if nodes[0].startswith(("SOUR", "OUTP")):
+            root = nodes[0]
+            ch = int(root[4:] or 1)
+            nodes = nodes[1:] if root.startswith("SOUR") else ["OUTP"] + nodes[1:]
+        channel = self.channels[ch]
+        path = ":".join(nodes)
+
+        if path == "FREQ":
+            if is_query:
+                return f"{channel['FREQ']:+.9E}"
+            channel["FREQ"] = self._number(arg)
+            return None
+        if path == "FREQ:MODE":
+            if is_query:
+                return channel["MODE"]
+            channel["MODE"] = "SWE" if arg.upper().startswith("SWE") else "FIX"
+            # continuous sweeps start right away, single sweeps wait for *TRG
+            running = channel["MODE"] == "SWE" and channel["SWEMODE"] == "CONT"
+            channel["sweep_start"] = time.perf_counter() if running else None
+            return None
+        if path in ("FREQ:STAR", "FREQ:STOP", "SWE:TIME"):
+            key = nodes[-1]
+            if is_query:
+                return f"{channel[key]:+.9E}"
+            channel[key] = self._number(arg)
+            return None
+        if path == "SWE:SPAC":
+            if is_query:
+                return channel["SPAC"]
+            channel["SPAC"] = "LOG" if arg.upper().startswith("LOG") else "LIN"
+            return None
+        if path == "SWE:MODE":
+            if is_query:
+                return channel["SWEMODE"]
+            channel["SWEMODE"] = "SING" if arg.upper().startswith("SING") else "CONT"
+            return None
+        if path == "SWE:INT:FUNC":
+            if is_query:
+                return channel["SWEFUNC"]
+            channel["SWEFUNC"] = "TRI" if arg.upper().startswith("TRI") else "RAMP"
+            return None
+        if path == "FUNC:SHAP":
+            if is_query:
+                return channel["SHAP"]
+            channel["SHAP"] = self._normalize(arg)[0]
+            return None
+        if path == "VOLT:AMPL":
+            if is_query:
+                return f"{channel['AMPL']:+.6E}"
+            channel["AMPL"] = self._number(arg)
+            return None
+        if path == "VOLT:OFFS":
+            if is_query:
+                return f"{channel['OFFS']:+.6E}"
+            channel["OFFS"] = self._number(arg)
+            return None
+        if path in ("OUTP:STAT", "OUTP"):
+            if is_query:
+                return "1" if channel["STAT"] else "0"
+            channel["STAT"] = arg.upper() in ("ON", "1")
+            return None
+        if path == "OUTP:LOAD":
+            if is_query:
+                return "INF" if channel["LOAD"] == "INF" else f"{channel['LOAD']:+.6E}"
+            channel["LOAD"] = "INF" if arg.upper().startswith("INF") else self._number(arg)
+            return None
+        if nodes[0] in ("FM", "PM", "AM", "BURS"):
+            return "0" if is_query else None
+        raise ValueError(f"Unsupported WF1947 command: {command}")
+
+
+class SimPPMSClient:
+    """
+    Simulated MultiPyVu client with linear temperature and field ramps.
+
+    Initialization parameters:
+    index:          Integer, simulation index (independent of the resonator index).
+    temperature:    Initial temperature (K). Default 300.
+    field:          Initial field (Oe). Default 0.
+
+    Methods used by PPMS: open(), close_client(), get_temperature(), get_field().
+    set_temperature(set_point, rate_per_min, approach_mode) and
+    set_field(set_point, rate_per_sec, approach_mode) start ramps.
+    """
+
+    def __init__(self, index=1, temperature=300.0, field=0.0):
+        self.index = index
+        self.latency = DEFAULT_LATENCY.get("PPMS", 0.0)
+        self.temperature_noise = 0.002
+        self.field_noise = 0.05
+        self._rng = np.random.default_rng()
+        self._temperature = (temperature, temperature, 0.0, None)  # (start, target, rate K/s, t0)
+        self._field = (field, field, 0.0, None)  # (start, target, rate Oe/s, t0)
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _ramp(state, now):
+        """Return (value, ramping) of a linear ramp state at time now."""
+        start, target, rate, t0 = state
+        if t0 is None or rate <= 0:
+            return target, False
+        span = rate * (now - t0)
+        if span >= abs(target - start):
+            return target, False
+        return start + math.copysign(span, target - start), True
+
+    def open(self):
+        self._wait()
+
+    def close_client(self):
+        self._wait()
+
+    def get_temperature(self):
+        self._wait()
+        with self._lock:
+            value, ramping = self._ramp(self._temperature, time.perf_counter())
+        value += self._rng.normal(0.0, self.temperature_noise)
+        return value, "Tracking" if ramping else "Stable"
+
+    def get_field(self):
+        self._wait()
+        with self._lock:
+            value, ramping = self._ramp(self._field, time.perf_counter())
+        value += self._rng.normal(0.0, self.field_noise)
+        return value, "Charging" if ramping else "Holding (Driven)"
+
+    def set_temperature(self, set_point, rate_per_min, approach_mode=None):
+        self._wait()
+        now = time.perf_counter()
+        with self._lock:
+            current, _ = self._ramp(self._temperature, now)
+            self._temperature = (current, float(set_point), abs(rate_per_min) / 60.0, now)
+
+    def set_field(self, set_point, rate_per_sec, approach_mode=None):
+        self._wait()
+        now = time.perf_counter()
+        with self._lock:
+            current, _ = self._ramp(self._field, now)
+            self._field = (current, float(set_point), abs(rate_per_sec), now)
@@ -1,8 +1,13 @@
 # From https://github.com/jason-d-austin/SR830-Python-Class/blob/master/sr830.py
 
-import pyvisa, time
+import math
+import time
 import numpy as np
-rm = pyvisa.ResourceManager()
+from .sr830stream import SR830Stream
+from .statecache import StateCache
+from .resourcemanager import open_resource
+from .instrumentation import instrumented
+from .traffic import recorded
 
 class SR830:
 	"""
@@ -12,6 +17,12 @@ class SR830:
 	resourceLoc:		String containing the hardward location of the GPIB connection. 
 				  This location should be visable from the SR830 front panel by
 				  pressing the "port" button.
+	settle_timeout:		Maximum time in ms the setters wait for the *OPC? handshake that confirms
+				  a setting has been applied (default 5000).
+	cache_ttl:		Maximum age in seconds of the cached settings (FMOD, OFLT, OFSL, SENS, SYNC, SRAT).
+				  None (default) keeps them until refresh() is called.
+	inst:			An already opened resource to use instead of opening resourceLoc
+				  (e.g. a simulated resource from instruments.simulation)
 	
 	Variables:
 	.inst:			A container holding the pyVISA connection to the SR830 hardware via GPIB
@@ -23,14 +34,25 @@ class SR830:
 	.oflt:			A dictionary which converts the name of an integration time (time constant)
 				  into its corresponding index inside the SR830 serial (i.e. "1ms" is "4")
 	.time:			A list of the same integration times expressed as floats in units of seconds
+	.ofsl:			A dictionary which converts the name of a low pass filter slope into its
+				  corresponding index inside the SR830 serial (i.e. "12dB" is "1")
 	.it:			A float: the current integration time (time constant) in units of seconds
 	.v:			A float: the current sensitivity in units of volts
+	.stream:		The running SR830Stream (FAST mode reader thread) or None
+	.cache:			StateCache mirroring the settings written by this class
+	.srat:			A dictionary which converts the name of a buffer sample rate into its
+				  corresponding index inside the SR830 serial (i.e. "512Hz" is "13")
+	.rate:			A list of the same sample rates expressed as floats in units of Hz
 	
 	Methods:
 	.setIT(name,i):		Sets the integration time (time constant) of the SR830 using EITHER "name" or "i".
 				  "name" must be a string found in .oflt.keys() and i=0..26. Providing "name" will
 				  superceed "i." Default is to set IT to 1sec. 
 	.getIT():		Returns a string containing the unit converted integration time (contrast with .it)
+	.setSlope(name,i):	Sets the low pass filter slope using EITHER "name" (a key of .ofsl) or "i" (i=0..3).
+	.getSlope():		Returns a string containing the filter slope (i.e. "24dB")
+	.settleTime(accuracy):	Returns the time in seconds the output filter needs after a step of the input
+				  to settle within "accuracy" (fraction) of the final value, from .it and the slope
 	.setSens(name,i):	Sets the voltage sensitivity of the SR830 using EITHER "name" or "i". "name" must be 
 				  a string found in .oflt.keys() and i=0..26. Providing "name" will superceed "i." 
 				  Default is to set IT to 1sec. 
@@ -43,14 +65,32 @@ class SR830:
 	.getRTh():		Returns a numpy array with measured locked in amplitude and phase: [R(V),Th(Deg)]
 	.getXY():		Returns a numpy array with measured locked in X and Y components: [X(V),X(Deg)]
 	.getSnap(params):	Returns a numpy array with the values of the requested parameters at a single moment
+	.requestSnap(params):	Sends the SNAP? query without reading the reply (see readSnap())
+	.readSnap():		Returns the reply of the previous requestSnap() as a numpy array
+	.setSampleRate(name,i):	Sets the internal data buffer sample rate using EITHER "name" or "i" (i=0..14).
+				  "name" must be a string found in .srat.keys(). Default is 512Hz.
+	.getSampleRate():	Returns the buffer sample rate as a float in Hz (None in trigger mode)
+	.setupBuffer(name,i,loop):	Shows X on CH1 and Y on CH2, sets the sample rate and buffer mode and clears the buffer
+	.startBuffer():		Starts or resumes data storage (STRT)
+	.pauseBuffer():		Pauses data storage (PAUS)
+	.resetBuffer():		Resets the data buffer (REST)
+	.getBufferLength():	Returns the number of points stored in the buffer
+	.getTrace(ch,start,count):	Returns a numpy array with "count" points of channel ch read as binary floats (TRCB)
+	.readBuffer():		Returns numpy arrays [X(V)], [Y(V)] with the points stored since the previous call
+	.startStream(name,i,mode):	Starts FAST mode streaming of X/Y (mode="XY") or R/Th (mode="RTh") into
+				  a ring buffer filled by a reader thread. Returns the SR830Stream.
+	.stopStream():		Stops the FAST mode stream and releases the bus
+	.isStreaming():		Returns True while a FAST mode stream is running
+	.refresh():		Re-reads the cached settings from the SR830 (e.g. after front panel changes)
 	.write(message,q):	Wrapper for pyVisa inst.query(message) if q=True or inst.write(message) if q=False.
 				  Default is to for q=False. See manual for details.
 	.close():		Closes the pyVisa connection to the SR830
 	"""
 	type = "SR830"
-	def __init__(self,resourceLoc="GPIB0::8::INSTR"):
+	def __init__(self,resourceLoc="GPIB0::8::INSTR",settle_timeout=5000,cache_ttl=None,inst=None):
 		try:
-			self.inst = rm.open_resource(resourceLoc)
+			inst = inst if inst is not None else open_resource(resourceLoc)
+			self.inst = instrumented(recorded(inst, resourceLoc), resourceLoc)
 			print("Connected to: ",self.inst.query("*IDN?"))
 		except Exception as e:
 			print(f"Error connecting to the SR830: {e}")
@@ -87,11 +127,27 @@ class SR830:
 					 0.001,0.003,0.01,0.03,0.1,0.3,
 					 1.0,3.0,10.0,30.0,100.0,300.0,
 					 1000.0,3000.0,10000.0,30000.0]
+		self.ofsl = {"6dB":"0","12dB":"1","18dB":"2","24dB":"3"}
+		self.srat = {"62.5mHz":"0","125mHz":"1","250mHz":"2",
+					 "500mHz":"3","1Hz":"4","2Hz":"5",
+					 "4Hz":"6","8Hz":"7","16Hz":"8",
+					 "32Hz":"9","64Hz":"10","128Hz":"11",
+					 "256Hz":"12","512Hz":"13","Trigger":"14"}
+		self.rate = [0.0625,0.125,0.25,0.5,
+					 1.0,2.0,4.0,8.0,16.0,
+					 32.0,64.0,128.0,256.0,512.0]
+		self.bufferSize = 16383		# points per channel held by the internal buffer
+		self._bufferRead = 0		# number of buffer points already returned by readBuffer()
+		self.bufferStart = None		# time.time() of the first sample in the current buffer segment
+		self.bufferRearmed = False	# True when the last readBuffer() call re-armed the buffer
+		self.stream = None
+		self.cache = StateCache(cache_ttl)
+		self.settle_timeout = settle_timeout
 		#self.setIT()
 		#self.setSens()
 		self.setSync()
-		self.it = self.time[int(self.inst.query("OFLT ?")[:-1])]
-		self.v = self.volt[int(self.inst.query("SENS ?")[:-1])]
+		self.it = self.time[self._setting("OFLT")]
+		self.v = self.volt[self._setting("SENS")]
         
 		
 	def setIT(self,name=None,i=10):
@@ -106,15 +162,42 @@ class SR830:
 		"10ks":"18","30ks":"19"}
 		"""
 		if name!=None:
-			self.inst.write("OFLT "+self.oflt[name])
-			time.sleep(0.1)
-			self.it = self.time[int(self.inst.query("OFLT ?")[:-1])]
-		else:
-			self.inst.write("OFLT "+str(int(i)))
-			time.sleep(0.1)
-			self.it = self.time[i]
+			i = int(self.oflt[name])
+		self._writeOPC("OFLT "+str(int(i)))
+		self.cache.set("OFLT",int(i))
+		self.it = self.time[int(i)]
 	def getIT(self):
-		return(list(self.oflt.keys())[int(self.inst.query("OFLT ?")[:-1])])
+		return(list(self.oflt.keys())[self._setting("OFLT")])
+
+	def setSlope(self,name=None,i=1):
+		"""
+		Low pass filter slopes are as follows:
+		{"6dB":"0","12dB":"1","18dB":"2","24dB":"3"} (per octave)
+		"""
+		if name!=None:
+			i = int(self.ofsl[name])
+		self._writeOPC("OFSL "+str(int(i)))
+		self.cache.set("OFSL",int(i))
+	def getSlope(self):
+		return(list(self.ofsl.keys())[self._setting("OFSL")])
+
+	def settleTime(self,accuracy=1e-3):
+		"""
+		The output filter is a cascade of n = 1..4 identical RC stages (6..24 dB/oct),
+		whose step response approaches the final value with the error
+		exp(-x) * sum(x**k/k!, k<n) at t = x*tau. Return the smallest t (seconds)
+		with an error below "accuracy", e.g. about 4.6, 6.6, 8.4 and 10 time
+		constants for 1% and 6, 12, 18 and 24 dB/oct.
+		"""
+		stages = self._setting("OFSL")+1
+		error = lambda x: np.exp(-x)*sum(x**k/math.factorial(k) for k in range(stages))
+		low, high = 0.0, 1.0
+		while error(high) > accuracy:
+			high *= 2
+		for _ in range(40):
+			middle = (low+high)/2
+			low, high = (low, middle) if error(middle) <= accuracy else (middle, high)
+		return(high*self.time[self._setting("OFLT")])
 			
 	def setSens(self,name=None,i=11):
 		"""
@@ -130,15 +213,12 @@ class SR830:
 		"200mV":"24","500mV":"25","1V":"26"}
 		"""
 		if name!=None:
-			self.inst.write("SENS "+self.sens[name])
-			time.sleep(0.1)
-			self.v = self.volt[int(self.inst.query("SENS ?")[:-1])]
-		else:
-			self.inst.write("SENS "+str(int(i)))
-			time.sleep(0.1)
-			self.v = self.volt[i]
+			i = int(self.sens[name])
+		self._writeOPC("SENS "+str(int(i)))
+		self.cache.set("SENS",int(i))
+		self.v = self.volt[int(i)]
 	def getSens(self):
-		return(list(self.sens.keys())[int(self.inst.query("SENS ?")[:-1])])
+		return(list(self.sens.keys())[self._setting("SENS")])
 		
 	def setSync(self,i=1):
 		"""
@@ -146,12 +226,12 @@ class SR830:
 		0->OFF
 		1->ON
 		"""
-		self.inst.write("SYNC "+str(int(i)))
-		time.sleep(0.1)
-		if self.getFreq()>200 and int(i)==1:
+		self._writeOPC("SYNC "+str(int(i)))
+		self.cache.set("SYNC",int(i))
+		if int(i)==1 and self.getFreq()>200:
 			print("Synchronous Filter should only be used below 200Hz")
 	def getSync(self):
-		return(["ON","OFF"][int(self.inst.query("SYNC ?")[:-1])])
+		return(["ON","OFF"][self._setting("SYNC")])
 	
 	def getFreq(self):
 		return(float(self.inst.query("FREQ ?")))
@@ -161,7 +241,7 @@ class SR830:
 		Internal: 1
 		External: 0
 		"""
-		return(["External","Internal"][int(self.inst.query("FMOD ?")[:-1])])
+		return(["External","Internal"][self._setting("FMOD")])
 		
 	def getOut(self,i=3):
 		"""
@@ -196,6 +276,31 @@ class SR830:
 		
 		Return: numpy array, containing the requested parameter values
 		"""
+		try:
+			response = self.inst.query(self._snapCommand(params))
+		except Exception as e:
+			print(f"Error querying SNAP: {e}")
+			raise e
+		return(self._parseSnap(response))
+	
+	def requestSnap(self, *params):
+		"""
+		Send the SNAP? query of getSnap() without reading the reply; readSnap()
+		returns the values. The lock-in prepares the reply while the bus serves
+		other instruments, so several lock-ins on one GPIB bus can be sampled by
+		sending every request first and reading the replies afterwards. A query
+		sent to this lock-in before readSnap() discards the reply, so through an
+		InstrumentActor run requestSnap() and readSnap() in one job (submit_job).
+		"""
+		self.inst.write(self._snapCommand(params))
+	
+	def readSnap(self):
+		"""
+		Read the reply of the previous requestSnap() as a numpy array
+		"""
+		return(self._parseSnap(self.inst.read()))
+	
+	def _snapCommand(self, params):
 		if len(params) < 2 or len(params) > 6:
 			raise ValueError("SNAP command needs 2-6 parameters")
 		
@@ -204,13 +309,10 @@ class SR830:
 				raise ValueError("Parameter must be in the range of 1-11")
 		
 		# Build the command string
-		try:
-			param_str = ",".join(str(p) for p in params)
-			response = self.inst.query(f"SNAP? {param_str}")
-		except Exception as e:
-			print(f"Error querying SNAP: {e}")
-			raise e
-		
+		param_str = ",".join(str(p) for p in params)
+		return(f"SNAP? {param_str}")
+	
+	def _parseSnap(self, response):
 		# Parse the returned string and convert it to a float array
 		values = [float(val) for val in response.strip().split(',')]
 		return np.array(values)
@@ -221,11 +323,184 @@ class SR830:
 	def getXY(self):
 		return(self.getSnap(1, 2))
 
+	def setSampleRate(self,name=None,i=13):
+		"""
+		Buffer sample rates are as follows:
+		{"62.5mHz":"0","125mHz":"1","250mHz":"2",
+		"500mHz":"3","1Hz":"4","2Hz":"5",
+		"4Hz":"6","8Hz":"7","16Hz":"8",
+		"32Hz":"9","64Hz":"10","128Hz":"11",
+		"256Hz":"12","512Hz":"13","Trigger":"14"}
+		"""
+		if name!=None:
+			i = int(self.srat[name])
+		self.inst.write("SRAT "+str(int(i)))
+		self.cache.set("SRAT",int(i))
+	def getSampleRate(self):
+		i = self._setting("SRAT")
+		return(self.rate[i] if i < len(self.rate) else None)
+
+	def setupBuffer(self,name=None,i=13,loop=False):
+		"""
+		Prepare the internal data buffer for acquisition:
+		CH1 displays X and CH2 displays Y (the buffer stores the displayed values),
+		the sample rate is set with setSampleRate(name,i), data storage
+		stops when the buffer is full (loop=False) or wraps around (loop=True),
+		and the buffer is cleared. Call startBuffer() to begin storing.
+		"""
+		self.inst.write("DDEF 1,0,0")
+		self.inst.write("DDEF 2,0,0")
+		self.setSampleRate(name,i)
+		self.inst.write("SEND "+str(int(bool(loop))))
+		self.inst.write("TSTR 0")
+		self.resetBuffer()
+
+	def startBuffer(self):
+		"""
+		Start storing; .bufferStart is set to the time.time() of the STRT
+		command (midpoint of the write), the time of the first stored sample.
+		"""
+		before = time.time()
+		self.inst.write("STRT")
+		self.bufferStart = (before+time.time())/2
+	def pauseBuffer(self):
+		self.inst.write("PAUS")
+	def resetBuffer(self):
+		self.inst.write("REST")
+		self._bufferRead = 0
+
+	def getBufferLength(self):
+		return(int(self.inst.query("SPTS ?")))
+
+	def getTrace(self,ch=1,start=0,count=None):
+		"""
+		Read "count" points of buffer channel ch (1 or 2) starting at bin "start".
+		TRCB transfers the points as 4 byte little endian IEEE floats, so the
+		values are decoded straight into a numpy array without string parsing.
+		"""
+		assert ch in (1,2)
+		if count is None:
+			count = self.getBufferLength()-start
+		if count <= 0:
+			return(np.empty(0))
+		values = self.inst.query_binary_values(
+			f"TRCB? {ch},{start},{count}", datatype='f', is_big_endian=False,
+			container=np.array, header_fmt='empty', expect_termination=False,
+			data_points=count)
+		return(values.astype(np.float64))
+
+	def readBuffer(self,rearm=None):
+		"""
+		Return X and Y numpy arrays holding the points stored since the previous
+		call (or since setupBuffer/resetBuffer). In shot mode the buffer is
+		re-armed (paused, drained, reset and restarted) once it is nearly full
+		(rearm=None), always (rearm=True) or never (rearm=False), so a running
+		acquisition can be drained indefinitely. The samples taken during a
+		re-arm are lost: after a call with .bufferRearmed True the next points
+		start a new segment whose first sample was taken at .bufferStart.
+		"""
+		stored = self.getBufferLength()
+		if rearm is None:
+			rearm = stored >= self.bufferSize - 64
+		self.bufferRearmed = rearm
+		if rearm:
+			self.pauseBuffer()
+			stored = self.getBufferLength()
+		count = stored-self._bufferRead
+		x = self.getTrace(1,self._bufferRead,count)
+		y = self.getTrace(2,self._bufferRead,count)
+		self._bufferRead = stored
+		if rearm:
+			self.resetBuffer()
+			self.startBuffer()
+		return(x, y)
+
+	def startStream(self,name=None,i=13,mode="XY",capacity=65536):
+		"""
+		Start FAST mode data transfer: every sample taken at the buffer sample
+		rate (setSampleRate(name,i)) is sent to the host as two 16 bit integers.
+		CH1/CH2 show X/Y (mode="XY") or R/Th (mode="RTh"). A SR830Stream thread
+		reads the packets into a ring buffer; use .stream.latest() or
+		.stream.latest_phase() to get the newest sample. While streaming the
+		GPIB session belongs to the reader thread, so no other queries may be
+		sent until stopStream() is called.
+		"""
+		if self.isStreaming():
+			return(self.stream)
+		self.stopStream()	# clean up after a stream that stopped on an error
+		ch = 0 if mode=="XY" else 1
+		self.inst.write(f"DDEF 1,{ch},0")
+		self.inst.write(f"DDEF 2,{ch},0")
+		self.setSampleRate(name,i)
+		rate = self.getSampleRate()
+		self.cache.invalidate("SENS")	# the scaling must match the front panel setting
+		self.v = self.volt[self._setting("SENS")]
+		self.inst.write("SEND 1")
+		self.inst.write("REST")
+		self.inst.write("FAST 2")
+		self.inst.write("STRD")
+		self.stream = SR830Stream(self.inst,self.v,rate,mode,capacity)
+		self.stream.start()
+		return(self.stream)
+
+	def stopStream(self):
+		"""
+		Stop the reader thread, clear the data still queued in the SR830 output
+		and switch FAST mode off.
+		"""
+		if self.stream is None:
+			return
+		stream, self.stream = self.stream, None
+		stream.stop()
+		try:
+			self.inst.clear()
+		except Exception as e:
+			print(f"SR830 device clear failed: {e}")
+		self.inst.write("PAUS")
+		self.inst.write("FAST 0")
+		self.inst.write("REST")
+		self._bufferRead = 0
+
+	def isStreaming(self):
+		return(self.stream is not None and self.stream.is_alive())
+
+	def _writeOPC(self,message):
+		"""
+		Send "message" followed by *OPC? and wait for the reply, which the SR830
+		only gives once the command has been executed. The wait is limited to
+		.settle_timeout ms instead of the usual VISA timeout.
+		"""
+		timeout = self.inst.timeout
+		self.inst.timeout = self.settle_timeout
+		try:
+			self.inst.query(message+";*OPC?")
+		finally:
+			self.inst.timeout = timeout
+
+	def _setting(self,key):
+		"""
+		Return the integer index of setting "key" (e.g. "OFLT"), answered from
+		the cache when possible and queried with "key ?" otherwise.
+		"""
+		return(int(self.cache.get(key,lambda: self.inst.query(key+" ?")[:-1])))
+
+	def refresh(self):
+		"""
+		Drop the cached settings and read them again from the SR830.
+		"""
+		self.cache.invalidate()
+		for key in ("FMOD","OFLT","OFSL","SENS","SYNC","SRAT"):
+			self._setting(key)
+		self.it = self.time[self._setting("OFLT")]
+		self.v = self.volt[self._setting("SENS")]
+
 	def write(self,message,q=False):
 		if q:
 			self.inst.query(str(message))
 		else:
 			self.inst.write(str(message))
+			self.cache.invalidate()	# an arbitrary command may change any setting
 	def close(self):
+		self.stopStream()
 		self.inst.close()
 		print("SR830 closed")
\ No newline at end of file
@@ -0,0 +1,151 @@
+import threading
+import time
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated numpy ring buffer holding the most recent rows of a fixed width.
+
+    Initialization parameters:
+    capacity:   Integer, number of rows kept in memory.
+    width:      Integer, number of columns per row. Default is 2 (X/Y or R/θ).
+
+    Attributes:
+    .count:     Total number of rows written since creation (not capped by capacity).
+
+    Main methods:
+    .extend(rows):      Append an (n, width) array of rows, overwriting the oldest ones.
+    .latest():          Return a copy of the newest row, or None if the buffer is empty.
+    .last(n):           Return a copy of the newest n rows in chronological order.
+    """
+
+    def __init__(self, capacity=65536, width=2, dtype=np.float64):
+        self._data = np.zeros((capacity, width), dtype=dtype)
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self._capacity)
+
+    def extend(self, rows):
+        """Append rows to the buffer. rows: array of shape (n, width)."""
+        rows = np.asarray(rows)
+        n = len(rows)
+        if n == 0:
+            return
+        if n > self._capacity:
+            rows = rows[-self._capacity:]
+        with self._lock:
+            start = (self.count + n - len(rows)) % self._capacity
+            first = min(len(rows), self._capacity - start)
+            self._data[start:start + first] = rows[:first]
+            self._data[:len(rows) - first] = rows[first:]
+            self.count += n
+
+    def latest(self):
+        """Return a copy of the newest row, or None if nothing has been written."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            return self._data[(self.count - 1) % self._capacity].copy()
+
+    def last(self, n):
+        """Return a copy of the newest n rows (fewer if not available yet), oldest first."""
+        with self._lock:
+            n = min(n, len(self))
+            end = self.count % self._capacity
+            index = np.arange(end - n, end) % self._capacity
+            return self._data[index]
+
+
+class SR830Stream(threading.Thread):
+    """
+    Reader thread for the SR830 FAST data transfer mode.
+
+    In FAST mode the SR830 pushes one packet per sample (two 16 bit little endian
+    integers, CH1 and CH2) as long as the host keeps reading. This thread reads
+    the packets continuously, scales them to volts/degrees and writes them into a
+    RingBuffer, so consumers only look at memory instead of querying the bus.
+
+    The stream is normally created through SR830.startStream() and stopped with
+    SR830.stopStream(); while it runs the SR830 session belongs to this thread and
+    must not be used for other queries.
+
+    Initialization parameters:
+    inst:        pyVISA resource of the SR830.
+    sensitivity: Float, full scale sensitivity in volts used to scale X/Y/R.
+    rate:        Float, sample rate in Hz (used to estimate sample times).
+    mode:        'XY' (CH1=X, CH2=Y) or 'RTh' (CH1=R, CH2=θ).
+    capacity:    Integer, number of samples kept in the ring buffer.
+    chunk:       Integer, number of samples read per bus transfer.
+
+    Attributes:
+    .buffer:     RingBuffer with the scaled samples.
+    .error:      Exception that stopped the thread, or None.
+    .last_time:  perf_counter() timestamp of the newest chunk.
+    """
+
+    # ±30000 corresponds to ± full scale for X/Y/R, ±18000 to ±180° for θ
+    FULL_SCALE = 30000.0
+    PHASE_SCALE = 180.0 / 18000.0
+
+    def __init__(self, inst, sensitivity, rate, mode="XY", capacity=65536, chunk=16):
+        super().__init__(daemon=True)
+        if mode not in ("XY", "RTh"):
+            raise ValueError("Stream mode must be 'XY' or 'RTh'")
+        self.inst = inst
+        self.rate = rate
+        self.mode = mode
+        self.chunk = chunk
+        self.buffer = RingBuffer(capacity, 2)
+        self.error = None
+        self.start_time = None
+        self.last_time = None
+        self._scale = np.array([sensitivity / self.FULL_SCALE,
+                                sensitivity / self.FULL_SCALE if mode == "XY" else self.PHASE_SCALE])
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.start_time = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                raw = self.inst.read_bytes(4 * self.chunk)
+                packets = np.frombuffer(raw, dtype='<i2').reshape(-1, 2)
+                self.buffer.extend(packets * self._scale)
+                self.last_time = time.perf_counter()
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.error = e
+                print(f"SR830 stream stopped: {e}")
+
+    def stop(self, timeout=2.0):
+        """Ask the reader to stop and wait for it to finish its current transfer."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def latest(self):
+        """Return the newest sample as a numpy array [CH1, CH2], or None."""
+        return self.buffer.latest()
+
+    def latest_xyrt(self):
+        """Return the newest sample as a numpy array [X(V), Y(V), R(V), θ(Deg)], or None."""
+        sample = self.buffer.latest()
+        if sample is None:
+            return None
+        if self.mode == "XY":
+            x, y = sample
+            return np.array([x, y, np.hypot(x, y), np.degrees(np.arctan2(y, x))])
+        r, theta = sample
+        return np.array([r * np.cos(np.radians(theta)), r * np.sin(np.radians(theta)), r, theta])
+
+    def latest_phase(self):
+        """Return the newest phase θ in degrees, or None."""
+        sample = self.buffer.latest()
+        if sample is None:
+            return None
+        if self.mode == "XY":
+            return float(np.degrees(np.arctan2(sample[1], sample[0])))
+        return float(sample[1])
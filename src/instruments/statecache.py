@@ -0,0 +1,49 @@
+import threading
+import time
+
+
+class StateCache:
+    """
+    Write-through mirror of instrument settings.
+
+    Setters store the value they wrote with .set(), getters call .get() with a
+    function that queries the instrument; the query only runs when the key is
+    unknown, was invalidated, or is older than the TTL. Settings that are only
+    changed by this application therefore cost no bus traffic after the first read.
+
+    Initialization parameters:
+    ttl:        Float, maximum age of a cached value in seconds. None (default)
+                keeps values until they are invalidated.
+
+    Main methods:
+    .get(key, fetch):       Return the cached value of key, calling fetch() on a miss.
+    .set(key, value):       Store a value that was just written to the instrument.
+    .invalidate(*keys):     Forget the given keys, or all keys if none are given.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch):
+        with self._lock:
+            entry = self._values.get(key)
+        if entry is not None:
+            value, stamp = entry
+            if self.ttl is None or time.monotonic() - stamp < self.ttl:
+                return value
+        value = fetch()
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = (value, time.monotonic())
+
+    def invalidate(self, *keys):
+        with self._lock:
+            if not keys:
+                self._values.clear()
+            for key in keys:
+                self._values.pop(key, None)
@@ -0,0 +1,28 @@
+"""
+无需硬件的测试脚本的 pytest fixture：共用模拟序号1谐振器的SR830和WF1947模拟器
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加src目录到路径，以便导入instruments包
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from instruments import simulation
+from instruments.sr830 import SR830
+from instruments.wf1947 import WF1947
+
+
+@pytest.fixture
+def lockin():
+    lockin = SR830("SIM::SR830::1", inst=simulation.open_sim_resource("SIM::SR830::1"))
+    yield lockin
+    lockin.close()
+
+
+@pytest.fixture
+def generator():
+    generator = WF1947("SIM::WF1947::1", inst=simulation.open_sim_resource("SIM::WF1947::1"))
+    yield generator
+    generator.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟仪器测试脚本（无需GPIB总线或MultiVu服务器）
+测试以下功能：
+- WF1947模拟器驱动谐振器，SR830模拟器解调：扫频找共振峰
+- SR830内部缓存读取（readBuffer）
+- SR830 FAST数据流（startStream/stopStream）
+- PPMS模拟器的温度/磁场扫描
+- 注入的每条命令延迟
+
+可直接运行，也可以用 pytest 运行（仪器由 conftest.py 中的 lockin/generator fixture 提供）
+"""
+
+import sys
+import time
+import os
+import numpy as np
+# 添加src目录到路径，以便导入instruments包
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from instruments import simulation
+from instruments.sr830 import SR830
+from instruments.wf1947 import WF1947
+from instruments.ppms import PPMS
+
+
+def test_resonance_sweep(lockin, generator):
+    """扫频测量谐振曲线"""
+    plant = simulation.get_plant(1)
+    print(f"谐振器参数: f0={plant.f0} Hz, Q={plant.Q}")
+    lockin.setIT("1ms")
+    lockin.setSens("50mV")
+    generator.set_output(True)
+    frequencies = np.linspace(plant.f0 * 0.9, plant.f0 * 1.1, 41)
+    amplitudes = []
+    for f in frequencies:
+        generator.set_frequency(f)
+        time.sleep(0.02)
+        x, y, r, theta, freq = lockin.getSnap(1, 2, 3, 4, 9)
+        amplitudes.append(r)
+    peak = frequencies[int(np.argmax(amplitudes))]
+    print(f"  共振峰位置: {peak:.1f} Hz, 峰值: {max(amplitudes) * 1e3:.3f} mV")
+    assert abs(peak - plant.f0) < plant.f0 / plant.Q, "峰位置偏离"
+
+
+def test_buffer(lockin):
+    """内部缓存读取"""
+    lockin.setupBuffer("512Hz")
+    lockin.startBuffer()
+    time.sleep(0.5)
+    x, y = lockin.readBuffer()
+    lockin.pauseBuffer()
+    print(f"  0.5s内读取到 {len(x)} 个缓存点")
+    assert 200 < len(x) < 300, "点数异常"
+
+
+def test_stream(lockin):
+    """FAST数据流"""
+    stream = lockin.startStream("512Hz", mode="RTh")
+    time.sleep(1.0)
+    print(f"  最新样本 R, θ: {stream.latest()}, 已接收 {stream.buffer.count} 个样本")
+    lockin.stopStream()
+    assert stream.buffer.count > 0, "没有收到数据"
+
+
+def test_ppms():
+    """PPMS模拟器温度/磁场扫描"""
+    ppms = PPMS("SIM::PPMS::1", client=simulation.open_sim_resource("SIM::PPMS::1"))
+    ppms.client.set_temperature(290, 600)   # 10 K/s
+    ppms.client.set_field(1000, 500)        # 500 Oe/s
+    readings = []
+    try:
+        for _ in range(3):
+            T, sT, F, sF = ppms.get_temperature_field()
+            print(f"  T = {T:.3f} K ({sT}), H = {F:.1f} Oe ({sF})")
+            readings.append((T, F))
+            time.sleep(0.5)
+    finally:
+        ppms.close()
+    assert readings[-1] != readings[0], "温度/磁场没有变化"
+
+
+def test_latency(lockin):
+    """注入延迟后的查询耗时"""
+    lockin.inst.latency = 0.005
+    try:
+        start = time.perf_counter()
+        for _ in range(20):
+            lockin.getOut(3)
+        elapsed = (time.perf_counter() - start) / 20
+    finally:
+        lockin.inst.latency = 0.0
+    print(f"  每次查询平均耗时: {elapsed * 1e3:.2f} ms")
+    assert elapsed >= 0.01, "延迟未生效"
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("模拟仪器测试")
+    print("=" * 50)
+
+    generator = WF1947("SIM::WF1947::1", inst=simulation.open_sim_resource("SIM::WF1947::1"))
+    lockin = SR830("SIM::SR830::1", inst=simulation.open_sim_resource("SIM::SR830::1"))
+    tests = [
+        ("扫频谐振曲线", lambda: test_resonance_sweep(lockin, generator)),
+        ("内部缓存读取", lambda: test_buffer(lockin)),
+        ("FAST数据流", lambda: test_stream(lockin)),
+        ("注入延迟", lambda: test_latency(lockin)),
+        ("PPMS温度/磁场扫描", test_ppms),
+    ]
+    try:
+        for name, test in tests:
+            print(f"测试 {name}...")
+            try:
+                test()
+                print("  ✓ 成功\n")
+            except AssertionError as e:
+                print(f"  ✗ {e}\n")
+    finally:
+        generator.close()
+        lockin.close()
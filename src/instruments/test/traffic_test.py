@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通信录制与回放测试脚本（使用模拟仪器，无需GPIB总线或MultiVu服务器）
+测试以下功能：
+- 录制SR830/WF1947/PPMS的全部命令、响应和耗时
+- 回放录制文件：响应与录制时一致
+- 按原始速度和加速回放的耗时
+
+可直接运行，也可以用 pytest 运行（录制文件写入 pytest 的 tmp_path）
+"""
+
+import sys
+import time
+import os
+import pathlib
+import tempfile
+# 添加src目录到路径，以便导入instruments包
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from instruments import simulation, traffic
+from instruments.sr830 import SR830
+from instruments.wf1947 import WF1947
+from instruments.ppms import PPMS
+
+
+def run_session(lockin, generator, ppms):
+    """一段典型的测量过程：扫频读取SNAP，再读取温度/磁场"""
+    results = []
+    generator.set_output(True)
+    for f in (4900, 4950, 5000, 5050, 5100):
+        generator.set_frequency(f)
+        results.append(tuple(lockin.getSnap(1, 2, 3, 4, 9)))
+    results.append(ppms.get_temperature_field())
+    return results
+
+
+def open_instruments(prefix):
+    if prefix == "SIM::":
+        inst = simulation.open_sim_resource
+    else:
+        inst = traffic.open_replay_resource
+    lockin = SR830(prefix + "SR830::1", inst=inst(prefix + "SR830::1"))
+    generator = WF1947(prefix + "WF1947::1", inst=inst(prefix + "WF1947::1"))
+    ppms = PPMS(prefix + "PPMS::1", client=inst(prefix + "PPMS::1"))
+    return lockin, generator, ppms
+
+
+def test_record_replay(tmp_path):
+    """录制一段模拟仪器的通信，然后回放并比较响应"""
+    path = str(tmp_path / "instrument_traffic_test.jsonl")
+    simulation.set_latency(0.005)
+    traffic.start_recording(path)
+    try:
+        lockin, generator, ppms = open_instruments("SIM::")
+        start = time.perf_counter()
+        recorded = run_session(lockin, generator, ppms)
+        recorded_time = time.perf_counter() - start
+    finally:
+        traffic.stop_recording()
+        simulation.set_latency(0.0)
+
+    # 回放时的地址为 REPLAY::<录制时的地址>，录制时的地址本身就是SIM::...
+    traffic.load_replay(path, speed=1.0)
+    lockin, generator, ppms = open_instruments("REPLAY::SIM::")
+    start = time.perf_counter()
+    replayed = run_session(lockin, generator, ppms)
+    replay_time = time.perf_counter() - start
+    print(f"  录制耗时 {recorded_time * 1e3:.1f} ms，原速回放耗时 {replay_time * 1e3:.1f} ms")
+    assert replayed == recorded, "响应不一致"
+
+    traffic.load_replay(path, speed=0)
+    lockin, generator, ppms = open_instruments("REPLAY::SIM::")
+    start = time.perf_counter()
+    run_session(lockin, generator, ppms)
+    fast_time = time.perf_counter() - start
+    print(f"  不等待回放耗时 {fast_time * 1e3:.1f} ms")
+    assert fast_time < replay_time, "不等待回放没有更快"
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("通信录制与回放测试")
+    print("=" * 50)
+
+    print("测试 录制与回放...")
+    try:
+        test_record_replay(pathlib.Path(tempfile.gettempdir()))
+        print("  ✓ 成功\n")
+    except AssertionError as e:
+        print(f"  ✗ {e}\n")
@@ -15,8 +15,8 @@ import sys
 import time
 import os
 # 添加上级目录到路径，以便导入WF1947类
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from wf1947 import WF1947
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from instruments.wf1947 import WF1947
 
 def test_wf1947_read_commands():
     """测试WF1947的所有读取命令"""
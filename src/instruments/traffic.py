@@ -0,0 +1,310 @@
+"""
+Recording of instrument traffic and deterministic offline replay.
+
+The drivers wrap their connection objects with recorded(): SR830.inst and
+WF1947.inst (the pyVISA sessions) and PPMS.client (the MultiPyVu client used by
+PPMS.get_temperature_field). While start_recording() is active, every call on
+them is appended to a JSONL file with its arguments, response or error, start
+time and duration.
+
+A recording can be loaded with load_replay() and served back through
+"REPLAY::<recorded address>" addresses (e.g. "REPLAY::GPIB0::8::INSTR"), so
+DataRecordThread, FrequencySweepThread and FrequencyTrackingThread run against
+the captured behaviour without hardware. Each call returns the next recorded
+response for the same method and message; if the message was never recorded
+(e.g. different SNAP? parameters) the next response with the same command header
+is used, and when the recorded responses of a command run out the last one is
+repeated. Calls take their recorded duration divided by the replay speed
+(speed=1 original timing, speed=0 no delay).
+
+File format: one JSON object per line. The first line is a header
+{"format": "instrument-traffic", "version": 1, "started": ...}, then one entry per call:
+{"t", "instrument", "method", "args", "kwargs", "duration", "result" | "error"}.
+
+Main functions:
+start_recording(path) / stop_recording() / is_recording():   Capture traffic to a file.
+recorded(target, instrument):       Wrap a VISA resource or MultiPyVu client of an instrument.
+load_replay(path, speed):           Load a recording as the active ReplaySession.
+is_replay_address(address):         True for "REPLAY::..." addresses.
+open_replay_resource(address):      Replay connection of an address from the active session.
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+import numpy as np
+
+REPLAY_PREFIX = "REPLAY::"
+FORMAT = "instrument-traffic"
+VERSION = 1
+# methods that need no recorded response when replayed
+_NO_RESPONSE = ("write", "write_raw", "clear", "open", "close", "close_client")
+
+_log = None
+_log_lock = threading.Lock()
+_session = None
+
+
+# ---- encoding
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return {"array": value.tolist(), "dtype": str(value.dtype)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"bytes": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {"dict": {str(key): _encode(item) for key, item in value.items()}}
+    return {"repr": repr(value)}
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "array" in value:
+        return np.array(value["array"], dtype=value["dtype"])
+    if "bytes" in value:
+        return base64.b64decode(value["bytes"])
+    if "tuple" in value:
+        return tuple(_decode(item) for item in value["tuple"])
+    if "dict" in value:
+        return {key: _decode(item) for key, item in value["dict"].items()}
+    return value.get("repr")
+
+
+def _header(message):
+    return message.strip().split(None, 1)[0] if message.strip() else ""
+
+
+# ---- recording
+class TrafficLog:
+    """Thread-safe JSONL writer of recorded calls."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._write({"format": FORMAT, "version": VERSION,
+                     "started": datetime.now().isoformat(timespec="seconds")})
+
+    def _write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+
+    def add(self, instrument, method, args, kwargs, start, duration, result=None, error=None):
+        entry = {"t": start - self._start, "instrument": instrument, "method": method,
+                 "args": _encode(list(args)), "kwargs": _encode(kwargs), "duration": duration}
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        else:
+            entry["result"] = _encode(result)
+        self._write(entry)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def start_recording(path):
+    global _log
+    with _log_lock:
+        if _log is not None:
+            _log.close()
+        _log = TrafficLog(path)
+
+
+def stop_recording():
+    global _log
+    with _log_lock:
+        if _log is not None:
+            _log.close()
+            _log = None
+
+
+def is_recording():
+    return _log is not None
+
+
+def recorded(target, instrument):
+    """Wrap a VISA resource or MultiPyVu client so its calls are captured while recording."""
+    if isinstance(target, RecordingConnection):
+        return target
+    return RecordingConnection(target, instrument)
+
+
+class RecordingConnection:
+    """
+    Proxy appending every method call of a connection object to the active
+    TrafficLog. Attribute reads and writes (e.g. .timeout) go to the wrapped object.
+    """
+
+    def __init__(self, target, instrument):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_instrument", instrument)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        instrument = self._instrument
+
+        def call(*args, **kwargs):
+            log = _log
+            if log is None:
+                return attribute(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                log.add(instrument, name, args, kwargs, start, time.perf_counter() - start, error=e)
+                raise
+            log.add(instrument, name, args, kwargs, start, time.perf_counter() - start, result=result)
+            return result
+        call.__name__ = name
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __repr__(self):
+        return f"RecordingConnection({self._target!r})"
+
+
+# ---- replay
+class ReplaySession:
+    """
+    A loaded recording.
+
+    Initialization parameters:
+    path:   Path of a file written by start_recording().
+    speed:  Float, replay speed factor. 1 reproduces the recorded call durations,
+            10 runs ten times faster, 0 returns immediately.
+
+    Main methods:
+    .instruments():     Addresses of the instruments in the recording.
+    .open(address):     ReplayConnection serving the calls of one recorded instrument.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self._entries = defaultdict(list)
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != FORMAT:
+                raise ValueError(f"{path} is not an instrument traffic recording")
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["instrument"]].append(entry)
+
+    def instruments(self):
+        return list(self._entries)
+
+    def open(self, address):
+        if address not in self._entries:
+            raise ConnectionError(f"{address} is not in the recording {self.path}")
+        return ReplayConnection(self._entries[address], address, self.speed)
+
+
+class ReplayConnection:
+    """
+    Stand-in for a pyVISA resource or MultiPyVu client that answers every call
+    with the recorded response of the same command.
+    """
+
+    timeout = 2000
+
+    def __init__(self, entries, instrument, speed=1.0):
+        self.instrument = instrument
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._exact = defaultdict(deque)    # (method, args) -> entries
+        self._by_header = defaultdict(deque)    # (method, header) -> entries
+        self._last = {}
+        self._used = set()
+        for seq, entry in enumerate(entries):
+            entry["seq"] = seq
+            self._exact[self._key(entry["method"], entry["args"])].append(entry)
+            self._by_header[self._header_key(entry["method"], entry["args"])].append(entry)
+
+    @staticmethod
+    def _key(method, args):
+        return method, json.dumps(args)
+
+    @staticmethod
+    def _header_key(method, args):
+        message = args[0] if args and isinstance(args[0], str) else ""
+        return method, _header(message)
+
+    def _next_entry(self, method, args):
+        encoded = _encode(list(args))
+        keys = ((self._exact, self._key(method, encoded)),
+                (self._by_header, self._header_key(method, encoded)))
+        for queues, key in keys:
+            pending = queues.get(key)
+            # entries answered through the other lookup are skipped
+            while pending and pending[0]["seq"] in self._used:
+                pending.popleft()
+            if pending:
+                entry = pending.popleft()
+                self._used.add(entry["seq"])
+                self._last[key] = entry
+                return entry
+        for _, key in keys:
+            if key in self._last:
+                return self._last[key]
+        return None
+
+    def _replay(self, method, args):
+        with self._lock:
+            entry = self._next_entry(method, args)
+        if entry is None:
+            if method in _NO_RESPONSE:
+                return None
+            raise LookupError(f"No recorded response for {self.instrument} {method}{tuple(args)}")
+        if self.speed:
+            time.sleep(entry["duration"] / self.speed)
+        if "error" in entry:
+            raise IOError(f"Recorded error: {entry['error']}")
+        return _decode(entry["result"])
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._replay(name, args)
+        call.__name__ = name
+        return call
+
+
+def load_replay(path, speed=1.0):
+    global _session
+    _session = ReplaySession(path, speed)
+    return _session
+
+
+def is_replay_address(address):
+    return str(address).upper().startswith(REPLAY_PREFIX)
+
+
+def open_replay_resource(address):
+    if _session is None:
+        raise ConnectionError("No replay file loaded")
+    return _session.open(str(address)[len(REPLAY_PREFIX):])
@@ -1,8 +1,10 @@
-import pyvisa
 import time
+from contextlib import contextmanager
 import numpy as np
-
-rm = pyvisa.ResourceManager()
+from .statecache import StateCache
+from .resourcemanager import open_resource
+from .instrumentation import instrumented
+from .traffic import recorded
 
 class WF1947:
     """
@@ -12,11 +14,17 @@ class WF1947:
     resource_address: String, VISA resource address of the device.
                     e.g. 'USB0::0x0D4A::0x000D::[serial]::INSTR' or 'GPIB0::2::INSTR'
     channel:          Integer, specify the channel to control (1 or 2). Default is 1.
+    cache_ttl:        Float, maximum age in seconds of the cached settings. None (default)
+                    keeps them until refresh() is called.
+    inst:             Already opened resource to use instead of opening resource_address
+                    (e.g. a simulated resource from instruments.simulation).
 
     Attributes:
     .inst:            pyVISA resource object for hardware communication.
     .channel:         Current channel number.
     .waveforms:       Dictionary mapping short waveform names to SCPI command keywords.
+    .cache:           StateCache mirroring the settings; setters update it and getters
+                    answer from it without querying the instrument.
     
     Main methods:
     .reset():                       Send *RST command to reset the instrument to default settings.
@@ -33,18 +41,29 @@ class WF1947:
     .set_load(impedance_ohm):       Set output load impedance (ohm or 'INF' for high-Z).
     .get_load():                    Query current load impedance.
     .setup_frequency_sweep(...):    Convenience method for quick frequency sweep configuration.
+    .sweep_frequencies(...):        Static, frequencies of a configured sweep at given times after its start.
+    .trigger():                     Send *TRG, e.g. to start a single sweep.
     .setup_external_fm(...):        Convenience method for quick external FM configuration.
+    .refresh():                     Re-read all cached settings from the instrument.
+    .batch(opc):                    Context manager that collects the commands written inside it and
+                                    sends them as one ';'-joined message (optionally followed by *OPC?).
+    .flush():                       Send the commands collected so far by an open batch.
     .close():                       Close the connection to the instrument.
     """
     type = "WF1947"
     
-    def __init__(self, resource_address, channel=1):
+    def __init__(self, resource_address, channel=1, cache_ttl=None, inst=None):
         if channel not in [1, 2]:
             raise ValueError("Channel must be 1 or 2.")
         
         self.channel = channel
+        self.cache = StateCache(cache_ttl)
+        self._batch = None      # commands collected by an open batch()
+        self._batch_depth = 0
+        self._batch_opc = False
         try:
-            self.inst = rm.open_resource(resource_address)
+            inst = inst if inst is not None else open_resource(resource_address)
+            self.inst = instrumented(recorded(inst, resource_address), resource_address)
             idn = self.inst.query("*IDN?")
             print(f"Connected to: {idn}")
         except Exception as e:
@@ -71,11 +90,12 @@ class WF1947:
         """
         try:
             print("正在应用初始设置...")
-            self.set_waveform("SIN")          # 正弦波形
-            self.set_frequency(1000)          # 1kHz频率
-            self.set_amplitude(0.01)          # 10mV Vpp (0.01V)
-            self.set_offset(0)                # 0V直流偏置
-            self.set_output(False)            # 初始关闭输出
+            with self.batch(opc=True):
+                self.set_waveform("SIN")          # 正弦波形
+                self.set_frequency(1000)          # 1kHz频率
+                self.set_amplitude(0.01)          # 10mV Vpp (0.01V)
+                self.set_offset(0)                # 0V直流偏置
+                self.set_output(False)            # 初始关闭输出
             print("初始设置完成：10mV Vpp，1kHz，正弦波形，0V直流偏置，输出关闭")
         except Exception as e:
             print(f"应用初始设置时出错: {e}")
@@ -83,14 +103,23 @@ class WF1947:
     def _write(self, command):
         """Internal method, send command to the specified channel."""
         if command.upper().startswith(('FREQ', 'VOLT', 'PHAS', 'FUNC', 'SWE', 'FM', 'PM', 'AM', 'BURS')):
-            self.inst.write(f'SOURce{self.channel}:{command}')
+            self._send(f'SOURce{self.channel}:{command}')
         elif command.upper().startswith(('LOAD')):
-            self.inst.write(f'OUTPut{self.channel}:{command}')
+            self._send(f'OUTPut{self.channel}:{command}')
+        else:
+            self._send(command)
+
+    def _send(self, command):
+        """Internal method, write a full command now or queue it in the open batch."""
+        if self._batch is not None:
+            self._batch.append(command)
         else:
             self.inst.write(command)
 
     def _query(self, command):
         """Internal method, query information from the specified channel."""
+        # queued commands must reach the instrument before the query is answered
+        self.flush()
         if command.upper().startswith(('FREQ', 'VOLT', 'PHAS', 'FUNC', 'SWE', 'FM', 'PM', 'AM', 'BURS')):
             return self.inst.query(f'SOURce{self.channel}:{command}').strip()
         elif command.upper().startswith(('LOAD')):
@@ -98,57 +127,113 @@ class WF1947:
         else:
             return self.inst.query(command).strip()
 
+    @contextmanager
+    def batch(self, opc=False):
+        """
+        Collect the commands written inside the block and send them as a single
+        ';'-joined SCPI message when the outermost block exits, e.g.
+
+            with wf.batch(opc=True):
+                wf.set_frequency(1000)
+                wf.set_amplitude(0.01)
+                wf.set_output(True)
+
+        Each command gets a leading ':' so it is parsed from the root of the
+        command tree. opc=True appends *OPC? and waits for the reply, so the
+        block returns only after the instrument has applied every setting.
+        Batches may be nested; queries inside a batch flush it first. If the
+        block raises, the commands collected but not yet sent are discarded
+        and the state cache is cleared.
+        """
+        self._batch_depth += 1
+        if self._batch is None:
+            self._batch = []
+        self._batch_opc = self._batch_opc or opc
+        try:
+            yield self
+        except BaseException:
+            if self._batch:
+                # the cache already holds the values of the discarded commands
+                self._batch = []
+                self.cache.invalidate()
+            raise
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                opc, self._batch_opc = self._batch_opc, False
+                try:
+                    self.flush(opc)
+                finally:
+                    self._batch = None
+
+    def flush(self, opc=False):
+        """Send the commands collected by the open batch (no-op outside a batch)."""
+        if not self._batch:
+            return
+        commands, self._batch = self._batch, []
+        message = ';'.join(c if c.startswith('*') else f':{c}' for c in commands)
+        if opc:
+            self.inst.query(f'{message};*OPC?')
+        else:
+            self.inst.write(message)
+
     def reset(self):
         """Reset the instrument to default settings."""
-        self.inst.write('*RST')
-        self.inst.write('*WAI') # Wait for operation to complete
+        self._send('*RST')
+        self._send('*WAI') # Wait for operation to complete
+        self.cache.invalidate()
         print("Instrument reset.")
 
     def set_output(self, state):
         """Set output state. state: bool (True=ON, False=OFF)"""
         cmd_state = "ON" if state else "OFF"
         self._write(f'OUTPut:STATe {cmd_state}')
+        self.cache.set('output', cmd_state)
         
     def get_output(self):
         """Get output state. Returns 'ON' or 'OFF'."""
-        state = self._query('OUTPut:STATe?')
-        return 'ON' if state == '1' else 'OFF'
+        return self.cache.get('output', lambda: 'ON' if self._query('OUTPut:STATe?') == '1' else 'OFF')
 
     def set_waveform(self, shape="SIN"):
         """Set output waveform. shape: 'SIN', 'SQU', 'RAMP', etc."""
         shape_cmd = self.waveforms.get(shape.upper())
         if shape_cmd:
             self._write(f'FUNCtion:SHAPe {shape_cmd}')
+            # the instrument answers with its own abbreviation, so read it back on the next get
+            self.cache.invalidate('waveform')
         else:
             raise ValueError(f"Invalid waveform: {shape}. Available: {list(self.waveforms.keys())}")
 
     def get_waveform(self):
         """Get current waveform."""
-        return self._query('FUNCtion:SHAPe?')
+        return self.cache.get('waveform', lambda: self._query('FUNCtion:SHAPe?'))
 
     def set_frequency(self, freq_hz):
         """Set output frequency (Hz)."""
         self._write(f'FREQuency {freq_hz}')
+        self.cache.set('frequency', float(freq_hz))
 
     def get_frequency(self):
         """Get current frequency (Hz). Returns float."""
-        return float(self._query('FREQuency?'))
+        return self.cache.get('frequency', lambda: float(self._query('FREQuency?')))
 
     def set_amplitude(self, amp_vpp):
         """Set output amplitude (Vp-p)."""
         self._write(f'VOLTage:AMPLitude {amp_vpp}VPP')
+        self.cache.set('amplitude', float(amp_vpp))
 
     def get_amplitude(self):
         """Get current amplitude (Vp-p). Returns float."""
-        return float(self._query('VOLTage:AMPLitude?'))
+        return self.cache.get('amplitude', lambda: float(self._query('VOLTage:AMPLitude?')))
 
     def set_offset(self, offset_v):
         """Set DC offset (V)."""
         self._write(f'VOLTage:OFFSet {offset_v}')
+        self.cache.set('offset', float(offset_v))
 
     def get_offset(self):
         """Get current DC offset (V). Returns float."""
-        return float(self._query('VOLTage:OFFSet?'))
+        return self.cache.get('offset', lambda: float(self._query('VOLTage:OFFSet?')))
         
     def set_load(self, impedance_ohm):
         """
@@ -160,12 +245,15 @@ class WF1947:
             self._write('LOAD INFinity')
         else:
             self._write(f'LOAD {impedance_ohm} OHM')
+        # the query returns the instrument's number format, so read it back on the next get
+        self.cache.invalidate('load')
 
     def get_load(self):
         """Get current load impedance."""
-        return self._query('LOAD?')
+        return self.cache.get('load', lambda: self._query('LOAD?'))
 
-    def setup_frequency_sweep(self, start_hz, stop_hz, sweep_time_s, spacing='LINear', direction='RAMP', load='INF'):
+    def setup_frequency_sweep(self, start_hz, stop_hz, sweep_time_s, spacing='LINear', direction='RAMP', load='INF',
+                              single=False):
         """
         Convenience method: configure frequency sweep mode.
         start_hz:       Start frequency (Hz)
@@ -174,18 +262,37 @@ class WF1947:
         spacing:        Sweep spacing, 'LINear' or 'LOGarithmic'
         direction:      Sweep direction, 'RAMP' or 'TRIangle'
         load:           Load impedance, int(1-10000) or 'INF'
+        single:         True: single sweep mode, each trigger() runs the sweep once.
+                        False (default): keep the instrument's sweep mode (continuous after *RST).
         """
         print(f"Configuring frequency sweep: {start_hz} Hz -> {stop_hz} Hz in {sweep_time_s}s...")
-        # self._write('SWEep:MODE SINGle') # set single sweeper
-        self._write('FREQuency:MODE SWEep')
-        self._write(f'FREQuency:STARt {start_hz}')
-        self._write(f'FREQuency:STOP {stop_hz}')
-        self._write(f'SWEep:TIME {sweep_time_s}')
-        self._write(f'SWEep:SPACing {spacing}')
-        self._write(f'SWEep:INTernal:FUNCtion {direction}')
-        self.set_load(load)
+        with self.batch(opc=True):
+            if single:
+                self._write('SWEep:MODE SINGle')
+            self._write('FREQuency:MODE SWEep')
+            self.cache.invalidate('frequency')
+            self._write(f'FREQuency:STARt {start_hz}')
+            self._write(f'FREQuency:STOP {stop_hz}')
+            self._write(f'SWEep:TIME {sweep_time_s}')
+            self._write(f'SWEep:SPACing {spacing}')
+            self._write(f'SWEep:INTernal:FUNCtion {direction}')
+            self.set_load(load)
         print("Frequency sweep mode configured.")
 
+    @staticmethod
+    def sweep_frequencies(elapsed_s, start_hz, stop_hz, sweep_time_s, spacing='LINear', direction='RAMP'):
+        """
+        Frequencies (Hz) of a single sweep at the times elapsed_s (seconds since
+        the sweep started, scalar or array). Times outside [0, sweep_time_s] are
+        clipped to the start/end of the sweep.
+        """
+        x = np.clip(np.asarray(elapsed_s, dtype=np.float64) / sweep_time_s, 0.0, 1.0)
+        if direction.upper().startswith('TRI'):
+            x = 1.0 - np.abs(2.0 * x - 1.0)
+        if spacing.upper().startswith('LOG'):
+            return start_hz * (stop_hz / start_hz) ** x
+        return start_hz + (stop_hz - start_hz) * x
+
     def setup_external_fm(self, carrier_hz, deviation_hz, load='INF'):
         """
         Convenience method: configure external FM mode.
@@ -194,20 +301,33 @@ class WF1947:
         load:           Load impedance, int(1-10000) or 'INF'
         """
         print(f"Configuring external FM: carrier {carrier_hz} Hz, deviation {deviation_hz} Hz...")
-        self._write('FM:STATe ON')
-        self._write('FM:SOURce EXTernal')
-        self._write(f'FREQuency {carrier_hz}')
-        self._write(f'FM:DEViation {deviation_hz}')
-        self.set_load(load)
+        with self.batch(opc=True):
+            self._write('FM:STATe ON')
+            self._write('FM:SOURce EXTernal')
+            self._write(f'FREQuency {carrier_hz}')
+            self.cache.set('frequency', float(carrier_hz))
+            self._write(f'FM:DEViation {deviation_hz}')
+            self.set_load(load)
         print("External FM mode configured.")
 
+    def refresh(self):
+        """Drop the cached settings and read them again from the instrument."""
+        self.cache.invalidate()
+        self.get_waveform()
+        self.get_frequency()
+        self.get_amplitude()
+        self.get_offset()
+        self.get_load()
+        self.get_output()
+
     def trigger(self):
         """
         emit a trg
         """
-        self.inst.write('*TRG')
+        self._send('*TRG')
 
     def close(self):
         """Close the connection to the instrument."""
+        self.flush()
         self.inst.close()
         print("FW1974 Device connection closed.")
\ No newline at end of file